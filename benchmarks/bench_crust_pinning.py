@@ -0,0 +1,218 @@
+"""
+Crust 固定代码路径吞吐基准：在本地 PSA 模拟服务上运行，不访问 pin.crustcode.com。
+
+场景（与 CrustPinning 中的实现一一对应）：
+- pin-serial       单并发提交（相当于旧版逐个 curl 的调度方式，但不含进程启动开销）
+- pin-queue        PinWorkQueue + PinningServiceClient 并发提交（_pin_via_http）
+- status-batched   每批 10 个 CID 并发查询状态（_check_cids_status）
+- list-paginated   按 before/limit 游标翻页获取全部固定（_fetch_account_pins，无本地快照）
+- list-incremental 再次获取，只拉取快照之后的新固定并刷新未完成的固定
+
+基准直接调用 CrustPinning 的上述方法，只把 Tk 窗口换成丢弃回调的占位对象。
+
+输出每个场景的 ops/s、p50/p99 延迟以及重试放大倍数（实际 HTTP 尝试数 / 逻辑请求数）。
+
+用法：
+    runtime\\python.exe benchmarks\\bench_crust_pinning.py --pins 1000 --latency 0.05 --throttle-rate 0.05 --error-rate 0.02
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 直接调用 CrustPinning 中的实现（翻页去重、批量查询、重试判定都与程序一致），只替换窗口
+from utils.crust_pin_queue import PinWorkQueue  # noqa: E402
+from utils.ipfs_crust_pinner import ConfigManager, Constants, CrustPinning  # noqa: E402
+from psa_mock_server import MockPSAState, start_server  # noqa: E402
+
+BENCH_CONFIG = {
+    "crust_b64auth_encoded_data": "bench-token",
+    "crust_user_address": "bench-account",
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def fake_cid(i):
+    # 仅用于模拟服务的占位 CID（能通过 CIDValidator 的 v1 格式检查）
+    return f"bafybeibench{i:052d}"
+
+
+class StubMaster:
+    """代替 Tk 窗口：after 回调只用于刷新界面，基准中直接丢弃"""
+
+    def after(self, delay, func=None, *args):
+        return None
+
+
+class Recorder:
+    """包装 PinningServiceClient.request，记录每个逻辑请求（含客户端内部重试）的耗时"""
+
+    def __init__(self, client):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.client = client
+        self._request = client.request
+        client.request = self.timed
+
+    def timed(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._request(*args, **kwargs)
+        finally:
+            with self.lock:
+                self.latencies.append(time.perf_counter() - start)
+
+
+def new_pinner(base_url, concurrency, cache_dir):
+    """构造不带界面的 CrustPinning：只初始化固定、查询、翻页所需的状态"""
+    Constants.CRUST_API_PSA = base_url
+    Constants.MAX_CONCURRENT_OPERATIONS = concurrency
+    logger = logging.getLogger("bench_crust_pinning")
+    config_path = os.path.join(cache_dir, "crust_config.json")
+    if not os.path.exists(config_path):
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump({}, f)
+    pinner = CrustPinning.__new__(CrustPinning)
+    pinner.master = StubMaster()
+    pinner.logger = logger
+    pinner.config_manager = ConfigManager(config_path, logger)
+    pinner.pin_info = None
+    pinner.pinning_queue = []
+    pinner.pin_work_queue = None
+    pinner._psa_clients = {}
+    pinner.is_pinning = False
+    pinner._closed = True  # 不输出日志到界面
+    pinner.semaphore = threading.Semaphore(concurrency)
+    pinner.operations_lock = threading.Lock()
+    pinner._ledger_configs = {}
+    pinner.ledger = None
+    pinner.poller = None
+    recorder = Recorder(pinner._get_psa_client(BENCH_CONFIG))
+    return pinner, recorder
+
+
+def bench_pin(base_url, cache_dir, pins, concurrency, offset=0):
+    """与 _start_pinning 相同：_queue_pin_operation_http 生成任务，交给 PinWorkQueue 执行"""
+    pinner, recorder = new_pinner(base_url, concurrency, cache_dir)
+    for i in range(pins):
+        pinner._queue_pin_operation_http(fake_cid(offset + i), f"file-{offset + i}", BENCH_CONFIG)
+    tasks, pinner.pinning_queue = pinner.pinning_queue, []
+    queue = PinWorkQueue(concurrency, retry_delay=0.5)
+    start = time.perf_counter()
+    counts = queue.run(tasks)
+    elapsed = time.perf_counter() - start
+    queue_attempts = sum(task.attempts for task in tasks)
+    return summarize(recorder, elapsed, counts["done"], queue_attempts, len(tasks))
+
+
+def bench_status(base_url, cache_dir, cids, concurrency):
+    """_check_cids_status：每批 10 个 CID 并发查询"""
+    pinner, recorder = new_pinner(base_url, concurrency, cache_dir)
+    start = time.perf_counter()
+    pinner._check_cids_status(cids, BENCH_CONFIG)
+    elapsed = time.perf_counter() - start
+    result = summarize(recorder, elapsed, len(pinner.pin_info), None, None)
+    result["unit"] = "cids"
+    return result
+
+
+def bench_list(base_url, cache_dir, concurrency):
+    """_fetch_account_pins：无快照时全量翻页，快照存在后增量拉取"""
+    pinner, recorder = new_pinner(base_url, concurrency, cache_dir)
+    start = time.perf_counter()
+    pinner._fetch_account_pins(BENCH_CONFIG)
+    elapsed = time.perf_counter() - start
+    result = summarize(recorder, elapsed, len(pinner.pin_info), None, None)
+    result["unit"] = "pins"
+    return result
+
+
+def summarize(recorder, elapsed, completed, queue_attempts, queue_tasks):
+    stats = recorder.client.stats
+    result = {
+        "completed": completed,
+        "seconds": round(elapsed, 3),
+        "ops_per_sec": round(completed / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(recorder.latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(recorder.latencies, 99) * 1000, 1),
+        "http_requests": stats["requests"],
+        "http_attempts": stats["attempts"],
+        "throttled": stats["throttled"],
+        "retry_amplification": round(stats["attempts"] / stats["requests"], 3) if stats["requests"] else 0.0,
+        "unit": "pins",
+    }
+    if queue_tasks:
+        result["queue_amplification"] = round(queue_attempts / queue_tasks, 3)
+    return result
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Crust 固定吞吐基准（本地 PSA 模拟服务）")
+    parser.add_argument("--pins", type=int, default=1000, help="提交的固定数量")
+    parser.add_argument("--serial-pins", type=int, default=100, help="单并发基线提交的数量")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发数（对应 MAX_CONCURRENT_OPERATIONS）")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    state = MockPSAState(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, retry_after=args.retry_after, pin_delay=0.5, seed=args.seed,
+    )
+    server, base_url = start_server(state)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            results = {
+                "pin-serial": bench_pin(base_url, cache_dir, args.serial_pins, 1, offset=args.pins),
+                "pin-queue": bench_pin(base_url, cache_dir, args.pins, args.concurrency),
+            }
+            cids = [fake_cid(i) for i in range(args.pins)]
+            results["status-batched"] = bench_status(base_url, cache_dir, cids, args.concurrency)
+            results["list-paginated"] = bench_list(base_url, cache_dir, args.concurrency)
+            results["list-incremental"] = bench_list(base_url, cache_dir, args.concurrency)
+    finally:
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps({"config": vars(args), "results": results, "server": state.stats}, indent=2))
+        return 0
+
+    print(f"[bench] mock PSA latency={args.latency}s jitter={args.jitter}s "
+          f"error-rate={args.error_rate} throttle-rate={args.throttle_rate} concurrency={args.concurrency}")
+    header = f"{'scenario':<18}{'done':>8}{'sec':>9}{'ops/s':>9}{'p50ms':>9}{'p99ms':>9}{'http':>7}{'429':>6}{'retry x':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(f"{name:<18}{r['completed']:>8}{r['seconds']:>9}{r['ops_per_sec']:>9}{r['p50_ms']:>9}"
+              f"{r['p99_ms']:>9}{r['http_attempts']:>7}{r['throttled']:>6}{r['retry_amplification']:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
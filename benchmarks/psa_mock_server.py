@@ -0,0 +1,259 @@
+"""
+本地 Pinning Service API 模拟服务（用于在不访问 pin.crustcode.com 的情况下测试 CrustPinning）。
+
+支持：
+- POST /pins            新建固定请求，返回 PinStatus
+- GET  /pins            按 cid / name / status / before / after / limit 过滤并分页
+- GET  /pins/<id>       查询单个固定请求
+- DELETE /pins/<id>     删除固定请求
+- 可配置的响应延迟、5xx 错误率与 429 限流注入；固定请求按 --pin-delay 从 queued → pinning → pinned
+
+用法：
+    runtime\\python.exe benchmarks\\psa_mock_server.py --port 5055 --latency 0.05 --error-rate 0.02 --throttle-rate 0.05
+
+    然后设置环境变量 CRUST_PSA_URL=http://127.0.0.1:5055 再启动程序，即可让 Crust 固定走本地模拟服务。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ALL_STATUSES = ("queued", "pinning", "pinned", "failed")
+
+
+class MockPSAState:
+    """模拟服务的内存状态与故障注入参数"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                 retry_after=0.2, pin_delay=1.0, fail_rate=0.0, token=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.pin_delay = pin_delay
+        self.fail_rate = fail_rate
+        self.token = token
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.pins = {}  # requestid -> dict
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0, "posts": 0, "gets": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def roll(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+    def delay(self):
+        if self.latency or self.jitter:
+            with self.lock:
+                extra = self.random.uniform(0, self.jitter) if self.jitter else 0.0
+            time.sleep(self.latency + extra)
+
+    def add_pin(self, cid, name=None, meta=None):
+        now = datetime.now(timezone.utc)
+        requestid = uuid.uuid4().hex
+        record = {
+            "requestid": requestid,
+            "created_ts": now.timestamp(),
+            "created": now.isoformat(timespec="microseconds").replace("+00:00", "Z"),
+            "will_fail": self.roll(self.fail_rate),
+            "pin": {"cid": cid, "name": name or "", "meta": meta or {}},
+        }
+        with self.lock:
+            self.pins[requestid] = record
+        return self.render(record)
+
+    def status_of(self, record):
+        elapsed = time.time() - record["created_ts"]
+        if elapsed < self.pin_delay / 2:
+            return "queued"
+        if elapsed < self.pin_delay:
+            return "pinning"
+        return "failed" if record["will_fail"] else "pinned"
+
+    def render(self, record):
+        return {
+            "requestid": record["requestid"],
+            "status": self.status_of(record),
+            "created": record["created"],
+            "pin": dict(record["pin"]),
+            "delegates": [],
+        }
+
+    def list_pins(self, query):
+        cids = set(filter(None, ",".join(query.get("cid", [])).split(",")))
+        name = query.get("name", [None])[0]
+        statuses = set(filter(None, ",".join(query.get("status", [])).split(","))) or {"pinned"}
+        before = query.get("before", [None])[0]
+        after = query.get("after", [None])[0]
+        limit = max(1, min(1000, int(query.get("limit", ["10"])[0])))
+        with self.lock:
+            records = list(self.pins.values())
+        matched = []
+        for record in records:
+            if cids and record["pin"]["cid"] not in cids:
+                continue
+            if name and record["pin"]["name"] != name:
+                continue
+            if before and not record["created"] < before:
+                continue
+            if after and not record["created"] > after:
+                continue
+            rendered = self.render(record)
+            if rendered["status"] not in statuses:
+                continue
+            matched.append(rendered)
+        matched.sort(key=lambda item: item["created"], reverse=True)
+        return {"count": len(matched), "results": matched[:limit]}
+
+
+def make_handler(state: MockPSAState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # noqa: A002 - 覆盖基类签名
+            pass
+
+        def _send(self, code, body=None, headers=None):
+            payload = json.dumps(body).encode("utf-8") if body is not None else b""
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            if payload:
+                self.wfile.write(payload)
+
+        def _read_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _preflight(self):
+            """统一处理延迟、鉴权与故障注入；返回 False 表示已响应"""
+            state.count("requests")
+            state.delay()
+            if state.token and self.headers.get("Authorization") != f"Bearer {state.token}":
+                self._send(401, {"error": {"reason": "UNAUTHORIZED"}})
+                return False
+            if state.roll(state.throttle_rate):
+                state.count("throttled")
+                self._send(429, {"error": {"reason": "RATE_LIMIT"}}, {"Retry-After": str(state.retry_after)})
+                return False
+            if state.roll(state.error_rate):
+                state.count("errors")
+                self._send(503, {"error": {"reason": "INTERNAL_SERVER_ERROR"}})
+                return False
+            return True
+
+        def _route(self):
+            parsed = urlparse(self.path)
+            path = parsed.path.rstrip("/")
+            if path.startswith("/psa"):
+                path = path[len("/psa"):]
+            return path, parse_qs(parsed.query)
+
+        def do_POST(self):
+            body = self._read_body()
+            if not self._preflight():
+                return
+            path, _ = self._route()
+            if path != "/pins":
+                self._send(404, {"error": {"reason": "NOT_FOUND"}})
+                return
+            try:
+                data = json.loads(body or b"{}")
+                cid = data["cid"]
+            except (ValueError, KeyError):
+                self._send(400, {"error": {"reason": "BAD_REQUEST"}})
+                return
+            state.count("posts")
+            self._send(202, state.add_pin(cid, data.get("name"), data.get("meta")))
+
+        def do_GET(self):
+            if not self._preflight():
+                return
+            path, query = self._route()
+            state.count("gets")
+            if path == "/pins":
+                try:
+                    self._send(200, state.list_pins(query))
+                except ValueError:
+                    self._send(400, {"error": {"reason": "BAD_REQUEST"}})
+                return
+            if path.startswith("/pins/"):
+                with state.lock:
+                    record = state.pins.get(path[len("/pins/"):])
+                if record:
+                    self._send(200, state.render(record))
+                else:
+                    self._send(404, {"error": {"reason": "NOT_FOUND"}})
+                return
+            self._send(404, {"error": {"reason": "NOT_FOUND"}})
+
+        def do_DELETE(self):
+            if not self._preflight():
+                return
+            path, _ = self._route()
+            with state.lock:
+                removed = state.pins.pop(path[len("/pins/"):], None) if path.startswith("/pins/") else None
+            self._send(202 if removed else 404, None if removed else {"error": {"reason": "NOT_FOUND"}})
+
+    return Handler
+
+
+def start_server(state: MockPSAState, host="127.0.0.1", port=0):
+    """在后台线程启动服务，返回 (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="本地 Pinning Service API 模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--latency", type=float, default=0.05, help="固定响应延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的概率")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="返回 429 的概率")
+    parser.add_argument("--retry-after", type=float, default=0.2, help="429 响应的 Retry-After（秒）")
+    parser.add_argument("--pin-delay", type=float, default=5.0, help="queued → pinned 所需时间（秒）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="固定最终失败的概率")
+    parser.add_argument("--token", default=None, help="要求的 Bearer token（默认不校验）")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    state = MockPSAState(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+        pin_delay=args.pin_delay, fail_rate=args.fail_rate, token=args.token,
+    )
+    server, url = start_server(state, args.host, args.port)
+    print(f"[mock-psa] listening on {url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"[mock-psa] stats: {state.stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,142 @@
+"""
+Aleph 路由策略离线回放：用 AlephManager 记录的真实调用观测（aleph_observations.jsonl）比较不同策略。
+
+策略：
+- thompson   ThompsonRouter（抽样决定首选节点，探索限于期望耗时接近最优的节点）
+- ema        EmaRouter（当前默认策略）：按延迟 EMA 与失败率评分逐次排序
+- sticky     原有做法：最近成功的节点优先，其余按固定顺序
+- static     固定顺序
+- random     每次随机排序
+
+没有观测日志时可用 --synthetic 生成一组模拟观测（含中途变慢/故障的节点）。
+
+用法：
+    runtime\\python.exe benchmarks\\sim_aleph_routing.py --log <config_dir>\\aleph_observations.jsonl
+    runtime\\python.exe benchmarks\\sim_aleph_routing.py --synthetic 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 直接加载 utils 下的模块，避免导入 GUI 依赖
+sys.path.insert(0, os.path.join(ROOT, "src", "utils"))
+
+from aleph_router import EmaRouter, StaticRouter, ThompsonRouter, load_observations, replay  # noqa: E402
+
+OFFICIAL = ("https://official.aleph.cloud", "https://api2.aleph.im")
+
+
+class StickyRouter:
+    name = "sticky"
+
+    def __init__(self):
+        self.last_success = None
+
+    def rank(self, endpoints, op=None):
+        endpoints = list(endpoints)
+        if self.last_success in endpoints:
+            endpoints.remove(self.last_success)
+            endpoints.insert(0, self.last_success)
+        return endpoints
+
+    def update(self, endpoint, op, latency_ms, success):
+        if success:
+            self.last_success = endpoint
+
+
+class RandomRouter:
+    name = "random"
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+
+    def rank(self, endpoints, op=None):
+        endpoints = list(endpoints)
+        self.random.shuffle(endpoints)
+        return endpoints
+
+    def update(self, endpoint, op, latency_ms, success):
+        pass
+
+
+def synthesize(count, seed):
+    """模拟若干节点：官方节点稳定但偏慢，个别 CCN 很快，其中一个在中途开始频繁失败"""
+    rng = random.Random(seed)
+    profiles = {
+        "default": (1200, 0.97),
+        OFFICIAL[0]: (900, 0.97),
+        OFFICIAL[1]: (1000, 0.95),
+        "http://ccn-fast.example:4024": (350, 0.98),
+        "http://ccn-flaky.example:4024": (300, 0.6),
+        "http://ccn-slow.example:4024": (2500, 0.9),
+    }
+    ops = ("file pin", "file list", "file forget")
+    records = []
+    for i in range(count):
+        t = i * 2.0
+        for endpoint, (latency, p_ok) in profiles.items():
+            if endpoint == "http://ccn-fast.example:4024" and i > count // 2:
+                # 后半段最快的节点退化
+                latency, p_ok = latency * 6, 0.7
+            op = rng.choice(ops)
+            records.append({
+                "t": t, "endpoint": endpoint, "op": op,
+                "latency_ms": round(rng.lognormvariate(0, 0.35) * latency, 1),
+                "success": rng.random() < p_ok,
+            })
+    return records
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Aleph 路由策略离线回放")
+    parser.add_argument("--log", nargs="*", default=[], help="观测日志（JSON Lines），可指定多个")
+    parser.add_argument("--synthetic", type=int, default=0, help="生成指定轮数的模拟观测")
+    parser.add_argument("--window", type=float, default=600.0, help="节点结果抽样的时间窗口（秒）")
+    parser.add_argument("--penalty", type=float, default=2000.0, help="每次失败额外计入的耗时（毫秒）")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    observations = load_observations(args.log) if args.log else []
+    if args.synthetic:
+        observations += synthesize(args.synthetic, args.seed)
+    if not observations:
+        print("没有可回放的观测：请用 --log 指定 aleph_observations.jsonl，或使用 --synthetic")
+        return 1
+
+    policies = [
+        ThompsonRouter(seed=args.seed),
+        EmaRouter(official=OFFICIAL),
+        StickyRouter(),
+        StaticRouter(),
+        RandomRouter(seed=args.seed),
+    ]
+    results = {p.name: replay(observations, p, window=args.window, failure_penalty_ms=args.penalty, seed=args.seed)
+               for p in policies}
+
+    if args.json:
+        print(json.dumps({"config": vars(args), "observations": len(observations), "results": results}, indent=2))
+        return 0
+
+    endpoints = len({o["endpoint"] for o in observations})
+    print(f"[sim] observations={len(observations)} endpoints={endpoints} window={args.window}s penalty={args.penalty}ms")
+    header = f"{'policy':<10}{'calls':>8}{'1st ok':>9}{'ok':>8}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}{'tries':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(f"{name:<10}{r['calls']:>8}{r['first_try_success']:>9}{r['success']:>8}{r['mean_ms']:>10}"
+              f"{r['p50_ms']:>10}{r['p90_ms']:>10}{r['attempts_per_call']:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
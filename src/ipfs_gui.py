@@ -3,6 +3,10 @@
 import os
 import sys
 import shutil
+import time
+
+# 启动计时起点，用于首屏耗时统计
+_STARTUP_T0 = time.perf_counter()
 
 # ============ GUI 相关环境初始化整备 ============ 
 
@@ -86,7 +90,6 @@ for name in [".aleph-im", "logs", "plugins", "kubo"]:
 # 导入所需库
 import tkinter as tk
 from tkinter import messagebox, ttk, filedialog
-from tkinterdnd2 import DND_FILES, TkinterDnD
 import subprocess
 import threading
 import re
@@ -96,17 +99,14 @@ from datetime import datetime
 import webbrowser
 import urllib.parse
 from urllib.parse import urljoin, quote
-import win32gui
-import win32con
-import win32api
-import pywintypes
 import concurrent.futures
 import random
 import shlex
 
 # 导入助手的标准模块（感兴趣你也可以自己定义一些模块，当然我更推荐用 py 脚本放到 plugins 目录下，然后通过插件启动器启动，更方便一些）
-from utils import EmbeddedKubo, IntegratedApp, save_config_file, IPFSCleaner
-from utils.filecoin_pin_uploader import FilecoinPinUploader
+# Kubo / Crust / Filecoin / Aleph 等功能模块在首次使用时才导入，避免拖慢窗口出现；
+# pywin32（托盘）在首次绘制后导入，tkinterdnd2 在 main() 创建根窗口时导入（TkinterDnD.Tk 就是根窗口类，无法更晚）
+from utils.config_utils import save_config_file
 
 # 程序路径处理
 application_path = BASE_DIR
@@ -117,18 +117,21 @@ application_path = BASE_DIR
 class IPFSApp:
     """IPFS 分享助手主应用"""
     
-    WM_TASKBAR = win32con.WM_USER + 1
+    WM_TASKBAR = 0x0400 + 1  # win32con.WM_USER + 1
 
     def __init__(self, root):
         self.root = root
         self.app_path = application_path
         
+        self.startup_timings = {}
+        
         # 初始化基础组件
         self._init_logger()
         self._init_runtime_environment()
         self._load_config()
-        self._init_ipfs()
         self._init_variables()
+        # Kubo 版本检查与守护进程启动放到后台，不阻塞窗口显示
+        self._init_ipfs()
         
         # 设置窗口和UI
         self._setup_window()
@@ -138,15 +141,19 @@ class IPFSApp:
         # 设置窗口几何位置
         self._apply_window_geometry() 
         
+        # 就绪状态显示在状态栏，后台初始化完成后更新
+        self.update_status_label("IPFS 节点启动中...")
+        
         # 延迟设置分隔条位置（确保窗口已完全显示）
         if not self.simple_mode and hasattr(self, 'paned_window'):
             self.root.after(100, self._set_paned_window_position)
         
-        # 系统托盘
-        self.hwnd = self.create_hidden_window()
-        self.create_tray_icon()
+        # 系统托盘在首次绘制后创建（pywin32 延迟导入）
+        self.hwnd = None
         
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self._mark_startup("ui_built")
+        self.root.after_idle(self._on_first_paint)
 
     def update_filecoin_config(self):
         """更新Filecoin配置并保存"""
@@ -199,6 +206,7 @@ class IPFSApp:
         self.runtime_pythonw = self._resolve_runtime_python(prefer_windowed=True)
         self.plugin_window = None
         self.crust_window = None
+        self.crust_app = None
         self.aleph_window = None
         self.filecoin_window = None
 
@@ -243,12 +251,81 @@ class IPFSApp:
         self.proxy = self.config.get('proxy', None)
 
     def _init_ipfs(self):
-        """初始化IPFS相关组件"""
-        auto_update = self.config.get('auto_update_kubo', False)
-        self.kubo = EmbeddedKubo(self.app_path, self.logger, self.repo_path, auto_update)
-        self.kubo.start_daemon()
-        self.actual_api_address = self.config.get('api', self.kubo.api_url)
-        self.logger.info(f"Kubo started. API: {self.actual_api_address}")
+        """在后台初始化IPFS相关组件，就绪前 self.kubo 为 None"""
+        self.kubo = None
+        self.kubo_error = None
+        self.kubo_ready = threading.Event()
+        self.actual_api_address = self.config.get('api')
+        threading.Thread(target=self._init_ipfs_thread, daemon=True).start()
+
+    def _init_ipfs_thread(self):
+        try:
+            from utils.ipfs_embedded_kubo import EmbeddedKubo
+            auto_update = self.config.get('auto_update_kubo', False)
+            kubo = EmbeddedKubo(self.app_path, self.logger, self.repo_path, auto_update)
+            self.kubo = kubo
+            kubo.start_daemon()
+            self.logger.info(f"Kubo started. API: {self.config.get('api', kubo.api_url)}")
+        except Exception as e:
+            self.kubo_error = e
+            self.logger.error(f"Kubo 初始化失败: {e}")
+        finally:
+            self._mark_startup("kubo_ready")
+            self._call_ui(self._on_ipfs_ready)
+
+    def _on_ipfs_ready(self):
+        """后台初始化完成后在 UI 线程更新 API 地址和就绪状态"""
+        self.kubo_ready.set()
+        if self.kubo is None:
+            self.update_status_label(f"IPFS 节点启动失败: {self.kubo_error}")
+            return
+        if not self.actual_api_address and self.kubo.api_url:
+            self.actual_api_address = self.kubo.api_url
+            entry = getattr(self, 'api_entry_advanced', None)
+            try:
+                if entry is not None and entry.winfo_exists() and not entry.get():
+                    entry.insert(0, self.actual_api_address)
+            except tk.TclError:
+                pass
+        if self.kubo.api_url:
+            self.update_status_label(f"IPFS 节点已就绪: {self.kubo.api_url}")
+        else:
+            self.update_status_label("IPFS 节点未能启动，请检查日志")
+
+    def _require_kubo(self):
+        """Kubo 仍在后台启动时提示稍候，返回是否可用"""
+        if self.kubo is not None and self.kubo_ready.is_set():
+            return True
+        if self.kubo_ready.is_set():
+            messagebox.showerror("错误", f"IPFS 节点初始化失败: {self.kubo_error}")
+        else:
+            messagebox.showinfo("提示", "IPFS 节点正在后台启动，请稍候再试")
+        return False
+
+    def _mark_startup(self, phase):
+        """记录启动阶段耗时（毫秒）；设置 IPFS_GUI_STARTUP_TRACE 时追加写入该文件"""
+        elapsed_ms = round((time.perf_counter() - _STARTUP_T0) * 1000, 1)
+        self.startup_timings[phase] = elapsed_ms
+        self.logger.info(f"Startup {phase}: {elapsed_ms} ms")
+        trace_path = os.environ.get("IPFS_GUI_STARTUP_TRACE")
+        if trace_path:
+            try:
+                with open(trace_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"phase": phase, "ms": elapsed_ms, "pid": os.getpid()}) + "\n")
+            except OSError:
+                pass
+
+    def _on_first_paint(self):
+        """主窗口首次绘制完成（事件循环第一次空闲）"""
+        self.root.update_idletasks()
+        self._mark_startup("first_paint")
+        try:
+            self.hwnd = self.create_hidden_window()
+            self.create_tray_icon()
+        except Exception as e:
+            self.logger.error(f"Failed to create tray icon: {e}")
+        if os.environ.get("IPFS_GUI_EXIT_AFTER_PAINT"):
+            self.root.after(0, self.exit_application)
 
     def _init_variables(self):
         """初始化UI变量"""
@@ -472,6 +549,7 @@ class IPFSApp:
 
     def _create_main_inputs_section(self, parent):
         """创建主输入框区域"""
+        from tkinterdnd2 import DND_FILES
         frame = ttk.LabelFrame(parent, text="MAIN INPUTs 主输入框", style='BigTitle.TLabelframe')
         frame.pack(fill="both", expand=True, padx=20, pady=(10, 5))
         
@@ -556,9 +634,26 @@ class IPFSApp:
         ttk.Button(proxy_frame, text="应用此代理", command=self.set_proxy_from_ui).pack(side="right")
         ttk.Label(frame, text="示例: http://127.0.0.1:7879 或 socks5://127.0.0.1:1080 根据自己的代理端口进行设置").pack(anchor="w")
         
+        # Kubo 调优方案
+        self._create_tuning_section(frame)
+        
         # 复选框
         self._create_config_checkboxes(frame)
 
+    def _create_tuning_section(self, parent):
+        """创建 Kubo 调优方案选择区域"""
+        from utils.kubo_profiles import PROFILES
+        ttk.Label(parent, text="7. Kubo 调优方案:").pack(anchor="w", pady=(5, 0))
+        tuning_frame = ttk.Frame(parent)
+        tuning_frame.pack(fill="x", pady=2)
+        self.tuning_profile_names = {info['title']: name for name, info in PROFILES.items()}
+        self.tuning_profile_var = tk.StringVar(value=next(iter(self.tuning_profile_names)))
+        ttk.Combobox(tuning_frame, textvariable=self.tuning_profile_var, state="readonly",
+                     values=list(self.tuning_profile_names)).pack(side="left", fill="x", expand=True)
+        ttk.Button(tuning_frame, text="回滚", command=self.rollback_tuning_profile).pack(side="right")
+        ttk.Button(tuning_frame, text="预览并应用", command=self.apply_tuning_profile).pack(side="right", padx=(5, 2))
+        ttk.Label(parent, text="按用途批量调整连接数、DHT 提供策略、资源上限和 Bitswap 并发, 应用前可预览改动, 重启节点后生效").pack(anchor="w")
+
     def _create_config_checkboxes(self, parent):
         """创建配置复选框"""
         cb_frame = ttk.Frame(parent)
@@ -655,6 +750,7 @@ class IPFSApp:
 
     def _create_cid_calculator_section(self, parent):
         """创建CID计算器区域"""
+        from tkinterdnd2 import DND_FILES
         frame = ttk.LabelFrame(parent, text="CIDs 简易计算器", style='BigTitle.TLabelframe')
         frame.pack(fill="x", padx=20, pady=(10, 10))
         
@@ -775,6 +871,7 @@ class IPFSApp:
 
     def _create_simple_mode_ui_in_container(self):
         """3.1 在容器中创建简洁模式界面"""
+        from tkinterdnd2 import DND_FILES
         # 创建主容器 - 使用grid布局以更好地控制空间分配
         main_container = ttk.Frame(self.simple_container)
         main_container.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -1361,6 +1458,81 @@ class IPFSApp:
         self.save_main_config()
         self.logger.info(f"Auto-update Kubo: {self.auto_update_kubo.get()}")
 
+    def _get_kubo_tuner(self):
+        from utils.kubo_profiles import KuboTuner
+        return KuboTuner(self.kubo.kubo_path, self.kubo.repo_path, self.logger, self._get_subprocess_args())
+
+    def apply_tuning_profile(self):
+        """预览所选调优方案的改动，确认后写入仓库配置"""
+        if not self._require_kubo():
+            return
+        from utils.kubo_profiles import PROFILES, KuboProfileError
+        profile = self.tuning_profile_names.get(self.tuning_profile_var.get())
+        tuner = self._get_kubo_tuner()
+        try:
+            changes = tuner.diff(profile)
+        except KuboProfileError as e:
+            messagebox.showerror("错误", str(e))
+            return
+        if not changes:
+            messagebox.showinfo("提示", tuner.format_diff(changes))
+            return
+        message = f"{PROFILES[profile]['description']}\n\n将修改以下配置:\n{tuner.format_diff(changes, profile)}\n\n确定应用吗？"
+        if not messagebox.askyesno("调优方案预览", message):
+            return
+        restart = bool(self.kubo.process) and messagebox.askyesno("确认", "是否立即重启 IPFS 节点使配置生效？")
+        self._run_tuning_task(lambda: tuner.apply(profile), f"已应用调优方案: {self.tuning_profile_var.get()}", restart)
+
+    def rollback_tuning_profile(self):
+        """恢复调优前的仓库配置"""
+        if not self._require_kubo():
+            return
+        tuner = self._get_kubo_tuner()
+        backup = tuner.load_backup()
+        if not backup:
+            messagebox.showinfo("提示", "没有可回滚的调优记录")
+            return
+        if not messagebox.askyesno("确认", f"将撤销调优方案 {backup.get('profile')} 的全部改动，确定吗？"):
+            return
+        restart = bool(self.kubo.process) and messagebox.askyesno("确认", "是否立即重启 IPFS 节点使配置生效？")
+        self._run_tuning_task(tuner.rollback, "已回滚调优方案", restart)
+
+    def _run_tuning_task(self, task, done_message, restart):
+        def worker():
+            try:
+                changes = task()
+                self.logger.info(f"{done_message}: {changes}")
+                if restart:
+                    self.update_status_label(f"{done_message}，正在重启 IPFS 节点...")
+                    self.kubo.stop_daemon()
+                    self.kubo.start_daemon()
+                    # 重启后 API 端口可能变化
+                    if self.kubo.api_url:
+                        self.actual_api_address = self.kubo.api_url
+                        self._call_ui(self._on_api_address_changed)
+                    self.update_status_label(f"{done_message}，IPFS 节点已重启: {self.kubo.api_url}")
+                else:
+                    self.update_status_label(f"{done_message}，重启 IPFS 节点后生效")
+            except Exception as e:
+                self.logger.error(f"调优方案操作失败: {e}")
+                self._call_ui(messagebox.showerror, "错误", f"调优方案操作失败: {e}")
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_api_address_changed(self):
+        """API 地址变化后同步到界面和已打开的子窗口"""
+        self._show_api_address()
+        if self.crust_app is not None:
+            self.crust_app.cid_calculator.api_address = self.actual_api_address
+
+    def _show_api_address(self):
+        entry = getattr(self, 'api_entry_advanced', None)
+        try:
+            if entry is not None and entry.winfo_exists():
+                entry.delete(0, tk.END)
+                entry.insert(0, self.actual_api_address)
+        except tk.TclError:
+            pass
+
     def set_proxy_from_ui(self):
         """从UI设置代理"""
         proxy = self.proxy_entry_advanced.get().strip()
@@ -1951,6 +2123,8 @@ class IPFSApp:
     
     def calculate_cid_gui(self):
         """计算CID（支持文件和CID转换）"""
+        if not self._require_kubo():
+            return
         items = self._get_text_lines(self.cid_input_text)
         if not items:
             messagebox.showwarning("警告", "请输入文件路径或CID")
@@ -2107,6 +2281,8 @@ class IPFSApp:
     
     def start_execute(self):
         """开始导入"""
+        if not self._require_kubo():
+            return
         self.root.focus_set()
         self.execute_button_advanced.config(state=tk.DISABLED)
         self.stop_button_advanced.config(state=tk.NORMAL)
@@ -2553,6 +2729,8 @@ class IPFSApp:
 
     def start_gc(self):
         """启动垃圾回收"""
+        if not self._require_kubo():
+            return
         if not messagebox.askyesno("确认", "执行清理会解除所有固定的对象并运行垃圾回收。确定继续吗？"):
             return
         
@@ -2561,6 +2739,7 @@ class IPFSApp:
 
     def _execute_gc(self):
         """执行垃圾回收"""
+        from utils.ipfs_cleaner import IPFSCleaner
         success = False
         unpinned = freed = 0
         try:
@@ -2814,6 +2993,9 @@ class IPFSApp:
             self.crust_window.lift()
             self.crust_window.focus_force()
             return
+        if not self._require_kubo():
+            return
+        from utils.ipfs_crust_pinner import IntegratedApp
             
         # 创建窗口
         window = tk.Toplevel(self.root)
@@ -2827,11 +3009,13 @@ class IPFSApp:
         app.cid_calculator.api_address = self.actual_api_address
         app.cid_calculator.repo_dir = self.repo_path
         app.cid_calculator.app_path = self.app_path
+        self.crust_app = app
         
         # 定义窗口关闭回调
         def on_close():
             window.destroy()
             self.crust_window = None
+            self.crust_app = None
 
         window.protocol("WM_DELETE_WINDOW", on_close)
 
@@ -2886,6 +3070,9 @@ class IPFSApp:
             self.filecoin_window.lift()
             self.filecoin_window.focus_force()
             return
+        if not self._require_kubo():
+            return
+        from utils.filecoin_pin_uploader import FilecoinPinUploader
 
         window = tk.Toplevel(self.root)
         self.filecoin_window = window
@@ -2910,7 +3097,13 @@ class IPFSApp:
 
     def open_webui(self):
         """打开WebUI"""
-        parsed = urllib.parse.urlparse(self.actual_api_address)
+        if not self._require_kubo():
+            return
+        api = self.actual_api_address or self.kubo.api_url
+        if not api:
+            messagebox.showerror("错误", "未获取到 IPFS API 地址")
+            return
+        parsed = urllib.parse.urlparse(api)
         webbrowser.open(f"{parsed.scheme}://{parsed.netloc}/webui")
 
     def open_gateway(self):
@@ -3049,6 +3242,8 @@ class IPFSApp:
     
     def create_hidden_window(self):
         """创建隐藏窗口用于托盘消息"""
+        import win32api
+        import win32gui
         wc = win32gui.WNDCLASS()
         wc.hInstance = win32api.GetModuleHandle(None)
         wc.lpszClassName = "IPFSAppTrayWindow"
@@ -3058,6 +3253,8 @@ class IPFSApp:
 
     def wndproc(self, hwnd, msg, wparam, lparam):
         """窗口消息处理"""
+        import win32con
+        import win32gui
         if msg == win32con.WM_DESTROY:
             win32gui.PostQuitMessage(0)
             return 0
@@ -3068,6 +3265,9 @@ class IPFSApp:
 
     def create_tray_icon(self):
         """创建托盘图标"""
+        import pywintypes
+        import win32con
+        import win32gui
         self.tray_icon = None
         if os.path.exists(self.icon_path):
             try:
@@ -3094,6 +3294,8 @@ class IPFSApp:
 
     def show_tray_icon(self):
         """显示托盘图标"""
+        import pywintypes
+        import win32gui
         if self.tray_icon:
             nid = (self.hwnd, 0, win32gui.NIF_ICON | win32gui.NIF_MESSAGE | win32gui.NIF_TIP,
                    self.WM_TASKBAR, self.tray_icon, "IPFS分享助手 v1.2.3-20251204")
@@ -3104,6 +3306,8 @@ class IPFSApp:
 
     def on_tray_icon_command(self, hwnd, msg, wparam, lparam):
         """托盘图标命令处理"""
+        import win32con
+        import win32gui
         if lparam == win32con.WM_LBUTTONUP:
             self.root.deiconify()
             self.root.lift()
@@ -3140,6 +3344,7 @@ class IPFSApp:
 
     def message_loop(self):
         """消息循环"""
+        import win32gui
         msg = win32gui.GetMessage(None, 0, 0)
         while msg[0] != 0:
             win32gui.TranslateMessage(msg)
@@ -3165,14 +3370,16 @@ class IPFSApp:
         
         # 停止 IPFS
         try:
-            if hasattr(self, 'kubo') and self.kubo.process:
+            if getattr(self, 'kubo', None) and self.kubo.process:
                 self.kubo.stop_daemon()
         except Exception as e:
             self.logger.error(f"Error stopping IPFS: {e}")
         
         # 删除托盘图标
         try:
-            win32gui.Shell_NotifyIcon(win32gui.NIM_DELETE, (self.hwnd, 0))
+            if self.hwnd:
+                import win32gui
+                win32gui.Shell_NotifyIcon(win32gui.NIM_DELETE, (self.hwnd, 0))
         except Exception as e:
             self.logger.error(f"Error removing tray icon: {e}")
         
@@ -3280,6 +3487,8 @@ class IPFSApp:
 
 def main():
     """主函数"""
+    import win32gui
+    from tkinterdnd2 import TkinterDnD
     root = TkinterDnD.Tk()
     root.resizable(True, True)
     app = IPFSApp(root)
@@ -1,10 +1,27 @@
 # utils/__init__.py
 
-from .ipfs_embedded_kubo import EmbeddedKubo
-from .ipfs_crust_pinner import IntegratedApp
-from .config_utils import save_config_file
-from .ipfs_cleaner import IPFSCleaner
-from .filecoin_pin_uploader import FilecoinPinUploader
-
-# Aleph 集成功能涉及较重的初始化，按需在调用处懒加载
-__all__ = ['EmbeddedKubo', 'IntegratedApp', 'save_config_file', 'IPFSCleaner', 'FilecoinPinUploader']
+import importlib
+
+# 各功能模块依赖较重（requests、psutil、Crust/Filecoin/Aleph 等），首次访问时才导入
+_LAZY_EXPORTS = {
+    'EmbeddedKubo': '.ipfs_embedded_kubo',
+    'IntegratedApp': '.ipfs_crust_pinner',
+    'save_config_file': '.config_utils',
+    'IPFSCleaner': '.ipfs_cleaner',
+    'FilecoinPinUploader': '.filecoin_pin_uploader',
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,133 @@
+# src\utils\aleph_file_index.py
+
+import json
+import os
+import re
+import threading
+import time
+
+
+class AlephFileIndex:
+    """按账户缓存的 Aleph 文件索引：file_hash -> {item_hash, size, created, type}
+
+    每个账户一个 JSON 文件，写入时先写临时文件再原子替换；
+    增量刷新依赖 file list 按创建时间倒序返回，遇到已从列表确认过的 item_hash 即可停止翻页；
+    本程序 PIN 后直接写入的条目不算"已确认"，避免漏掉在它之前由别处新增的文件。
+    """
+
+    FULL_REFRESH_TTL = 6 * 3600  # seconds, 超过该时间做一次全量刷新以发现外部删除
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._lock = threading.RLock()
+        self._accounts = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, account):
+        safe = re.sub(r'[^\w.-]', '_', account)
+        return os.path.join(self.cache_dir, f"file_index_{safe}.json")
+
+    def _load(self, account):
+        data = self._accounts.get(account)
+        if data is None:
+            data = {'address': None, 'full_refresh_at': 0, 'updated_at': 0, 'files': {}}
+            try:
+                with open(self._path(account), 'r', encoding='utf-8') as f:
+                    data.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+            self._accounts[account] = data
+        return data
+
+    def _save(self, account):
+        data = self._accounts[account]
+        data['updated_at'] = time.time()
+        path = self._path(account)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def has_cache(self, account):
+        with self._lock:
+            return bool(self._load(account)['updated_at'])
+
+    def needs_full_refresh(self, account):
+        with self._lock:
+            return time.time() - self._load(account)['full_refresh_at'] > self.FULL_REFRESH_TTL
+
+    def address(self, account):
+        with self._lock:
+            return self._load(account)['address']
+
+    def lookup(self, account, file_hash):
+        with self._lock:
+            entry = self._load(account)['files'].get(file_hash)
+            return dict(entry) if entry else None
+
+    def listed_item_hashes(self, account):
+        """已经在 file list 结果中出现过的 item_hash"""
+        with self._lock:
+            return {e.get('item_hash') for e in self._load(account)['files'].values() if e.get('listed', True)}
+
+    def items(self, account):
+        """按创建时间倒序返回 [(file_hash, entry)]"""
+        with self._lock:
+            files = self._load(account)['files']
+            return sorted(((h, dict(e)) for h, e in files.items()),
+                          key=lambda x: x[1].get('created') or '', reverse=True)
+
+    @staticmethod
+    def _entry(item):
+        return {
+            'item_hash': item.get('item_hash'),
+            'size': item.get('size'),
+            'created': item.get('created'),
+            'type': item.get('type'),
+            'listed': True,
+        }
+
+    def merge(self, account, files, address=None):
+        """合并一页 file list 结果，返回其中新增的条目数"""
+        with self._lock:
+            data = self._load(account)
+            known = {e.get('item_hash') for e in data['files'].values()}
+            added = 0
+            for item in files:
+                if not item.get('file_hash'):
+                    continue
+                if item.get('item_hash') not in known:
+                    added += 1
+                data['files'][item['file_hash']] = self._entry(item)
+            if address:
+                data['address'] = address
+            self._save(account)
+            return added
+
+    def replace(self, account, files, address=None):
+        """全量刷新结果覆盖本地索引"""
+        with self._lock:
+            data = self._load(account)
+            data['files'] = {item['file_hash']: self._entry(item) for item in files if item.get('file_hash')}
+            if address:
+                data['address'] = address
+            data['full_refresh_at'] = time.time()
+            self._save(account)
+
+    def add(self, account, file_hash, item_hash, size=None, created=None):
+        """本程序 PIN 成功后立即写入，无需重新拉取列表"""
+        with self._lock:
+            data = self._load(account)
+            data['files'][file_hash] = {'item_hash': item_hash, 'size': size, 'created': created,
+                                        'type': 'file', 'listed': False}
+            self._save(account)
+
+    def remove(self, account, file_hash=None, item_hash=None):
+        with self._lock:
+            files = self._load(account)['files']
+            keys = [h for h, e in files.items() if h == file_hash or (item_hash and e.get('item_hash') == item_hash)]
+            for key in keys:
+                del files[key]
+            if keys:
+                self._save(account)
+            return bool(keys)
@@ -11,7 +11,7 @@ import time
 import re
 import json
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
 import base64
 import webbrowser
 import logging
@@ -19,7 +19,13 @@ import runpy
 import io
 import traceback
 import asyncio
+import atexit
+import queue
+import statistics
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 import requests
+from requests.adapters import HTTPAdapter
 
 # ==================== 提前设置 ALEPH_HOME ====================
 def _ensure_aleph_home():
@@ -96,6 +102,10 @@ def _looks_network_error(err):
     return bool(re.search(r"\b5\d{2}\b", err))
 
 from utils import EmbeddedKubo
+from utils.aleph_worker import AlephWorker, AlephWorkerError, is_read_only_command, parse_fast_command
+from utils.aleph_pin_scheduler import AccountPinScheduler
+from utils.aleph_file_index import AlephFileIndex
+from utils.aleph_router import ObservationLog, make_router
 
 # ==================== 全局环境配置 ====================
 class NullWriter:
@@ -140,16 +150,54 @@ class Constants:
     DEFAULT_TIMEOUT = 300
     PIN_INTERVAL = 3  # seconds, 控制所有 PIN 操作的间隔
 
+    # 节点巡检：所有候选节点并发探测，每个节点连续采样多次，整轮受截止时间约束
+    NODE_PROBE_TOP_N = 16
+    NODE_PROBE_SAMPLES = 3
+    NODE_PROBE_TIMEOUT = 2  # seconds, 单次探测超时
+    NODE_PROBE_DEADLINE = 5  # seconds, 一轮探测的总时限
+    NODE_DISCOVERY_TIMEOUT = 10  # seconds
+
+    # 多账户遍历 PIN：每账户一条并行通道，通道内按 PIN_INTERVAL 限速，并共享节点级限速
+    PIN_LANE_BURST = 1
+    PIN_GLOBAL_RATE = 4.0  # 次/秒
+    PIN_GLOBAL_BURST = 4
+    PIN_MAX_LANES = 8
+
+    FILE_LIST_PAGE_SIZE = 100
+
+    # 请求对冲：首选节点超过预测 p90 延迟未返回时，同时请求下一个节点（界面开关，默认关闭）
+    ALEPH_HEDGE_MAX_INFLIGHT = 2
+    ALEPH_HEDGE_DEFAULT_DELAY = 3.0  # seconds, 样本不足时的对冲等待
+    ALEPH_HEDGE_MIN_DELAY = 0.3
+    ALEPH_HEDGE_MAX_DELAY = 15.0
+    # 路由：巡检中响应正常的前 N 个 CCN 参与只读调用的排序
+    ROUTER_MAX_CANDIDATES = 8
+    # 路由策略："ema"（默认）或 "thompson"；离线回放（benchmarks/sim_aleph_routing.py）显示 thompson 优于 EMA 前保持 ema
+    ALEPH_ROUTER = "ema"
+
 # ==================== 智能学习模块 (Machine Learning) ====================
 class NodeIntelligence:
     """
     节点智能学习模块
     利用指数移动平均 (EMA) 算法累积CCN节点性能数据，实现从历史中学习。
     """
+    FLUSH_INTERVAL = 15  # seconds, 有新观测时的落盘间隔
+    STALE_DAYS = 30  # 超过该天数未出现的节点在落盘时淘汰
+    MAX_NODES = 500  # 记忆容量上限，超出时淘汰最久未出现的节点
+    OP_SAMPLES = 32  # 每个节点每类操作保留的最近成功延迟样本数（用于分位数预测）
+
     def __init__(self, config_dir, logger):
         self.history_file = os.path.join(config_dir, "ccn_node_learning_data.json")
         self.logger = logger
+        # 多个 Aleph 调用可能并发记录观测
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._write_lock = threading.Lock()
         self.stats = self._load_stats()
+        self._prune()
+        # 观测只更新内存，由后台定时落盘，退出时再补一次（见 _get_node_intelligence）
+        self._flush_stop = threading.Event()
+        threading.Thread(target=self._flush_loop, daemon=True).start()
         
     def _load_stats(self):
         try:
@@ -159,23 +207,79 @@ class NodeIntelligence:
         except Exception as e:
             self.logger.warning(f"加载节点历史数据失败: {e}")
         return {}
-        
+
+    def _prune(self):
+        """淘汰长期未出现的节点，并把记忆规模限制在 MAX_NODES 以内"""
+        with self._lock:
+            cutoff = time.time() - self.STALE_DAYS * 86400
+            stale = [url for url, node in self.stats.items() if node.get("last_seen", 0) < cutoff]
+            overflow = len(self.stats) - len(stale) - self.MAX_NODES
+            if overflow > 0:
+                stale_set = set(stale)
+                alive = sorted((url for url in self.stats if url not in stale_set),
+                               key=lambda u: self.stats[u].get("last_seen", 0))
+                stale.extend(alive[:overflow])
+            for url in stale:
+                del self.stats[url]
+            if stale:
+                self._dirty = True
+
+    def _flush_loop(self):
+        while not self._flush_stop.wait(self.FLUSH_INTERVAL):
+            self.save_stats()
+
     def save_stats(self):
+        """有未落盘的变化时写入临时文件再原子替换，写到一半崩溃也不会丢失历史"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._prune()
+            # 使用 indent=2 让 JSON 文件更易读
+            payload = json.dumps(self.stats, indent=2)
+            self._dirty = False
+        tmp = f"{self.history_file}.tmp"
         try:
-            with open(self.history_file, 'w') as f:
-                # 使用 indent=2 让 JSON 文件更易读
-                json.dump(self.stats, f, indent=2) 
-        except Exception:
-            pass
+            with self._write_lock:
+                with open(tmp, 'w') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.history_file)
+        except Exception as e:
+            with self._lock:
+                self._dirty = True
+            self.logger.warning(f"保存节点历史数据失败: {e}")
+
+    def close(self):
+        self._flush_stop.set()
+        self.save_stats()
             
-    def record_observation(self, url, latency_ms, is_success=True, name=None):
+    def record_observation(self, url, latency_ms, is_success=True, name=None, op=None):
         """
         【学习核心】记录一次观测结果，并更新预测模型
         :param url: 节点地址
         :param latency_ms: 本次实测延迟 (ms)
         :param is_success: 是否连接成功
         :param name: 节点名称 (例如 'Rick_Sanchez_is_back!*')
+        :param op: 操作类型 (例如 'file pin')，成功时额外记录该操作的延迟样本
         """
+        with self._lock:
+            self._record_observation(url, latency_ms, is_success, name)
+            if op and is_success:
+                samples = self.stats[url].setdefault("op_latency", {}).setdefault(op, [])
+                samples.append(round(latency_ms, 1))
+                del samples[:-self.OP_SAMPLES]
+            self._dirty = True
+
+    def predict_latency_quantile(self, url, op, q=0.9, min_samples=5):
+        """某节点某类操作的延迟分位数预测 (ms)，样本不足时返回 None"""
+        with self._lock:
+            samples = sorted(self.stats.get(url, {}).get("op_latency", {}).get(op, []))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def _record_observation(self, url, latency_ms, is_success, name):
         if url not in self.stats:
             # 初始化新节点记忆
             self.stats[url] = {
@@ -210,8 +314,6 @@ class NodeIntelligence:
             node["fail_count"] += 1
             # 惩罚机制: 连接失败一次，历史评分大幅下降 (延迟预估值增加 1.5 倍)
             node["ema_latency"] = node.get("ema_latency", 1000) * 1.5
-            
-        self.save_stats()
         
     def get_predicted_performance(self, url, is_official=False):
         """
@@ -240,14 +342,82 @@ class NodeIntelligence:
         predicted_score = base_latency * stability_penalty * official_bias
         return predicted_score
 
+_node_intelligence = {}
+_node_intelligence_lock = threading.Lock()
+
+def _get_node_intelligence(config_dir, logger):
+    """同一配置目录共用一个学习模块：重复打开窗口不会多出落盘线程，也不会用旧数据覆盖新数据"""
+    key = os.path.abspath(config_dir)
+    with _node_intelligence_lock:
+        intelligence = _node_intelligence.get(key)
+        if intelligence is None:
+            intelligence = NodeIntelligence(config_dir, logger)
+            atexit.register(intelligence.close)
+            _node_intelligence[key] = intelligence
+        return intelligence
+
 # ==================== 工具类 ====================
-def run_aleph_cli(args, input_text=None):
-    # 优先调用随应用打包的 runtime/python -m aleph_client，确保与插件一致
+_ALEPH_STDERR_IGNORE = ["Could not import library 'magic'", "Consider installing rusty-rlp", "No account type specified", "Detected ETH account"]
+
+def _clean_aleph_stderr(stderr, shorten=True):
+    filtered_lines = [line for line in (stderr or "").splitlines() if not any(keyword in line for keyword in _ALEPH_STDERR_IGNORE)]
+    cleaned = "\n".join(filtered_lines)
+    return _shorten_error(cleaned) if shorten and _looks_network_error(cleaned) else cleaned
+
+_aleph_worker = None
+_aleph_worker_lock = threading.Lock()
+
+def _get_aleph_worker():
+    """常驻 Aleph 工作进程（首次调用时启动），无可用解释器时返回 None"""
+    global _aleph_worker
+    with _aleph_worker_lock:
+        if _aleph_worker is None:
+            runtime_python = _guess_runtime_python()
+            if runtime_python is None and not getattr(sys, 'frozen', False):
+                runtime_python = sys.executable
+            if runtime_python is None:
+                return None
+            _aleph_worker = AlephWorker(runtime_python, popen=SubprocessHelper.popen_command)
+            atexit.register(_aleph_worker.close)
+        return _aleph_worker
+
+_inprocess_cli_lock = threading.Lock()
+
+def run_aleph_cli(args, input_text=None, api_server=None, idempotency_key=None):
+    """
+    执行一条 aleph 命令，返回 (stdout, stderr, rc)
+    :param api_server: 本次调用使用的 API 节点，None 表示 aleph_client 内置默认节点；
+                       节点随调用传递，不修改进程级环境变量，可在不同节点上并发调用
+    :param idempotency_key: 仅工作进程支持；相同 key 的 file pin 复用同一条已签名消息
+    """
+    # 优先交给常驻工作进程执行，省去每条命令启动解释器、导入 aleph_client 的开销
+    worker = _get_aleph_worker()
+    if idempotency_key and (worker is None or worker.disabled):
+        # 换成一次性子进程会重新签名出不同的消息，对冲的 PIN 可能重复提交
+        return "", "Aleph 工作进程不可用，带幂等键的请求不回退执行", 1
+    if worker is not None and not worker.disabled:
+        try:
+            out, err, rc = worker.call(args, input_text, api_host=api_server,
+                                       timeout=Constants.DEFAULT_TIMEOUT, idempotency_key=idempotency_key)
+            return out or "", _clean_aleph_stderr(err), rc
+        except AlephWorkerError as e:
+            # 请求已送达后工作进程退出：写操作可能已执行，不回退重跑
+            if e.delivered and not is_read_only_command(args):
+                return "", f"{e}，写操作可能已提交，未自动重试", 1
+            if idempotency_key:
+                return "", f"{e}，带幂等键的请求不回退执行", 1
+
+    # 工作进程不可用时调用随应用打包的 runtime/python -m aleph_client，确保与插件一致
     runtime_python = _guess_runtime_python()
     if runtime_python and runtime_python.exists():
         env = os.environ.copy()
         env["PYTHONIOENCODING"] = "utf-8"
         env["PYTHONUTF8"] = "1"
+        # 节点只写入子进程的环境副本
+        for key in ("ALEPH_API_SERVER", "ALEPH_API_HOST", "ALEPH_API_URL"):
+            env.pop(key, None)
+        if api_server:
+            env["ALEPH_API_HOST"] = api_server
         proc = SubprocessHelper.run_command(
             [str(runtime_python), "-m", "aleph_client"] + list(args),
             input=input_text or "",
@@ -257,14 +427,13 @@ def run_aleph_cli(args, input_text=None):
             errors="replace",  # 避免控制台编码导致崩溃
             env=env
         )
-        final_stderr = proc.stderr or ""
-        ignore_keywords = ["Could not import library 'magic'", "Consider installing rusty-rlp", "No account type specified", "Detected ETH account"]
-        filtered_lines = [line for line in final_stderr.splitlines() if not any(keyword in line for keyword in ignore_keywords)]
-        final_stderr_cleaned = "\n".join(filtered_lines)
-        final_stderr_cleaned = _shorten_error(final_stderr_cleaned) if _looks_network_error(final_stderr_cleaned) else final_stderr_cleaned
-        return proc.stdout or "", final_stderr_cleaned, proc.returncode
-
-    # 回退方案：在当前解释器内用 runpy 运行 aleph_client
+        return proc.stdout or "", _clean_aleph_stderr(proc.stderr), proc.returncode
+
+    # 回退方案：在当前解释器内用 runpy 运行 aleph_client（替换了全局 stdout/argv，只能串行）
+    with _inprocess_cli_lock:
+        return _run_aleph_cli_inprocess(args, input_text, api_server)
+
+def _run_aleph_cli_inprocess(args, input_text, api_server):
     stdout_buf = io.StringIO()
     stderr_buf = io.StringIO()
     stdin_buf = io.StringIO(input_text) if input_text is not None else io.StringIO("")
@@ -300,6 +469,14 @@ def run_aleph_cli(args, input_text=None):
         logging.getLogger("urllib3").setLevel(logging.ERROR)
 
         try:
+            from aleph.sdk.conf import settings as aleph_settings
+            old_api_host = aleph_settings.API_HOST
+        except ImportError:
+            aleph_settings = old_api_host = None
+
+        try:
+            if aleph_settings is not None and api_server:
+                aleph_settings.API_HOST = api_server
             runpy.run_module("aleph_client.__main__", run_name="__main__")
             returncode = 0
         except SystemExit as e:
@@ -310,6 +487,9 @@ def run_aleph_cli(args, input_text=None):
         except Exception:
             traceback.print_exc(file=stderr_buf)
             returncode = 1
+        finally:
+            if aleph_settings is not None:
+                aleph_settings.API_HOST = old_api_host
 
     finally:
         root_logger.removeHandler(temp_handler)
@@ -319,12 +499,7 @@ def run_aleph_cli(args, input_text=None):
         sys.stderr = old_stderr
         sys.stdin = old_stdin
     
-    final_stderr = stderr_buf.getvalue()
-    ignore_keywords = ["Could not import library 'magic'", "Consider installing rusty-rlp", "No account type specified", "Detected ETH account"]
-    filtered_lines = [line for line in final_stderr.splitlines() if not any(keyword in line for keyword in ignore_keywords)]
-    final_stderr_cleaned = "\n".join(filtered_lines)
-
-    return stdout_buf.getvalue(), final_stderr_cleaned, returncode
+    return stdout_buf.getvalue(), _clean_aleph_stderr(stderr_buf.getvalue(), shorten=False), returncode
 
 class SubprocessHelper:
     @staticmethod
@@ -589,22 +764,51 @@ class AlephManager:
         self.api_endpoints = list(Constants.ALEPH_API_ENDPOINTS)
         self.active_api_endpoint = None
         self.last_success_endpoint = None
+        self.router_candidates = []  # 巡检发现的可用 CCN，参与路由探索
+        self.router = make_router(Constants.ALEPH_ROUTER, official=Constants.ALEPH_API_ENDPOINTS)
+        self._router_lock = threading.Lock()
+        self._probe_session = None
                 
         self.config_manager = AlephConfigManager(app_path, logger)
         self.config_manager.ensure_config_directory()
         
+        # 按账户缓存的文件索引（file_hash -> item_hash）
+        self.file_index = AlephFileIndex(os.path.join(self.config_manager.config_dir, "file_index"))
+
         # 初始化学习模块
-        self.intelligence = NodeIntelligence(self.config_manager.config_dir, logger)
-        # 读取路由状态（记忆上次成功节点）
+        self.intelligence = _get_node_intelligence(self.config_manager.config_dir, logger)
+        # 读取路由状态（上次成功节点 + 路由统计），真实调用结果另记一份日志供离线回放
         self._load_router_state()
+        # 界面选项（请求对冲等），保存在 aleph_settings.json；后台线程只读取普通属性
+        self.settings = self._load_settings()
+        self.hedge_enabled = bool(self.settings.get("hedge_enabled", False))
+        self.observation_log = ObservationLog(os.path.join(self.config_manager.config_dir, "aleph_observations.jsonl"))
         
         self.account_indices = {}
         self.unlinked_indices = {}
         self.active_account_name = None
         self._no_account_warned = False
+        self._closed = threading.Event()
+        self._pin_scheduler = None
         
         self.create_widgets()
         self.start_node_optimization()
+        # 窗口关闭时停止巡检并落盘学习数据
+        self.master.bind('<Destroy>', self._on_destroy, add='+')
+    
+    def _on_destroy(self, event):
+        if event.widget is self.master:
+            self.shutdown()
+    
+    def shutdown(self):
+        """停止节点巡检和遍历 PIN，并立即落盘学习数据；学习模块由各窗口共用，不在此关闭"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        scheduler = self._pin_scheduler
+        if scheduler is not None:
+            scheduler.cancel()
+        threading.Thread(target=self.intelligence.save_stats, daemon=True).start()
     
     def start_node_optimization(self):
         self.logger.info("启动节点智能巡检服务...")
@@ -613,13 +817,87 @@ class AlephManager:
 
     def _node_optimization_loop(self):
         first_run = True
-        while True:
+        while not self._closed.is_set():
             try:
                 self._optimize_nodes_task(is_first_run=first_run)
                 first_run = False
             except Exception as e:
                 self.logger.error(f"节点巡检异常: {e}")
-            time.sleep(300)
+            self._closed.wait(300)
+
+    def _get_probe_session(self):
+        """节点探测共用的 HTTP 会话（连接池大小覆盖一轮并发探测）"""
+        if self._probe_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=Constants.NODE_PROBE_TOP_N + 8,
+                                  pool_maxsize=4)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._probe_session = session
+        return self._probe_session
+
+    def _discover_nodes(self, sources, path):
+        """并发向所有来源请求节点列表，返回 (来源, 节点列表)；全部失败时返回 (None, [])"""
+        session = self._get_probe_session()
+
+        def fetch(base_url):
+            resp = session.get(f"{base_url}{path}", timeout=Constants.NODE_DISCOVERY_TIMEOUT)
+            resp.raise_for_status()
+            return resp.json().get('data', {}).get('corechannel', {}).get('nodes', [])
+
+        executor = ThreadPoolExecutor(max_workers=len(sources))
+        try:
+            futures = {executor.submit(fetch, url): url for url in sources}
+            try:
+                for future in as_completed(futures, timeout=Constants.NODE_DISCOVERY_TIMEOUT + 1):
+                    try:
+                        return futures[future], future.result()
+                    except Exception:
+                        continue
+            except Exception:
+                pass
+            return None, []
+        finally:
+            # 首个成功即返回，不等待其余来源
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _probe_node(self, url, deadline):
+        """对单个节点连续采样，返回每次的延迟 (ms)，失败为 None；首个样本包含建连开销"""
+        session = self._get_probe_session()
+        samples = []
+        for _ in range(Constants.NODE_PROBE_SAMPLES):
+            remaining = deadline - time.time()
+            if remaining <= 0.05:
+                break
+            try:
+                start = time.time()
+                resp = session.get(f"{url}/api/v0/info/public.json",
+                                   timeout=min(Constants.NODE_PROBE_TIMEOUT, remaining))
+                latency = (time.time() - start) * 1000
+                samples.append(latency if resp.status_code == 200 else None)
+            except Exception:
+                samples.append(None)
+            if samples[-1] is None:
+                # 失败后不再继续占用时间
+                break
+        return samples
+
+    def _probe_nodes(self, targets):
+        """并发探测所有目标节点，返回 {url: [样本...]}，整轮在 NODE_PROBE_DEADLINE 内结束"""
+        deadline = time.time() + Constants.NODE_PROBE_DEADLINE
+        results = {}
+        executor = ThreadPoolExecutor(max_workers=max(1, len(targets)))
+        try:
+            futures = {executor.submit(self._probe_node, t['url'], deadline): t['url'] for t in targets}
+            done, _ = wait(futures, timeout=Constants.NODE_PROBE_DEADLINE + 1)
+            for future, url in futures.items():
+                try:
+                    results[url] = future.result() if future in done else []
+                except Exception:
+                    results[url] = []
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
 
     def _optimize_nodes_task(self, is_first_run=False):
         """
@@ -648,23 +926,12 @@ class AlephManager:
             
             discovery_path = "/api/v0/aggregates/0xa1B3bb7d2332383D96b7796B908fB7f7F3c2Be10.json?keys=corechannel&limit=50" # 这是官方的某个钱包路径
             
-            # 轮询尝试获取列表
-            discovery_success = False
-            for base_url in discovery_sources:
-                try:
-                    full_url = f"{base_url}{discovery_path}"
-                    resp = requests.get(full_url, timeout=10)
-                    if resp.status_code == 200:
-                        data = resp.json()
-                        raw_nodes = data.get('data', {}).get('corechannel', {}).get('nodes', [])
-                        discovery_success = True
-                        if not is_first_run: 
-                            self.logger.info(f"从 {base_url} 成功获取到 {len(raw_nodes)} 个节点")
-                        break
-                except Exception:
-                    continue
+            # 同时向所有来源请求，取最先成功的结果
+            source_url, raw_nodes = self._discover_nodes(discovery_sources, discovery_path)
+            if source_url and not is_first_run:
+                self.logger.info(f"从 {source_url} 成功获取到 {len(raw_nodes)} 个节点")
             
-            if not discovery_success:
+            if not source_url:
                 if not is_first_run: self.logger.warning("所有节点无法连接，无法获取网络拓扑")
                 # 即使获取列表失败，仍然继续测试官方节点
             
@@ -696,8 +963,8 @@ class AlephManager:
             # 排序依据：预测延迟 / (Score^2) -> Score越高，分母越大，值越小，排名越前
             candidates.sort(key=lambda x: self.intelligence.get_predicted_performance(x['url'], x['is_official']) / (x['score'] ** 2))
             
-            # 选取 Top 8 个节点进行实测
-            test_targets = candidates[:8]
+            # 选取 Top N 个节点进行实测（并发探测，数量不再受串行耗时限制）
+            test_targets = candidates[:Constants.NODE_PROBE_TOP_N]
             
             # 确保当前节点也在测试列表中
             current_endpoint = self.active_api_endpoint or self.api_endpoints[0]
@@ -709,23 +976,22 @@ class AlephManager:
                     "score": 1.0 # 假设当前节点也是好的
                 })
 
-            # 4. [实测与学习]
+            # 4. [实测与学习] 所有节点并发探测，约一个 RTT + 超时即可完成
             scored_results = []
+            probe_results = self._probe_nodes(test_targets)
             
             for node in test_targets:
                 url = node['url']
-                latency = float('inf')
-                success = False
-                try:
-                    start = time.time()
-                    resp = requests.get(f"{url}/api/v0/info/public.json", timeout=2)
-                    latency = (time.time() - start) * 1000
-                    success = resp.status_code == 200
-                except:
-                    pass
+                samples = probe_results.get(url) or [None]
                 
-                # 【改进】更新记忆 (传入节点名称)
-                self.intelligence.record_observation(url, latency, success, name=node.get('name'))
+                # 【改进】更新记忆：完整样本集都交给学习模块 (传入节点名称)
+                for sample in samples:
+                    self.intelligence.record_observation(url, sample if sample is not None else float('inf'),
+                                                         sample is not None, name=node.get('name'))
+                
+                ok_samples = [x for x in samples if x is not None]
+                success = bool(ok_samples) and samples[-1] is not None
+                latency = statistics.median(ok_samples) if ok_samples else float('inf')
                 
                 if success:
                     # 获取最新的综合评分 (越低越好)
@@ -739,6 +1005,8 @@ class AlephManager:
 
             # 按综合排名分排序
             scored_results.sort(key=lambda x: x[0])
+            # 响应正常的前若干个 CCN 交给路由器，只在只读操作的回退位置被探索
+            self.router_candidates = [n['url'] for _, _, n in scored_results[:Constants.ROUTER_MAX_CANDIDATES]]
             
             best_rank_score, best_latency, best_node = scored_results[0]
             best_url = best_node['url']
@@ -822,6 +1090,10 @@ class AlephManager:
         ttk.Button(btns, text="删除CID", width=8, command=self.delete_cid).pack(side=tk.LEFT, padx=2)
         ttk.Button(btns, text="【PIN到Aleph】", width=12, command=self.pin_cid, style='Accent.TButton').pack(side=tk.LEFT, padx=10)
         ttk.Button(btns, text="【PIN-遍历所有账户】", width=17, command=self.pin_cid_all_accounts).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btns, text="停止遍历", width=8, command=self.stop_pin_all_accounts).pack(side=tk.LEFT, padx=2)
+        self.hedge_var = tk.BooleanVar(value=self.hedge_enabled)
+        ttk.Checkbutton(btns, text="请求对冲", variable=self.hedge_var,
+                        command=self._on_hedge_toggled).pack(side=tk.LEFT, padx=10)
         
         # 日志
         log_frame = ttk.LabelFrame(main, text="操作日志", style='BigTitle.TLabelframe')
@@ -856,6 +1128,33 @@ class AlephManager:
         try: self.master.after(0, _ui)
         except: pass
 
+    def _settings_path(self):
+        return os.path.join(self.config_manager.config_dir, "aleph_settings.json")
+
+    def _load_settings(self):
+        try:
+            with open(self._settings_path(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_settings(self):
+        try:
+            path = self._settings_path()
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.settings, f, indent=2)
+            os.replace(tmp, path)
+        except OSError as exc:
+            self.logger.warning(f"保存 Aleph 设置失败: {exc}")
+
+    def _on_hedge_toggled(self):
+        self.hedge_enabled = bool(self.hedge_var.get())
+        self.settings["hedge_enabled"] = self.hedge_enabled
+        self._save_settings()
+        self.log(f"请求对冲已{'开启' if self.hedge_enabled else '关闭'}")
+
     def _router_state_path(self):
         return os.path.join(self.config_manager.config_dir, "router_state.json")
 
@@ -866,6 +1165,10 @@ class AlephManager:
                 with open(path, "r", encoding="utf-8") as f:
                     data = json.load(f)
                 self.last_success_endpoint = data.get("last_success_endpoint")
+                # 换了路由策略时旧的统计量不适用，从空状态开始
+                if data.get("router_name") == self.router.name:
+                    self.router = make_router(self.router.name, state=data.get("router"),
+                                              official=Constants.ALEPH_API_ENDPOINTS)
         except Exception as exc:
             self.logger.warning(f"读取路由状态失败: {exc}")
 
@@ -873,74 +1176,171 @@ class AlephManager:
         try:
             path = self._router_state_path()
             os.makedirs(os.path.dirname(path), exist_ok=True)
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump({"last_success_endpoint": self.last_success_endpoint}, f)
+            # 并发调用可能同时成功，串行写入临时文件后替换
+            with self._router_lock:
+                tmp = f"{path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"last_success_endpoint": self.last_success_endpoint,
+                               "router_name": self.router.name,
+                               "router": self.router.state()}, f)
+                os.replace(tmp, path)
         except Exception as exc:
             self.logger.warning(f"保存路由状态失败: {exc}")
 
-    def run_aleph_command(self, cmd, input_text=None):
+    def run_aleph_command(self, cmd, input_text=None, endpoints=None):
+        """
+        执行 aleph 命令并在网络错误时按节点回退，成功节点记为下次调用的首选
+        :param endpoints: 指定本次调用的候选节点（按顺序尝试）；默认由路由器按本次抽样排序
+        """
+        with self._router_lock:
+            preferred = self.last_success_endpoint
+        ep, out, err, rc = self._run_on_endpoints(cmd, input_text, endpoints, preferred)
+        if rc == 0:
+            with self._router_lock:
+                self.active_api_endpoint = ep
+                self.last_success_endpoint = ep or "default"
+            self._save_router_state()
+        return out, err, rc
+
+    def _run_on_endpoints(self, cmd, input_text=None, endpoints=None, preferred=None):
+        """
+        run_aleph_command 的执行部分，不读写管理器上的节点状态，返回 (节点, out, err, rc)
+        并发调用方（如遍历 PIN 的各账户通道）各自传入并保存首选节点
+        """
         self.log(f"执行: {cmd}")
         args = cmd.split() if isinstance(cmd, str) else list(cmd)
-        # 基于历史成功的节点做轮替，优先尝试最近成功节点
-        ordered = list(self.api_endpoints or [])
-        if self.last_success_endpoint:
-            le = None if self.last_success_endpoint == "default" else self.last_success_endpoint
-            if le in ordered:
-                ordered = [le] + [e for e in ordered if e != le]
-            elif le:
-                ordered = [le] + ordered
-
-        # 在已有列表末尾追加一个 None，让 aleph_client 使用其内置默认节点（官方负载均衡）作为兜底
-        endpoints = ordered + [None]
-        last_err = ""
+        if endpoints is None:
+            # 巡检选出的节点 + 内置默认节点（None）；发现的 CCN 只参与只读操作的探索，写操作不派往未验证节点
+            op = " ".join(args[:2])
+            candidates = list(self.api_endpoints or [])
+            if op in self.router.read_only_ops:
+                candidates += self.router_candidates
+            candidates = list(dict.fromkeys(candidates + [None]))
+            preferred = None if preferred in (None, "default") else preferred
+            endpoints = self.router.rank(candidates, op, preferred=preferred)
+        else:
+            # 在指定列表末尾追加一个 None，让 aleph_client 使用其内置默认节点（官方负载均衡）作为兜底
+            endpoints = list(endpoints) + [None]
+        hedge, idempotency_key = self._hedge_mode(args)
+        errors = []
         # 外层尝试两轮，防止偶发 503 导致全军覆没
         for attempt in range(2):
-            for idx, ep in enumerate(endpoints, 1):
-                start_ts = time.time()
-                if ep:
-                    # 设置所有可能的环境变量
-                    os.environ["ALEPH_API_SERVER"] = ep
-                    os.environ["ALEPH_API_HOST"] = ep
-                    os.environ["ALEPH_API_URL"] = ep
-                    self.active_api_endpoint = ep
-                else: 
-                    # 清理之
-                    os.environ.pop("ALEPH_API_SERVER", None)
-                    os.environ.pop("ALEPH_API_HOST", None)
-                    os.environ.pop("ALEPH_API_URL", None)
-                    self.active_api_endpoint = None
-                
-                out, err, rc = run_aleph_cli(args, input_text)
-                last_err = err
-
-                # 记录一次真实调用的成功/失败，用于学习评分（用户体验直接驱动）
-                try:
-                    elapsed_ms = max((time.time() - start_ts) * 1000, 1)
-                    is_success = (rc == 0 and not self._is_network_error(err))
-                    node_name = "Official" if ep in Constants.ALEPH_API_ENDPOINTS else ("Default" if ep is None else "Custom")
-                    self.intelligence.record_observation(ep or "default", elapsed_ms, is_success, name=node_name)
-                except Exception:
-                    pass
-
-                if rc == 0 or not self._is_network_error(err):
-                    if rc == 0:
-                        self.last_success_endpoint = ep or "default"
-                        self._save_router_state()
-                        self.log(f"成功节点: {ep or '默认'}")
-                    if out and "--json" not in args: self.log(f"输出: {out}")
-                    if err: self.log(f"信息: {_shorten_error(err)}")
-                    return out, err, rc
-                
-                # 网络错误则尝试下一个节点，同时记录失败原因
-                fail_msg = f"[{idx}/{len(endpoints)}] 节点 {ep or '默认'} 失败: {_shorten_error(err) or '无错误输出'}"
-                self.log(fail_msg)
-                
-                if idx < len(endpoints): time.sleep(1)
+            if hedge:
+                result = self._hedged_pass(args, input_text, endpoints, idempotency_key, errors)
+            else:
+                result = self._sequential_pass(args, input_text, endpoints, errors)
+            if result is not None:
+                ep, out, err, rc = result
+                if rc == 0:
+                    self.log(f"成功节点: {ep or '默认'}")
+                if out and "--json" not in args: self.log(f"输出: {out}")
+                if err: self.log(f"信息: {_shorten_error(err)}")
+                return ep, out, err, rc
             # 一轮失败后再等一秒重试一轮
             time.sleep(1)
         
+        last_err = errors[-1] if errors else ""
         self.log(f"所有节点连接失败，最后错误: {_shorten_error(last_err) or '无'}")
-        return "", "", 1
+        return None, "", "", 1
+
+    def _attempt(self, args, input_text, ep, idempotency_key=None):
+        """在单个节点上执行一次命令，并把结果交给学习模块"""
+        start_ts = time.time()
+        # 节点随本次调用传递，不写入进程级环境变量，多个调用可并发使用不同节点
+        out, err, rc = run_aleph_cli(args, input_text, api_server=ep, idempotency_key=idempotency_key)
+
+        # 记录一次真实调用的成功/失败，用于学习评分（用户体验直接驱动）
+        try:
+            elapsed_ms = max((time.time() - start_ts) * 1000, 1)
+            is_success = (rc == 0 and not self._is_network_error(err))
+            node_name = "Official" if ep in Constants.ALEPH_API_ENDPOINTS else ("Default" if ep is None else "Custom")
+            op = " ".join(args[:2])
+            self.intelligence.record_observation(ep or "default", elapsed_ms, is_success, name=node_name, op=op)
+            self.router.update(ep, op, elapsed_ms, is_success)
+            self.observation_log.append(ep, op, elapsed_ms, is_success)
+        except Exception:
+            pass
+        return out, err, rc
+
+    def _sequential_pass(self, args, input_text, endpoints, errors):
+        """按顺序逐个节点尝试，返回 (节点, out, err, rc)；全部网络失败时返回 None"""
+        for idx, ep in enumerate(endpoints, 1):
+            out, err, rc = self._attempt(args, input_text, ep)
+            if rc == 0 or not self._is_network_error(err):
+                return ep, out, err, rc
+            
+            # 网络错误则尝试下一个节点，同时记录失败原因
+            errors.append(err)
+            fail_msg = f"[{idx}/{len(endpoints)}] 节点 {ep or '默认'} 失败: {_shorten_error(err) or '无错误输出'}"
+            self.log(fail_msg)
+            
+            if idx < len(endpoints): time.sleep(1)
+        return None
+
+    def _hedge_mode(self, args):
+        """
+        判断本次命令能否对冲，返回 (是否对冲, idempotency_key)
+        只读的 file list 可直接对冲；file pin 仅在常驻工作进程可用时对冲，
+        由工作进程对同一 key 只签名一次，各节点广播的是同一条消息
+        """
+        if not self.hedge_enabled:
+            return False, None
+        fast = parse_fast_command(args)
+        if not fast:
+            return False, None
+        kind = fast[0]
+        if kind == "list":
+            return True, None
+        if kind == "pin":
+            worker = _get_aleph_worker()
+            if worker is not None and not worker.disabled:
+                return True, uuid.uuid4().hex
+        return False, None
+
+    def _hedge_delay(self, ep, op):
+        """等待多久后对冲：该节点此类操作的预测 p90 延迟，样本不足时用默认值"""
+        p90 = self.intelligence.predict_latency_quantile(ep or "default", op, 0.9)
+        delay = Constants.ALEPH_HEDGE_DEFAULT_DELAY if p90 is None else p90 / 1000
+        return min(Constants.ALEPH_HEDGE_MAX_DELAY, max(Constants.ALEPH_HEDGE_MIN_DELAY, delay))
+
+    def _hedged_pass(self, args, input_text, endpoints, idempotency_key, errors):
+        """
+        对冲执行：首选节点超过预测 p90 仍未返回时，同时向下一个节点发送请求，先成功者胜出；
+        某个节点网络失败则立即补发下一个节点（不再 sleep）。落败请求的结果只用于学习。
+        """
+        op = " ".join(args[:2])
+        pending = list(endpoints)
+        results = queue.Queue()
+        inflight = []
+
+        def launch():
+            ep = pending.pop(0)
+            inflight.append(ep)
+            threading.Thread(
+                target=lambda: results.put((ep,) + self._attempt(args, input_text, ep, idempotency_key)),
+                daemon=True,
+            ).start()
+            return ep
+
+        launch()
+        while inflight:
+            can_hedge = pending and len(inflight) < Constants.ALEPH_HEDGE_MAX_INFLIGHT
+            delay = self._hedge_delay(inflight[-1], op) if can_hedge else None
+            try:
+                ep, out, err, rc = results.get(timeout=delay)
+            except queue.Empty:
+                slow = inflight[-1]
+                hedged = launch()
+                self.log(f"节点 {slow or '默认'} 超过 {delay * 1000:.0f}ms 未响应，同时请求 {hedged or '默认'}")
+                continue
+            inflight.remove(ep)
+            if rc == 0 or not self._is_network_error(err):
+                return ep, out, err, rc
+            errors.append(err)
+            self.log(f"节点 {ep or '默认'} 失败: {_shorten_error(err) or '无错误输出'}")
+            if pending:
+                launch()
+        return None
 
     def _is_network_error(self, err):
         if not err:
@@ -1203,6 +1603,7 @@ class AlephManager:
         key_file = self._get_selected_key_file()
         if not key_file:
             return messagebox.showerror("错误", "未找到选中账户的密钥文件，无法执行 pin")
+        account = self.account_list_var.get()
         
         def _t():
             for i, c in enumerate(cids):
@@ -1212,7 +1613,9 @@ class AlephManager:
                 
                 if CIDValidator.is_valid_cid(c):
                     out, err, rc = self.run_aleph_command(["file", "pin", c, "--private-key-file", key_file])
-                    if rc == 0: self.log(f"PIN成功: {c}")
+                    if rc == 0:
+                        self._index_pin_result(account, c, out)
+                        self.log(f"PIN成功: {c}")
                     else: self.log(f"PIN失败: {c} - {err}")
                 else: self.log(f"无效CID: {c}")
                 time.sleep(Constants.PIN_INTERVAL)
@@ -1236,38 +1639,154 @@ class AlephManager:
         accounts = list(self.account_combo['values'])
         if not accounts:
             return messagebox.showerror("错误", "未找到任何账户")
+        if self._pin_scheduler is not None:
+            return messagebox.showinfo("提示", "遍历PIN任务正在进行，可先点击“停止遍历”")
 
         rounds = simpledialog.askinteger("遍历轮次", "请输入遍历轮次（默认 1）", initialvalue=1, minvalue=1)
         if not rounds:
             return
 
+        # 各通道并发执行，首选节点按账户分别保存，不改动管理器上的共享节点状态
+        with self._router_lock:
+            shared_preferred = self.last_success_endpoint
+        lane_endpoints = {}
+
+        def pin_one(acc, key_file, c):
+            ep, out, err, rc = self._run_on_endpoints(
+                ["file", "pin", c, "--private-key-file", key_file],
+                preferred=lane_endpoints.get(acc, shared_preferred))
+            if rc == 0:
+                lane_endpoints[acc] = ep or "default"
+                self._index_pin_result(acc, c, out)
+                self.log(f"[{acc}] PIN成功: {c}")
+            else:
+                self.log(f"[{acc}] PIN失败: {c} - {err}")
+            return rc == 0
+
+        def on_progress(summary):
+            if self._closed.is_set():
+                return
+            finished = summary['done'] + summary['failed']
+            msg = (f"遍历PIN: {finished}/{summary['total']} (成功 {summary['done']}, 失败 {summary['failed']}) "
+                   f"| 并行账户 {summary['active']}/{len(summary['lanes'])}")
+            self.master.after(0, lambda: self.status_var.set(msg))
+
+        # 每个账户一条并行通道，通道内按 PIN_INTERVAL 限速，所有通道共享节点级限速
+        # 在界面线程创建并登记，"停止遍历"和关闭窗口都能取消
+        scheduler = AccountPinScheduler(
+            pin_one,
+            lane_rate=1.0 / Constants.PIN_INTERVAL,
+            lane_burst=Constants.PIN_LANE_BURST,
+            global_rate=Constants.PIN_GLOBAL_RATE,
+            global_burst=Constants.PIN_GLOBAL_BURST,
+            max_lanes=Constants.PIN_MAX_LANES,
+            on_progress=on_progress,
+            on_log=self.log,
+        )
+        self._pin_scheduler = scheduler
+
         def _t():
-            for r in range(1, rounds + 1):
-                self.status_var.set(f"开始第 {r}/{rounds} 轮遍历")
+            try:
+                lanes = []
                 for acc in accounts:
                     key_file = self._get_key_file_by_name(acc)
-                    if not key_file:
+                    if key_file:
+                        lanes.append((acc, key_file))
+                    else:
                         self.log(f"跳过账户 {acc}（未找到密钥）")
-                        continue
-                    for i, c in enumerate(cids):
-                        self.status_var.set(f"第{r}/{rounds}轮 - {acc}: PIN ({i+1}/{len(cids)}) {c}")
-                        if CIDValidator.is_valid_cid(c):
-                            out, err, rc = self.run_aleph_command(["file", "pin", c, "--private-key-file", key_file])
-                            if rc == 0:
-                                self.log(f"[{acc}] PIN成功: {c}")
-                            else:
-                                self.log(f"[{acc}] PIN失败: {c} - {err}")
-                        else:
-                            self.log(f"[{acc}] 无效CID: {c}")
-                        time.sleep(Constants.PIN_INTERVAL)
-                if r < rounds:
-                    time.sleep(Constants.PIN_INTERVAL)
-
-            self.status_var.set("遍历PIN任务结束")
+                valid = [c for c in cids if CIDValidator.is_valid_cid(c)]
+                for c in cids:
+                    if c not in valid:
+                        self.log(f"无效CID: {c}")
+                if not lanes or not valid:
+                    self.status_var.set("遍历PIN任务结束")
+                    return
+                self.log(f"开始遍历PIN: {len(lanes)} 个账户 × {len(valid)} 个CID × {rounds} 轮")
+                summary = scheduler.run(lanes, valid, rounds)
+            finally:
+                self._pin_scheduler = None
+            # 路由统计在各次调用中已更新，结束时统一落盘
+            self._save_router_state()
+
+            for acc, lane in summary['lanes'].items():
+                if lane['failures']:
+                    self.log(f"[{acc}] 失败 {len(lane['failures'])} 个: {', '.join(dict.fromkeys(lane['failures']))}")
+            final = f"遍历PIN任务结束: 成功 {summary['done']}, 失败 {summary['failed']}"
+            if any(lane['state'] == 'cancelled' for lane in summary['lanes'].values()):
+                final = f"遍历PIN已停止: 成功 {summary['done']}, 失败 {summary['failed']}"
+            self.log(final)
+            if self._closed.is_set():
+                return
+            self.master.after(0, lambda: self.status_var.set(final))
             self.master.after(0, self.clear_cid)
 
         threading.Thread(target=_t, daemon=True).start()
 
+    def stop_pin_all_accounts(self):
+        """停止遍历 PIN：进行中的 PIN 执行完，尚未开始的不再执行"""
+        scheduler = self._pin_scheduler
+        if scheduler is None:
+            return self.log("没有进行中的遍历PIN任务")
+        scheduler.cancel()
+        self.log("已请求停止遍历PIN，等待进行中的PIN结束...")
+
+    def _fetch_file_page(self, key_file, page):
+        """拉取一页 file list（最新在前），返回 dict；失败抛出 RuntimeError / ValueError"""
+        out, err, rc = self.run_aleph_command([
+            "file", "list", "--json", "--private-key-file", key_file,
+            "--pagination", str(Constants.FILE_LIST_PAGE_SIZE), "--page", str(page),
+        ])
+        if rc != 0:
+            raise RuntimeError(err or "file list 失败")
+        if not out or not out.strip():
+            return {}
+        try:
+            return json.loads(out)
+        except json.JSONDecodeError:
+            raise ValueError(f"返回内容非JSON格式: {out[:200]}")
+
+    def refresh_file_index(self, account, key_file, full=False):
+        """
+        刷新账户的本地文件索引，返回新增条目数
+        增量模式只翻到第一个已确认的条目为止；全量模式（或超过 TTL）拉取全部页并覆盖索引
+        """
+        index = self.file_index
+        full = full or not index.has_cache(account) or index.needs_full_refresh(account)
+        known = set() if full else index.listed_item_hashes(account)
+        collected, address, added = [], None, 0
+        page = 1
+        while True:
+            data = self._fetch_file_page(key_file, page)
+            files = data.get('files', [])
+            address = data.get('address') or address
+            if full:
+                collected.extend(files)
+            else:
+                added += index.merge(account, files, address)
+                if any(f.get('item_hash') in known for f in files):
+                    break
+            total = data.get('pagination_total') or 0
+            per_page = data.get('pagination_per_page') or Constants.FILE_LIST_PAGE_SIZE
+            if len(files) < per_page or (total and page * per_page >= total):
+                break
+            page += 1
+        if full:
+            before = index.listed_item_hashes(account)
+            index.replace(account, collected, address)
+            added = sum(1 for f in collected if f.get('item_hash') not in before)
+        return added
+
+    def _index_pin_result(self, account, cid, out):
+        """PIN 成功后把返回的 StoreMessage 直接写入索引"""
+        try:
+            data = json.loads(out)
+            created = data.get('time')
+            if isinstance(created, (int, float)):
+                created = datetime.fromtimestamp(created, timezone.utc).isoformat()
+            self.file_index.add(account, cid, data.get('item_hash'), created=created)
+        except Exception:
+            pass
+
     def delete_cid(self):
         if not messagebox.askyesno("确认", "删除列表中的CID?"): return
         raw = self.cid_text.get("1.0", tk.END).split("\n")
@@ -1276,67 +1795,76 @@ class AlephManager:
         if not key_file:
             messagebox.showerror("错误", "未找到选中账户的密钥文件，无法删除")
             return
+        account = self.account_list_var.get()
         def _t():
-            self.status_var.set("获取文件列表...")
-            out, err, rc = self.run_aleph_command(["file", "list", "--json", "--private-key-file", key_file])
-            if rc == 0:
-                try:
-                    # 增加空值检查
-                    if not out or not out.strip():
-                        self.log("警告: 获取到的文件列表数据为空")
-                        files = []
+            try:
+                # 先查本地索引，有未命中的 CID 再增量刷新一次
+                if not self.file_index.has_cache(account) or any(not self.file_index.lookup(account, c) for c in cids):
+                    self.status_var.set("更新文件索引...")
+                    self.refresh_file_index(account, key_file)
+                for c in cids:
+                    entry = self.file_index.lookup(account, c)
+                    ih = entry and entry.get('item_hash')
+                    if ih:
+                        out_del, err_del, rc_del = self.run_aleph_command([
+                            "file", "forget", ih, "--private-key-file", key_file
+                        ])
+                        if rc_del == 0:
+                            self.file_index.remove(account, file_hash=c, item_hash=ih)
+                            self.log(f"已删除: {c}")
+                        else: self.log(f"删除失败: {err_del}")
                     else:
-                        files = json.loads(out).get('files', [])
-                    
-                    h_map = {f.get('file_hash'): f.get('item_hash') for f in files}
-                    for c in cids:
-                        ih = h_map.get(c)
-                        if ih:
-                            out_del, err_del, rc_del = self.run_aleph_command([
-                                "file", "forget", ih, "--private-key-file", key_file
-                            ])
-                            if rc_del == 0: self.log(f"已删除: {c}")
-                            else: self.log(f"删除失败: {err_del}")
-                        else:
-                            self.log(f"未在当前账户列表中找到CID: {c}")
-                except json.JSONDecodeError:
-                    self.log(f"解析文件列表失败，返回内容非JSON格式: {out}")
-                except Exception as e:
-                    self.log(f"处理删除任务时出错: {e}")
-            else:
-                self.log(f"获取文件列表失败: {err}")
+                        self.log(f"未在当前账户列表中找到CID: {c}")
+            except ValueError as e:
+                self.log(f"解析文件列表失败，{e}")
+            except RuntimeError as e:
+                self.log(f"获取文件列表失败: {e}")
+            except Exception as e:
+                self.log(f"处理删除任务时出错: {e}")
             
             self.status_var.set("删除任务结束")
-            self.show_file_list()
+            self.show_file_list(refresh=False)
         threading.Thread(target=_t, daemon=True).start()
 
-    def show_file_list(self):
+    def _render_file_list(self, account):
+        items = self.file_index.items(account)
+        lines = [f"--- 文件列表 ({self.file_index.address(account) or account}, 共 {len(items)} 个) ---"]
+        for file_hash, entry in items:
+            sz = (entry.get('size') or 0) / 1024 / 1024
+            lines.append(f"{file_hash} | {sz:.2f}MB" if entry.get('size') is not None else f"{file_hash} | -")
+        lines.append("-" * 30)
+        # 一次性写入日志，大账户也只触发一次界面刷新
+        self.log("\n".join(lines))
+
+    def show_file_list(self, refresh=True):
         key_file = self._get_selected_key_file()
         if not key_file:
             messagebox.showerror("错误", "未找到选中账户的密钥文件，无法获取文件列表")
             return
+        account = self.account_list_var.get()
         def _t():
+            cached = self.file_index.has_cache(account)
+            if cached:
+                # 先用本地索引立即显示，再在后台增量刷新
+                self._render_file_list(account)
+            if not refresh and cached:
+                return
             self.status_var.set("加载列表...")
-            out, err, rc = self.run_aleph_command(["file", "list", "--json", "--private-key-file", key_file])
-            if rc == 0:
-                try:
-                    # 增加空值检查
-                    if not out or not out.strip():
-                        self.log("文件列表为空或未返回数据")
-                    else:
-                        d = json.loads(out)
-                        self.log(f"--- 文件列表 ({d.get('address')}) ---")
-                        for f in d.get('files', []):
-                            sz = f.get('size', 0)/1024/1024
-                            self.log(f"{f.get('file_hash')} | {sz:.2f}MB")
-                        self.log("-" * 30)
-                except json.JSONDecodeError:
-                    self.log(f"解析文件列表JSON失败: {out}")
-                except Exception as e:
-                    self.log(f"显示列表时发生错误: {e}")
+            try:
+                added = self.refresh_file_index(account, key_file)
+                if not cached or added:
+                    if cached:
+                        self.log(f"文件列表有 {added} 个新条目")
+                    self._render_file_list(account)
                 self.status_var.set("列表加载完成")
-            else:
-                self.log(f"刷新列表失败: {err}")
+            except ValueError as e:
+                self.log(f"解析文件列表JSON失败: {e}")
+                self.status_var.set("列表加载失败")
+            except RuntimeError as e:
+                self.log(f"刷新列表失败: {e}")
+                self.status_var.set("列表加载失败")
+            except Exception as e:
+                self.log(f"显示列表时发生错误: {e}")
                 self.status_var.set("列表加载失败")
         threading.Thread(target=_t, daemon=True).start()
 
@@ -0,0 +1,127 @@
+# src\utils\aleph_pin_scheduler.py
+
+import threading
+import time
+
+
+class TokenBucket:
+    """令牌桶限速：平均 rate 个/秒，最多积累 capacity 个令牌"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, cancel_event=None):
+        """阻塞直到取得一个令牌；cancel_event 被置位时返回 False"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+class AccountPinScheduler:
+    """多账户并行 PIN 调度
+
+    每个账户一条通道（线程），通道内按 轮次 × CID 顺序执行；每条通道有独立的令牌桶，
+    所有通道再共享一个节点级令牌桶，以限速替代每次 PIN 之后的固定 sleep。
+    进度通过 on_progress(summary) 汇总报告，summary 含 done/failed/total/active/lanes。
+    """
+
+    def __init__(self, pin_func, lane_rate, lane_burst=1, global_rate=4.0, global_burst=4,
+                 max_lanes=8, on_progress=None, on_log=None):
+        self.pin_func = pin_func  # pin_func(account, key_file, cid) -> bool
+        self.lane_rate = lane_rate
+        self.lane_burst = lane_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.lane_slots = threading.Semaphore(max(1, max_lanes))
+        self.on_progress = on_progress
+        self.on_log = on_log
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self.lanes = {}
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _log(self, message):
+        if self.on_log:
+            self.on_log(message)
+
+    def summary(self):
+        with self._lock:
+            lanes = {name: dict(lane) for name, lane in self.lanes.items()}
+        return {
+            'done': sum(l['done'] for l in lanes.values()),
+            'failed': sum(l['failed'] for l in lanes.values()),
+            'total': sum(l['total'] for l in lanes.values()),
+            'active': sum(1 for l in lanes.values() if l['state'] == 'running'),
+            'lanes': lanes,
+        }
+
+    def _update(self, account, **changes):
+        with self._lock:
+            lane = self.lanes[account]
+            for key, value in changes.items():
+                if key in ('done', 'failed'):
+                    lane[key] += value
+                else:
+                    lane[key] = value
+        if self.on_progress:
+            self.on_progress(self.summary())
+
+    def _run_lane(self, account, key_file, cids, rounds):
+        bucket = TokenBucket(self.lane_rate, self.lane_burst)
+        with self.lane_slots:
+            self._update(account, state='running')
+            for r in range(1, rounds + 1):
+                for cid in cids:
+                    if not bucket.acquire(self._cancel) or not self.global_bucket.acquire(self._cancel):
+                        self._update(account, state='cancelled')
+                        return
+                    self._update(account, round=r, current=cid)
+                    try:
+                        ok = self.pin_func(account, key_file, cid)
+                    except Exception as e:
+                        self._log(f"[{account}] PIN异常: {cid} - {e}")
+                        ok = False
+                    if ok:
+                        self._update(account, done=1)
+                    else:
+                        self._update(account, failed=1)
+                        with self._lock:
+                            self.lanes[account]['failures'].append(cid)
+            self._update(account, state='finished', current=None)
+
+    def run(self, accounts, cids, rounds=1):
+        """accounts 为 [(账户名, 私钥文件)]，阻塞直到所有通道结束，返回汇总"""
+        with self._lock:
+            self.lanes = {
+                account: {'state': 'waiting', 'round': 0, 'current': None, 'done': 0, 'failed': 0,
+                          'total': len(cids) * rounds, 'failures': []}
+                for account, _ in accounts
+            }
+        threads = [
+            threading.Thread(target=self._run_lane, args=(account, key_file, cids, rounds), daemon=True)
+            for account, key_file in accounts
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.summary()
@@ -0,0 +1,287 @@
+# src\utils\aleph_router.py
+
+"""
+Aleph 节点路由策略
+
+EmaRouter 按延迟 EMA 与失败率评分排序，是默认策略。
+ThompsonRouter 按 (节点, 操作) 维护成功率 Beta 后验与对数延迟的正态后验，由抽样决定首选节点；
+探索有界（只在期望耗时接近最优的节点间抽样，未知节点只在只读操作中抽到首位）。
+它在离线回放中尚未稳定优于 EMA，需要时通过 make_router("thompson") 启用。
+StaticRouter 用于离线对比，replay() 用记录下来的观测回放比较不同策略。
+"""
+
+import bisect
+import json
+import math
+import os
+import random
+import threading
+import time
+
+DEFAULT_KEY = "default"  # aleph_client 内置默认节点
+
+
+class ThompsonRouter:
+    """Thompson 采样路由：期望耗时 = 延迟 + 失败率 × 失败代价，越小越优先"""
+
+    name = "thompson"
+    READ_ONLY_OPS = ("file list",)
+
+    def __init__(self, state=None, discount=0.95, prior_log_latency=math.log(1000), prior_var=1.0,
+                 failure_cost_ms=3000.0, explore_ratio=1.2, read_only_ops=READ_ONLY_OPS, seed=None):
+        self.discount = discount
+        self.prior_log_latency = prior_log_latency
+        self.prior_var = prior_var
+        # 一次失败的额外代价：切换到下一个节点的等待与重试
+        self.failure_cost_ms = failure_cost_ms
+        # 抽样值可以把期望耗时不超过最优节点该倍数的节点排到首位
+        self.explore_ratio = explore_ratio
+        # 只有这些操作会把没有数据的节点抽到首位
+        self.read_only_ops = set(read_only_ops)
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        # "节点|操作" -> {s, f, w, sx, sxx}，均为带折扣的累计量
+        self.arms = dict((state or {}).get("arms", {}))
+
+    @staticmethod
+    def _key(endpoint, op):
+        return f"{endpoint or DEFAULT_KEY}|{op or ''}"
+
+    def _pooled_prior(self, op):
+        """同类操作所有节点的平均对数延迟，作为新节点的先验"""
+        suffix = f"|{op or ''}"
+        w = sx = 0.0
+        for key, arm in self.arms.items():
+            if key.endswith(suffix) and arm["w"] > 0:
+                w += arm["w"]
+                sx += arm["sx"]
+        return sx / w if w else self.prior_log_latency
+
+    def _expected(self, arm):
+        """后验期望耗时（不抽样）；没有成功样本的节点返回 None"""
+        if not arm or arm["w"] <= 0:
+            return None
+        p = (1 + arm["s"]) / (2 + arm["s"] + arm["f"])
+        return math.exp(arm["sx"] / arm["w"]) + (1 - p) * self.failure_cost_ms
+
+    def _sample(self, arm, prior_mean):
+        s, f = arm["s"] if arm else 0.0, arm["f"] if arm else 0.0
+        p = self.random.betavariate(1 + s, 1 + f)
+        w = arm["w"] if arm else 0.0
+        if w > 0:
+            mean = arm["sx"] / w
+            var = max(arm["sxx"] / w - mean * mean, 0.01)
+        else:
+            mean, var = prior_mean, self.prior_var
+        # 均值后验：样本越多越集中
+        mu = self.random.gauss(mean, math.sqrt(var / (w + 1)))
+        return math.exp(mu) + (1 - p) * self.failure_cost_ms
+
+    def rank(self, endpoints, op=None, preferred=None):
+        """
+        按本次抽样的期望耗时排序候选节点（None 表示内置默认节点）
+        探索有界：后验期望耗时超过最优节点 explore_ratio 倍的节点不会被抽到首位；
+        没有数据的节点只在只读操作中参与首位抽样，写操作时排在已知节点之后（保持原顺序）
+        """
+        endpoints = list(endpoints)
+        if not endpoints:
+            return []
+        with self._lock:
+            prior = self._pooled_prior(op)
+            expected = [self._expected(self.arms.get(self._key(ep, op))) for ep in endpoints]
+            sampled = [self._sample(self.arms.get(self._key(ep, op)), prior) for ep in endpoints]
+        known = [cost for cost in expected if cost is not None]
+        if not known:
+            # 没有任何数据：调用方给出的首选节点在前，其余按抽样
+            order = sorted(range(len(endpoints)), key=lambda i: (endpoints[i] != preferred, sampled[i]))
+            return [endpoints[i] for i in order]
+        bound = min(known) * self.explore_ratio
+        explore_unknown = op in self.read_only_ops
+
+        def tier(i):
+            if expected[i] is None:
+                return 0 if explore_unknown else 2
+            return 0 if expected[i] <= bound else 1
+
+        order = sorted(range(len(endpoints)), key=lambda i: (tier(i), sampled[i], i))
+        return [endpoints[i] for i in order]
+
+    def update(self, endpoint, op, latency_ms, success):
+        with self._lock:
+            key = self._key(endpoint, op)
+            arm = self.arms.setdefault(key, {"s": 0.0, "f": 0.0, "w": 0.0, "sx": 0.0, "sxx": 0.0})
+            # 折扣旧数据，适应节点状态变化
+            for field in arm:
+                arm[field] *= self.discount
+            if success:
+                arm["s"] += 1
+                x = math.log(max(latency_ms, 1.0))
+                arm["w"] += 1
+                arm["sx"] += x
+                arm["sxx"] += x * x
+            else:
+                arm["f"] += 1
+
+    def state(self):
+        with self._lock:
+            return {"arms": {k: {f: round(v, 6) for f, v in arm.items()} for k, arm in self.arms.items()}}
+
+
+class EmaRouter:
+    """EMA 评分（延迟 EMA × 失败率惩罚 × 官方偏好），默认路由策略"""
+
+    name = "ema"
+    read_only_ops = ThompsonRouter.READ_ONLY_OPS
+
+    def __init__(self, state=None, official=(), alpha=0.3):
+        self.official = set(official)
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        # 节点（默认节点记为 DEFAULT_KEY）-> {ema, fail, total}
+        self.nodes = {k: dict(v) for k, v in (state or {}).get("nodes", {}).items()}
+
+    def _score(self, endpoint):
+        node = self.nodes.get(endpoint or DEFAULT_KEY)
+        is_official = endpoint in self.official or endpoint is None
+        if node is None:
+            return 500 if is_official else 800
+        fail_rate = node["fail"] / node["total"] if node["total"] else 0
+        return node["ema"] * (1.0 + fail_rate * 2.0) * (0.9 if is_official else 1.0)
+
+    def rank(self, endpoints, op=None, preferred=None):
+        with self._lock:
+            return sorted(endpoints, key=self._score)
+
+    def update(self, endpoint, op, latency_ms, success):
+        with self._lock:
+            node = self.nodes.setdefault(endpoint or DEFAULT_KEY,
+                                         {"ema": latency_ms if success else 2000, "fail": 0, "total": 0})
+            node["total"] += 1
+            if success:
+                node["ema"] = node["ema"] * (1 - self.alpha) + latency_ms * self.alpha
+            else:
+                node["fail"] += 1
+                node["ema"] *= 1.5
+
+    def state(self):
+        with self._lock:
+            return {"nodes": {k: {f: round(v, 3) for f, v in node.items()} for k, node in self.nodes.items()}}
+
+
+class StaticRouter:
+    """固定顺序（官方优先），仅用于离线对比"""
+
+    name = "static"
+
+    def rank(self, endpoints, op=None):
+        return list(endpoints)
+
+    def update(self, endpoint, op, latency_ms, success):
+        pass
+
+
+def make_router(name, state=None, official=()):
+    """按名称创建路由器；未知名称退回默认的 EMA"""
+    if name == ThompsonRouter.name:
+        return ThompsonRouter(state=state)
+    return EmaRouter(state=state, official=official)
+
+
+class ObservationLog:
+    """真实调用结果的追加日志（JSON Lines），超过上限时轮换一次，供离线回放"""
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def append(self, endpoint, op, latency_ms, success):
+        record = {"t": round(time.time(), 3), "endpoint": endpoint or DEFAULT_KEY, "op": op,
+                  "latency_ms": round(latency_ms, 1), "success": bool(success)}
+        try:
+            with self._lock:
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, f"{self.path}.1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+        except OSError:
+            pass
+
+
+def load_observations(paths):
+    records = []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+    records.sort(key=lambda r: r.get("t", 0))
+    return records
+
+
+def replay(observations, router, window=600.0, failure_penalty_ms=2000.0, seed=0):
+    """
+    用记录的观测回放路由策略
+    每条观测视为一次调用需求：策略对当时可见的节点排序，按顺序尝试；
+    某节点在该时刻的结果从它在 ±window 秒内的真实观测中随机抽取（没有观测的节点视为不可用）。
+    返回 {calls, first_try_success, success, mean_ms, p50_ms, p90_ms, attempts_per_call}
+    """
+    rng = random.Random(seed)
+    observations = sorted(observations, key=lambda o: o["t"])
+    by_endpoint = {}
+    for obs in observations:
+        by_endpoint.setdefault(obs["endpoint"], []).append(obs)
+    times = {ep: [o["t"] for o in items] for ep, items in by_endpoint.items()}
+
+    def window_of(endpoint, t):
+        ts = times.get(endpoint, ())
+        return by_endpoint.get(endpoint, [])[bisect.bisect_left(ts, t - window):bisect.bisect_right(ts, t + window)]
+
+    def outcome(endpoint, op, t):
+        pool = window_of(endpoint, t)
+        same_op = [o for o in pool if o.get("op") == op]
+        pool = same_op or pool
+        return rng.choice(pool) if pool else None
+
+    costs, first_ok, ok, attempts = [], 0, 0, 0
+    for obs in observations:
+        t, op = obs["t"], obs.get("op")
+        candidates = [None if ep == DEFAULT_KEY else ep for ep in by_endpoint if window_of(ep, t)]
+        cost = 0.0
+        succeeded = False
+        for i, ep in enumerate(router.rank(candidates, op)):
+            result = outcome(ep or DEFAULT_KEY, op, t)
+            if result is None:
+                continue
+            attempts += 1
+            latency = result["latency_ms"]
+            router.update(ep, op, latency, result["success"])
+            if result["success"]:
+                cost += latency
+                succeeded = True
+                first_ok += i == 0
+                break
+            cost += latency + failure_penalty_ms
+        ok += succeeded
+        costs.append(cost)
+
+    costs.sort()
+    n = len(costs)
+
+    def pct(q):
+        return round(costs[min(n - 1, int(q * n))], 1) if n else 0.0
+
+    return {
+        "calls": n,
+        "first_try_success": round(first_ok / n, 4) if n else 0.0,
+        "success": round(ok / n, 4) if n else 0.0,
+        "mean_ms": round(sum(costs) / n, 1) if n else 0.0,
+        "p50_ms": pct(0.5),
+        "p90_ms": pct(0.9),
+        "attempts_per_call": round(attempts / n, 3) if n else 0.0,
+    }
@@ -0,0 +1,467 @@
+# src\utils\aleph_worker.py
+
+"""
+常驻 Aleph 工作进程
+
+主程序只启动一次 runtime/python 运行本文件，之后所有 aleph 命令都以 JSON 行的形式经 stdin 投递，
+结果 (stdout, stderr, rc) 经 stdout 按请求 id 返回，避免每条命令都重新启动解释器并导入 aleph_client。
+
+- file pin / file forget / file list --json：直接调用 SDK，复用按 (私钥文件, API 节点) 缓存的
+  AuthenticatedAlephHttpClient（aiohttp 会话常驻）与已加载的账户，可并发执行
+- 带 idempotency_key 的 file pin：同一个 key 只签名一次 STORE 消息，向不同节点广播的是同一条消息
+  （item_hash 相同），对冲请求不会产生重复 PIN
+- 其余命令：在进程内调用 aleph_client 的 typer 入口，按顺序执行，输出格式与命令行一致
+"""
+
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from pathlib import Path
+
+WORKER_PATH = os.path.abspath(__file__)
+API_ENV_KEYS = ("ALEPH_API_SERVER", "ALEPH_API_HOST", "ALEPH_API_URL")
+
+
+# 只读命令：执行结果不确定时可以安全地重新执行
+READ_ONLY_COMMANDS = {("file", "list"), ("account", "list"), ("account", "show"),
+                      ("account", "address"), ("account", "balance")}
+
+
+def is_read_only_command(args):
+    return tuple(args[:2]) in READ_ONLY_COMMANDS
+
+
+class AlephWorkerError(Exception):
+    """工作进程不可用（启动失败或意外退出）
+
+    delivered 为 False 时请求确定没有到达工作进程，调用方可回退到一次性子进程；
+    为 True 时命令可能已执行，写操作不应重试。
+    """
+
+    def __init__(self, message, delivered=False):
+        super().__init__(message)
+        self.delivered = delivered
+
+
+class AlephWorker:
+    """常驻 Aleph 工作进程的调用端，线程安全"""
+
+    def __init__(self, python_exe, popen=subprocess.Popen, start_timeout=60):
+        self.python_exe = str(python_exe)
+        self.popen = popen
+        self.start_timeout = start_timeout
+        self.disabled = False
+        self._proc = None
+        self._ready = None
+        self._ready_error = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending = {}
+        self._ids = itertools.count(1)
+
+    def _ensure_started(self):
+        if self._proc is not None and self._proc.poll() is None:
+            return
+        if self.disabled:
+            raise AlephWorkerError("Aleph 工作进程已停用")
+        env = os.environ.copy()
+        # 节点由每次调用单独指定，工作进程的默认值保持为 SDK 内置节点
+        for key in API_ENV_KEYS:
+            env.pop(key, None)
+        env["PYTHONIOENCODING"] = "utf-8"
+        env["PYTHONUTF8"] = "1"
+        self._ready = threading.Event()
+        self._ready_error = None
+        try:
+            proc = self.popen(
+                [self.python_exe, "-u", WORKER_PATH],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1,
+                env=env,
+            )
+        except OSError as e:
+            self.disabled = True
+            raise AlephWorkerError(f"无法启动 Aleph 工作进程: {e}")
+        self._proc = proc
+        threading.Thread(target=self._read_loop, args=(proc,), daemon=True).start()
+        if not self._ready.wait(self.start_timeout) or self._ready_error:
+            error = self._ready_error or "启动超时"
+            self._kill(proc)
+            # 启动失败（如 runtime 中缺少 aleph_client）时不再反复尝试
+            self.disabled = True
+            raise AlephWorkerError(f"Aleph 工作进程启动失败: {error}")
+
+    def _read_loop(self, proc):
+        try:
+            for line in proc.stdout:
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue
+                if "ready" in msg:
+                    if not msg["ready"]:
+                        lines = (msg.get("error") or "").strip().splitlines()
+                        self._ready_error = lines[-1] if lines else "未知错误"
+                    self._ready.set()
+                    continue
+                slot = self._pending.pop(msg.get("id"), None)
+                if slot is not None:
+                    slot["result"] = (msg.get("stdout", ""), msg.get("stderr", ""), msg.get("rc", 1))
+                    slot["event"].set()
+        except (OSError, ValueError):
+            pass
+        # 进程退出：唤醒所有等待中的调用
+        if not self._ready.is_set():
+            self._ready_error = self._ready_error or "工作进程已退出"
+            self._ready.set()
+        for key in [k for k, s in list(self._pending.items()) if s["proc"] is proc]:
+            slot = self._pending.pop(key, None)
+            if slot is not None:
+                slot["event"].set()
+
+    def _kill(self, proc):
+        try:
+            proc.kill()
+        except Exception:
+            pass
+
+    def call(self, args, input_text=None, api_host=None, timeout=300, idempotency_key=None):
+        """执行一条 aleph 命令，返回 (stdout, stderr, rc)；工作进程不可用时抛出 AlephWorkerError"""
+        with self._lock:
+            self._ensure_started()
+            proc = self._proc
+            request_id = next(self._ids)
+            slot = {"event": threading.Event(), "result": None, "proc": proc}
+            self._pending[request_id] = slot
+        request = {
+            "id": request_id,
+            "args": list(args),
+            "input": input_text or "",
+            "api_host": api_host,
+            "timeout": timeout,
+            "idempotency_key": idempotency_key,
+        }
+        try:
+            with self._write_lock:
+                proc.stdin.write(json.dumps(request) + "\n")
+                proc.stdin.flush()
+        except (OSError, ValueError) as e:
+            self._pending.pop(request_id, None)
+            raise AlephWorkerError(f"Aleph 工作进程通信失败: {e}")
+
+        # 工作进程内部已按 timeout 取消 SDK 调用，这里多留余量；超时只影响本次调用，
+        # 不结束工作进程（其他进行中的调用照常返回）
+        if not slot["event"].wait(timeout + 10):
+            self._pending.pop(request_id, None)
+            if is_read_only_command(args):
+                return "", f"TimeoutError: Aleph 命令超过 {timeout}s 未返回", 1
+            # 写操作可能已广播，返回非网络类错误，调用方不会换节点重试
+            return "", f"Aleph 写操作超过 {timeout}s 未返回，可能已提交，未自动重试", 1
+        if slot["result"] is None:
+            raise AlephWorkerError("Aleph 工作进程意外退出", delivered=True)
+        return slot["result"]
+
+    def close(self):
+        proc = self._proc
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            with self._write_lock:
+                proc.stdin.write(json.dumps({"op": "shutdown"}) + "\n")
+                proc.stdin.flush()
+            proc.wait(timeout=3)
+        except Exception:
+            self._kill(proc)
+
+
+# ==================== 工作进程端 ====================
+
+FAST_COMMANDS = {
+    # (命令, 子命令): (带值选项, 开关选项)
+    ("file", "pin"): ({"--private-key-file", "--channel", "--ref"}, set()),
+    ("file", "forget"): ({"--private-key-file", "--channel"}, set()),
+    ("file", "list"): ({"--private-key-file", "--pagination", "--page", "--sort-order"}, {"--json"}),
+}
+
+
+def parse_fast_command(args):
+    """识别可走 SDK 快速路径的命令，返回 (kind, positional, options)；不支持时返回 None"""
+    if len(args) < 2 or (args[0], args[1]) not in FAST_COMMANDS:
+        return None
+    value_opts, flag_opts = FAST_COMMANDS[(args[0], args[1])]
+    positional, options = [], {}
+    rest = iter(args[2:])
+    for arg in rest:
+        if arg in value_opts:
+            value = next(rest, None)
+            if value is None:
+                return None
+            options[arg] = value
+        elif arg in flag_opts:
+            options[arg] = True
+        elif arg.startswith("-"):
+            return None
+        else:
+            positional.append(arg)
+    if "--private-key-file" not in options:
+        return None
+    kind = args[1]
+    if kind == "list" and (positional or "--json" not in options):
+        return None
+    if kind == "pin" and len(positional) != 1:
+        return None
+    if kind == "forget" and len(positional) not in (1, 2):
+        return None
+    return kind, positional, options
+
+
+class _WorkerRuntime:
+    def __init__(self):
+        import asyncio
+        import logging
+        from concurrent.futures import ThreadPoolExecutor
+
+        from aleph_client.__main__ import app
+        from aleph.sdk import AuthenticatedAlephHttpClient
+        from aleph.sdk.account import _load_account
+        from aleph.sdk.conf import settings
+        from aleph.sdk.types import StorageEnum
+        from aleph_message.models import ItemHash, MessageType, StoreContent
+
+        self.asyncio = asyncio
+        self.app = app
+        self.client_cls = AuthenticatedAlephHttpClient
+        self.load_account = _load_account
+        self.settings = settings
+        self.storage_ipfs = StorageEnum.ipfs
+        self.item_hash_cls = ItemHash
+        self.store_content_cls = StoreContent
+        self.message_type_store = MessageType.store
+        self.default_api_host = settings.API_HOST
+
+        for name, level in (("magic", logging.ERROR), ("aleph_client", logging.WARNING),
+                            ("aleph", logging.WARNING), ("asyncio", logging.ERROR),
+                            ("aiodns", logging.ERROR), ("urllib3", logging.ERROR)):
+            logging.getLogger(name).setLevel(level)
+
+        self.accounts = {}
+        self.accounts_lock = threading.Lock()
+        self.clients = {}  # 仅在事件循环线程内访问
+        self.signed = OrderedDict()  # idempotency_key -> 签名任务，仅在事件循环线程内访问
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        # 走 typer 入口的命令会替换 sys.stdout 等全局状态，只能逐个执行
+        self.cli_executor = ThreadPoolExecutor(max_workers=1)
+
+    def submit(self, request, send):
+        request_id = request.get("id")
+        args = [str(a) for a in request.get("args", [])]
+
+        def reply(result):
+            out, err, rc = result
+            send({"id": request_id, "stdout": out, "stderr": err, "rc": rc})
+
+        fast = parse_fast_command(args)
+        if fast:
+            future = self.asyncio.run_coroutine_threadsafe(
+                self._run_fast(fast, request.get("api_host"), request.get("timeout") or 300,
+                               request.get("idempotency_key")), self.loop)
+        else:
+            future = self.cli_executor.submit(self._run_cli, args, request.get("input", ""), request.get("api_host"))
+
+        def done(f):
+            try:
+                reply(f.result())
+            except Exception:
+                reply(("", traceback.format_exc(), 1))
+        future.add_done_callback(done)
+
+    def _account(self, key_file):
+        path = os.path.abspath(key_file)
+        stamp = os.stat(path).st_mtime_ns
+        with self.accounts_lock:
+            cached = self.accounts.get(path)
+            if cached and cached[0] == stamp:
+                return cached[1]
+        account = self.load_account(None, Path(path))
+        with self.accounts_lock:
+            self.accounts[path] = (stamp, account)
+        return account
+
+    async def _client(self, key_file, api_host):
+        key = (os.path.abspath(key_file), api_host)
+        client = self.clients.get(key)
+        if client is None:
+            client = self.client_cls(account=self._account(key_file), api_server=api_host)
+            await client.__aenter__()
+            self.clients[key] = client
+        return key, client
+
+    async def _drop_client(self, key):
+        client = self.clients.pop(key, None)
+        if client is not None:
+            try:
+                await client.__aexit__(None, None, None)
+            except Exception:
+                pass
+
+    async def _signed_store(self, idempotency_key, client, file_hash, channel, ref):
+        """同一 idempotency_key 复用同一条已签名的 STORE 消息（与 create_store 构造方式一致）"""
+        task = self.signed.get(idempotency_key)
+        if task is None:
+            values = {
+                "address": self.settings.ADDRESS_TO_USE or client.account.get_address(),
+                "item_type": self.storage_ipfs,
+                "item_hash": file_hash,
+                "time": time.time(),
+            }
+            if ref:
+                values["ref"] = ref
+            content = self.store_content_cls.model_validate(values).model_dump(exclude_none=True)
+            task = self.loop.create_task(client.generate_signed_message(
+                message_type=self.message_type_store, content=content, channel=channel, allow_inlining=True))
+            self.signed[idempotency_key] = task
+            while len(self.signed) > 256:
+                self.signed.popitem(last=False)
+        try:
+            return await self.asyncio.shield(task)
+        except Exception:
+            self.signed.pop(idempotency_key, None)
+            raise
+
+    async def _run_fast(self, fast, api_host, timeout, idempotency_key=None):
+        kind, positional, options = fast
+        api_host = api_host or self.default_api_host
+        key = None
+        try:
+            key, client = await self._client(options["--private-key-file"], api_host)
+            channel = options.get("--channel") or self.settings.DEFAULT_CHANNEL
+            if kind == "pin" and idempotency_key:
+                message = await self.asyncio.wait_for(
+                    self._signed_store(idempotency_key, client, positional[0], channel, options.get("--ref")), timeout)
+                await self.asyncio.wait_for(client._broadcast(message=message, sync=False), timeout)
+                return message.model_dump_json(indent=4) + "\n", "", 0
+            if kind == "pin":
+                coro = client.create_store(file_hash=positional[0], storage_engine=self.storage_ipfs,
+                                           channel=channel, ref=options.get("--ref"))
+                result, _status = await self.asyncio.wait_for(coro, timeout)
+                return result.model_dump_json(indent=4) + "\n", "", 0
+            if kind == "forget":
+                hashes = [self.item_hash_cls(h) for h in positional[0].split(",")]
+                reason = positional[1] if len(positional) > 1 else "User deletion"
+                value = await self.asyncio.wait_for(
+                    client.forget(hashes=hashes, reason=reason, channel=channel), timeout)
+                return value[0].model_dump_json(indent=4) + "\n", "", 0
+            # file list --json
+            address = client.account.get_address()
+            params = {
+                "pagination": int(options.get("--pagination", 100)),
+                "page": int(options.get("--page", 1)),
+                "sort_order": int(options.get("--sort-order", -1)),
+            }
+
+            async def fetch():
+                async with client.http_session.get(f"/api/v0/addresses/{address}/files", params=params) as resp:
+                    if resp.status == 200:
+                        return json.dumps(await resp.json(), indent=4) + "\n"
+                    return f"Failed to retrieve files for address {address}. Status code: {resp.status}\n"
+            return await self.asyncio.wait_for(fetch(), timeout), "", 0
+        except Exception:
+            # 连接可能已损坏，下次调用重建会话
+            if key is not None:
+                await self._drop_client(key)
+            return "", traceback.format_exc(), 1
+
+    def _run_cli(self, args, input_text, api_host):
+        import io
+        import logging
+
+        stdout_buf, stderr_buf = io.StringIO(), io.StringIO()
+        old = (sys.argv, sys.stdout, sys.stderr, sys.stdin)
+        root_logger = logging.getLogger()
+        handler = logging.StreamHandler(stderr_buf)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        root_logger.addHandler(handler)
+        self.settings.API_HOST = api_host or self.default_api_host
+        sys.argv = ["aleph"] + list(args)
+        sys.stdout, sys.stderr, sys.stdin = stdout_buf, stderr_buf, io.StringIO(input_text or "")
+        try:
+            self.app(args=list(args), prog_name="aleph")
+            rc = 0
+        except SystemExit as e:
+            rc = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            traceback.print_exc(file=stderr_buf)
+            rc = 1
+        finally:
+            sys.argv, sys.stdout, sys.stderr, sys.stdin = old
+            root_logger.removeHandler(handler)
+            self.settings.API_HOST = self.default_api_host
+        return stdout_buf.getvalue(), stderr_buf.getvalue(), rc
+
+    def close(self):
+        async def _close_all():
+            for key in list(self.clients):
+                await self._drop_client(key)
+        try:
+            self.asyncio.run_coroutine_threadsafe(_close_all(), self.loop).result(timeout=5)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.cli_executor.shutdown(wait=False)
+
+
+def serve():
+    """工作进程主循环：逐行读取请求，结果按 id 异步写回"""
+    for stream in (sys.stdin, sys.stdout):
+        try:
+            stream.reconfigure(encoding="utf-8")
+        except Exception:
+            pass
+    proto_out = sys.stdout
+    write_lock = threading.Lock()
+
+    def send(msg):
+        with write_lock:
+            proto_out.write(json.dumps(msg) + "\n")
+            proto_out.flush()
+
+    if sys.platform == 'win32':
+        import asyncio
+        try:
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        except Exception:
+            pass
+
+    try:
+        runtime = _WorkerRuntime()
+    except Exception:
+        send({"ready": False, "error": traceback.format_exc()})
+        return 1
+    send({"ready": True, "pid": os.getpid()})
+
+    for line in sys.stdin:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            continue
+        if request.get("op") == "shutdown":
+            break
+        runtime.submit(request, send)
+    runtime.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(serve())
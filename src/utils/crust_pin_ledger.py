@@ -0,0 +1,233 @@
+# src\utils\crust_pin_ledger.py
+
+import sqlite3
+import threading
+import time
+
+
+TERMINAL_STATUSES = ('pinned', 'failed')
+
+
+class PinLedger:
+    """本地固定账本（SQLite），以 (account, cid, requestid) 为主键记录每个固定请求的状态
+
+    未知 requestid（如经 ipfs pin remote add 提交）时以空字符串占位，首次从服务端查到后替换。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pins (
+            account     TEXT NOT NULL,
+            cid         TEXT NOT NULL,
+            requestid   TEXT NOT NULL DEFAULT '',
+            name        TEXT NOT NULL DEFAULT '',
+            status      TEXT NOT NULL DEFAULT 'queued',
+            created     TEXT NOT NULL DEFAULT '',
+            updated_at  REAL NOT NULL,
+            next_check  REAL NOT NULL DEFAULT 0,
+            interval    REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (account, cid, requestid)
+        );
+        CREATE INDEX IF NOT EXISTS idx_pins_due ON pins (status, next_check);
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+
+    def record(self, account, cid, requestid='', name='', status='queued', created='', next_check=None):
+        """新增或更新一条固定记录；拿到真实 requestid 后删除占位记录"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO pins (account, cid, requestid, name, status, created, updated_at, next_check)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (account, cid, requestid) DO UPDATE SET
+                    name = CASE WHEN excluded.name != '' THEN excluded.name ELSE pins.name END,
+                    status = excluded.status,
+                    created = CASE WHEN excluded.created != '' THEN excluded.created ELSE pins.created END,
+                    updated_at = excluded.updated_at
+                """,
+                (account, cid, requestid or '', name or '', status or 'queued', created or '', now,
+                 now if next_check is None else next_check)
+            )
+            if requestid:
+                self._conn.execute(
+                    "DELETE FROM pins WHERE account = ? AND cid = ? AND requestid = ''",
+                    (account, cid)
+                )
+
+    def record_many(self, account, items):
+        for item in items:
+            self.record(account, item['cid'], item.get('requestid', ''), item.get('name', ''),
+                        item.get('status', ''), item.get('created', ''))
+
+    def due(self, now=None, limit=500):
+        """到期需要复查的非终态固定"""
+        now = time.time() if now is None else now
+        placeholders = ','.join('?' * len(TERMINAL_STATUSES))
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT * FROM pins
+                WHERE status NOT IN ({placeholders}) AND next_check <= ?
+                ORDER BY next_check LIMIT ?
+                """,
+                (*TERMINAL_STATUSES, now, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def next_due_time(self):
+        placeholders = ','.join('?' * len(TERMINAL_STATUSES))
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT MIN(next_check) FROM pins WHERE status NOT IN ({placeholders})",
+                TERMINAL_STATUSES
+            ).fetchone()
+        return row[0] if row else None
+
+    def schedule(self, account, cid, requestid, interval):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE pins SET next_check = ?, interval = ? WHERE account = ? AND cid = ? AND requestid = ?",
+                (time.time() + interval, interval, account, cid, requestid or '')
+            )
+
+    def query(self, account=None, status=None, cid=None):
+        """离线查询，按创建时间倒序"""
+        clauses, params = [], []
+        if account is not None:
+            clauses.append("account = ?")
+            params.append(account)
+        if status:
+            statuses = [status] if isinstance(status, str) else list(status)
+            clauses.append(f"status IN ({','.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if cid:
+            clauses.append("cid = ?")
+            params.append(cid)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM pins {where} ORDER BY created DESC, updated_at DESC", params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self, account=None):
+        with self._lock:
+            if account is None:
+                rows = self._conn.execute("SELECT status, COUNT(*) FROM pins GROUP BY status").fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT status, COUNT(*) FROM pins WHERE account = ? GROUP BY status", (account,)
+                ).fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PinStatusPoller:
+    """后台轮询非终态固定的状态变化
+
+    只复查 queued / pinning 等未结束的记录，按 CID 批量查询；状态无变化时复查间隔翻倍
+    （上限 max_interval），发生变化时重置为 min_interval。
+    """
+
+    def __init__(self, ledger, client_for_account, on_transition=None,
+                 min_interval=30.0, max_interval=1800.0, batch_size=10):
+        self.ledger = ledger
+        self.client_for_account = client_for_account  # account -> PinningServiceClient 或 None
+        self.on_transition = on_transition
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止轮询；给出 timeout 时等待后台线程退出（进行中的请求最长等待 timeout 秒）"""
+        self._stop.set()
+        self._wake.set()
+        if timeout is not None and self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def wake(self):
+        """有新的固定记录时立即检查"""
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception:
+                pass
+            next_due = self.ledger.next_due_time()
+            wait = self.max_interval if next_due is None else min(self.max_interval, max(1.0, next_due - time.time()))
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def poll_once(self):
+        rows = self.ledger.due()
+        by_account = {}
+        for row in rows:
+            by_account.setdefault(row['account'], []).append(row)
+        for account, account_rows in by_account.items():
+            client = self.client_for_account(account)
+            if client is None:
+                for row in account_rows:
+                    self.ledger.schedule(account, row['cid'], row['requestid'], self.max_interval)
+                continue
+            for i in range(0, len(account_rows), self.batch_size):
+                if self._stop.is_set():
+                    return
+                self._poll_batch(client, account, account_rows[i:i + self.batch_size])
+
+    def _poll_batch(self, client, account, rows):
+        cids = list(dict.fromkeys(row['cid'] for row in rows))
+        try:
+            data = client.list_pins(cids=cids, status=('queued', 'pinning', 'pinned', 'failed'),
+                                    limit=max(100, len(cids) * 10))
+        except Exception:
+            for row in rows:
+                interval = min(self.max_interval, max(self.min_interval, row['interval'] * 2))
+                self.ledger.schedule(account, row['cid'], row['requestid'], interval)
+            return
+        remote = {}
+        latest_by_cid = {}
+        for item in data.get('results', []):
+            pin = item.get('pin', {})
+            remote[item.get('requestid')] = item
+            current = latest_by_cid.get(pin.get('cid'))
+            if current is None or item.get('created', '') > current.get('created', ''):
+                latest_by_cid[pin.get('cid')] = item
+        for row in rows:
+            item = remote.get(row['requestid']) if row['requestid'] else latest_by_cid.get(row['cid'])
+            if item is None:
+                interval = min(self.max_interval, max(self.min_interval, row['interval'] * 2))
+                self.ledger.schedule(account, row['cid'], row['requestid'], interval)
+                continue
+            new_status = item.get('status', row['status'])
+            requestid = item.get('requestid') or row['requestid']
+            self.ledger.record(account, row['cid'], requestid, item.get('pin', {}).get('name', ''),
+                               new_status, item.get('created', ''))
+            changed = new_status != row['status']
+            interval = self.min_interval if changed else min(
+                self.max_interval, max(self.min_interval, row['interval'] * 2))
+            self.ledger.schedule(account, row['cid'], requestid, interval)
+            if changed and self.on_transition:
+                self.on_transition(account, row['cid'], row['status'], new_status)
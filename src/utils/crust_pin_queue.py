@@ -0,0 +1,145 @@
+# src\utils\crust_pin_queue.py
+
+import queue
+import threading
+
+
+class PinTaskError(Exception):
+    """固定任务失败；retryable=False 时不再重试"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class PinTask:
+    """单个固定任务及其重试状态"""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, cid, filename, message, runner, max_attempts=3):
+        self.cid = cid
+        self.filename = filename
+        self.message = message
+        self.runner = runner            # runner(task) -> 输出文本，失败时抛出异常
+        self.max_attempts = max_attempts
+        self.attempts = 0
+        self.state = self.PENDING
+        self.last_error = None
+        self.result = None
+
+
+class PinWorkQueue:
+    """有界固定工作队列
+
+    生产者线程按队列容量投递任务（队列满时阻塞），固定数量的工作线程并发消费；
+    每个任务记录尝试次数与最后错误，失败按退避重试；cancel() 后未开始的任务标记为已取消。
+    进度通过 on_progress(counts) 回调报告，counts 包含 done/failed/inflight/cancelled/total。
+    """
+
+    def __init__(self, workers, on_progress=None, on_log=None, retry_delay=2.0, maxsize=None):
+        self.workers = max(1, workers)
+        self.on_progress = on_progress
+        self.on_log = on_log
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue(maxsize=maxsize or self.workers * 4)
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self.tasks = []
+        self.counts = {'done': 0, 'failed': 0, 'inflight': 0, 'cancelled': 0, 'total': 0}
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _log(self, message):
+        if self.on_log:
+            self.on_log(message)
+
+    def _update(self, **delta):
+        with self._lock:
+            for key, value in delta.items():
+                self.counts[key] += value
+            snapshot = dict(self.counts)
+        if self.on_progress:
+            self.on_progress(snapshot)
+
+    def _produce(self, tasks):
+        for task in tasks:
+            while not self._cancel.is_set():
+                try:
+                    self._queue.put(task, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+            if self._cancel.is_set():
+                break
+        for _ in range(self.workers):
+            self._queue.put(None)
+
+    def _run_task(self, task):
+        while task.attempts < task.max_attempts:
+            if self._cancel.is_set():
+                return PinTask.CANCELLED
+            task.attempts += 1
+            try:
+                task.result = task.runner(task)
+                return PinTask.DONE
+            except Exception as e:
+                task.last_error = e
+                retryable = getattr(e, 'retryable', True)
+                if not retryable or task.attempts >= task.max_attempts:
+                    break
+                self._log(f"{task.message} 失败，{self.retry_delay * task.attempts:.0f}s 后重试 "
+                          f"({task.attempts}/{task.max_attempts}): {e}")
+                if self._cancel.wait(self.retry_delay * task.attempts):
+                    return PinTask.CANCELLED
+        return PinTask.FAILED
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            if self._cancel.is_set():
+                task.state = PinTask.CANCELLED
+                self._update(cancelled=1)
+                continue
+            task.state = PinTask.RUNNING
+            self._update(inflight=1)
+            state = self._run_task(task)
+            task.state = state
+            if state == PinTask.DONE:
+                self._log(f"成功: {task.message}" + (f" [{task.result}]" if task.result else ""))
+            elif state == PinTask.FAILED:
+                self._log(f"错误: {task.message}: {task.last_error}")
+            self._update(inflight=-1, **{state: 1})
+
+    def run(self, tasks):
+        """阻塞执行全部任务，返回计数快照"""
+        self.tasks = list(tasks)
+        self._update(total=len(self.tasks))
+        producer = threading.Thread(target=self._produce, args=(self.tasks,), daemon=True)
+        producer.start()
+        workers = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for worker in workers:
+            worker.start()
+        producer.join()
+        for worker in workers:
+            worker.join()
+        # 生产者提前退出时，未投递的任务计为已取消
+        undelivered = sum(1 for t in self.tasks if t.state == PinTask.PENDING)
+        for task in self.tasks:
+            if task.state == PinTask.PENDING:
+                task.state = PinTask.CANCELLED
+        if undelivered:
+            self._update(cancelled=undelivered)
+        with self._lock:
+            return dict(self.counts)
@@ -0,0 +1,128 @@
+# src\utils\crust_psa_client.py
+
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PSAError(Exception):
+    """Pinning Service API 请求失败"""
+
+    def __init__(self, message, status_code=None, body=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class PinningServiceClient:
+    """IPFS Pinning Service API 客户端
+
+    复用 keep-alive 连接池，鉴权头只存在于进程内会话中（不出现在命令行参数里）；
+    对 429 / 5xx / 网络异常按指数退避重试，并优先遵循服务端的 Retry-After。
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, base_url, token, pool_size=8, timeout=30, max_retries=5, backoff=1.0, max_backoff=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {token}',
+            'Accept': 'application/json',
+        })
+
+        # 统计：逻辑请求数 / 实际 HTTP 尝试数，用于评估重试放大
+        self._stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'attempts': 0, 'retries': 0, 'throttled': 0}
+
+    def _count(self, key, value=1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(self.max_backoff, max(0.0, float(retry_after)))
+                except ValueError:
+                    pass
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    def request(self, method, path, **kwargs):
+        """发送请求并返回解析后的 JSON；不可重试的错误直接抛出 PSAError"""
+        url = f"{self.base_url}{path}"
+        kwargs.setdefault('timeout', self.timeout)
+        self._count('requests')
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            self._count('attempts')
+            response = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                last_error = PSAError(f"网络错误: {e}")
+            else:
+                if response.status_code < 400:
+                    if not response.content:
+                        return {}
+                    try:
+                        return response.json()
+                    except ValueError:
+                        raise PSAError("响应不是有效的 JSON", response.status_code, response.text)
+                last_error = PSAError(
+                    f"HTTP {response.status_code}: {response.text[:200]}",
+                    response.status_code, response.text
+                )
+                if response.status_code not in self.RETRY_STATUS:
+                    raise last_error
+                if response.status_code == 429:
+                    self._count('throttled')
+            if attempt < self.max_retries:
+                self._count('retries')
+                time.sleep(self._retry_delay(attempt, response))
+        raise last_error
+
+    def add_pin(self, cid, name=None, meta=None):
+        """POST /pins，返回 PinStatus"""
+        payload = {'cid': cid}
+        if name:
+            payload['name'] = name
+        if meta:
+            payload['meta'] = meta
+        return self.request('POST', '/pins', json=payload)
+
+    def list_pins(self, cids=None, name=None, status=None, before=None, after=None, limit=None):
+        """GET /pins，参数均按 PSA 规范传递，返回 {'count': n, 'results': [...]}"""
+        params = {}
+        if cids:
+            params['cid'] = ','.join(cids)
+        if name:
+            params['name'] = name
+        if status:
+            params['status'] = ','.join(status) if isinstance(status, (list, tuple, set)) else status
+        if before:
+            params['before'] = before
+        if after:
+            params['after'] = after
+        if limit:
+            params['limit'] = limit
+        return self.request('GET', '/pins', params=params)
+
+    def get_pin(self, requestid):
+        return self.request('GET', f'/pins/{requestid}')
+
+    def close(self):
+        self.session.close()
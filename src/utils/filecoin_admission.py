@@ -0,0 +1,99 @@
+# src/utils/filecoin_admission.py
+
+import os
+import shutil
+import threading
+from pathlib import Path
+
+
+class DiskSpaceAdmission:
+    """工作目录磁盘空间准入控制
+
+    每个任务在导出 CAR 前按预估峰值占用登记预留；同一磁盘上的可用空间需扣除
+    其他任务尚未写入的预留部分。空间不足时排队等待，任务清理后释放预留并唤醒等待者。
+    """
+
+    def __init__(self, margin_bytes=512 * 1024 * 1024, poll_interval=5.0):
+        self.margin_bytes = margin_bytes
+        self.poll_interval = poll_interval
+        self._cond = threading.Condition()
+        self._reservations = {}  # key -> (volume, work_dir, bytes)
+
+    @staticmethod
+    def _existing_ancestor(path):
+        path = Path(path)
+        while not path.exists() and path.parent != path:
+            path = path.parent
+        return path
+
+    def _volume(self, path):
+        return os.stat(self._existing_ancestor(path)).st_dev
+
+    def free_bytes(self, path):
+        return shutil.disk_usage(self._existing_ancestor(path)).free
+
+    @staticmethod
+    def dir_usage(path):
+        total = 0
+        stack = [str(path)]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            else:
+                                total += entry.stat(follow_symlinks=False).st_size
+                        except OSError:
+                            pass
+            except OSError:
+                pass
+        return total
+
+    def _outstanding(self, volume, exclude=None):
+        """同一磁盘上其他任务尚未落盘的预留字节数"""
+        pending = 0
+        for key, (vol, work_dir, need) in self._reservations.items():
+            if key != exclude and vol == volume:
+                pending += max(0, need - self.dir_usage(work_dir))
+        return pending
+
+    def available(self, work_dir, exclude=None):
+        with self._cond:
+            return self.free_bytes(work_dir) - self._outstanding(self._volume(work_dir), exclude)
+
+    def try_admit(self, key, work_dir, need):
+        with self._cond:
+            volume = self._volume(work_dir)
+            available = self.free_bytes(work_dir) - self._outstanding(volume, exclude=key)
+            if available - self.margin_bytes < need:
+                return False
+            self._reservations[key] = (volume, Path(work_dir), need)
+            return True
+
+    def others_in_flight(self, key):
+        """是否还有其他任务持有预留（等待它们完成才可能腾出空间）"""
+        with self._cond:
+            return any(k != key for k in self._reservations)
+
+    def admit(self, key, work_dir, need, should_stop=None, on_wait=None):
+        """阻塞直到空间足够并完成预留；should_stop() 返回 True 时放弃并返回 False"""
+        with self._cond:
+            while not self.try_admit(key, work_dir, need):
+                if should_stop and should_stop():
+                    return False
+                if on_wait:
+                    on_wait(self.available(work_dir, exclude=key) - self.margin_bytes)
+                self._cond.wait(self.poll_interval)
+            return True
+
+    def release(self, key):
+        with self._cond:
+            if self._reservations.pop(key, None) is not None:
+                self._cond.notify_all()
+
+    def notify(self):
+        """外部释放了空间（如提前删除已上传分块）时唤醒等待者重新检查"""
+        with self._cond:
+            self._cond.notify_all()
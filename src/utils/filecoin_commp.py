@@ -0,0 +1,164 @@
+# src/utils/filecoin_commp.py
+
+"""本地计算 Filecoin 分块的 Piece 承诺（CommP）
+
+流程：按 127 字节分组做 Fr32 填充（每 254 bit 后插入 2 个 0 bit，得到 128 字节），
+再以 32 字节为叶子构建 SHA-256 trunc254 默克尔树，尾部按零子树补齐到 2 的幂。
+结果同时给出 PieceCIDv1（baga...）与 FRC-0069 PieceCIDv2（bafkzcib...）。
+"""
+
+import os
+import mmap
+import base64
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+UNPADDED_CHUNK = 127
+NODE_SIZE = 32
+# 每次处理 127 * 1024 字节，生成 4096 个叶子的子树（高度 12）
+BLOCK_CHUNKS = 1024
+BLOCK_HEIGHT = 12
+
+_MASK_254 = (1 << 254) - 1
+_sha256 = hashlib.sha256
+
+
+def _hash_pair(data):
+    digest = _sha256(data).digest()
+    return digest[:31] + bytes((digest[31] & 0x3F,))
+
+
+def _zero_roots(max_height=64):
+    roots = [bytes(NODE_SIZE)]
+    for _ in range(max_height):
+        roots.append(_hash_pair(roots[-1] * 2))
+    return roots
+
+
+ZERO_ROOTS = _zero_roots()
+
+
+def fr32_pad(data):
+    """对 127 字节整数倍的数据做 Fr32 填充"""
+    out = bytearray()
+    for offset in range(0, len(data), UNPADDED_CHUNK):
+        value = int.from_bytes(data[offset:offset + UNPADDED_CHUNK], "little")
+        for i in range(4):
+            out += ((value >> (254 * i)) & _MASK_254).to_bytes(NODE_SIZE, "little")
+    return bytes(out)
+
+
+def _subtree_root(padded):
+    """完整子树（叶子数为 2 的幂）的根"""
+    level = [padded[i:i + NODE_SIZE] for i in range(0, len(padded), NODE_SIZE)]
+    while len(level) > 1:
+        level = [_hash_pair(level[i] + level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def _push(stack, level, node):
+    while stack and stack[-1][0] == level:
+        node = _hash_pair(stack.pop()[1] + node)
+        level += 1
+    stack.append((level, node))
+
+
+def _finalize(stack, height):
+    """用零子树补齐右侧，得到指定高度的根"""
+    level, node = stack.pop()
+    while stack or level < height:
+        if stack and stack[-1][0] == level:
+            node = _hash_pair(stack.pop()[1] + node)
+        else:
+            node = _hash_pair(node + ZERO_ROOTS[level])
+        level += 1
+    return node
+
+
+def _uvarint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _cid_to_str(raw):
+    return "b" + base64.b32encode(raw).decode("ascii").lower().rstrip("=")
+
+
+def piece_cid_v1(root):
+    # CIDv1 + fil-commitment-unsealed(0xf101) + sha2-256-trunc254-padded(0x1012)
+    return _cid_to_str(b"\x01" + _uvarint(0xF101) + _uvarint(0x1012) + _uvarint(len(root)) + root)
+
+
+def piece_cid_v2(root, height, padding):
+    # CIDv1 + raw(0x55) + fr32-sha256-trunc254-padbintree(0x1011)，摘要为 padding|height|root
+    digest = _uvarint(padding) + bytes((height,)) + root
+    return _cid_to_str(b"\x01" + _uvarint(0x55) + _uvarint(0x1011) + _uvarint(len(digest)) + digest)
+
+
+def piece_geometry(payload_size):
+    """返回 (树高, 填充后分片大小, 未填充域补零字节数)"""
+    chunks = max(1, -(-payload_size // UNPADDED_CHUNK))
+    power = max(0, (chunks - 1).bit_length())
+    height = power + 2
+    unpadded_size = UNPADDED_CHUNK << power
+    return height, NODE_SIZE << height, unpadded_size - payload_size
+
+
+def compute_commp(path):
+    """计算单个文件的 CommP（内存映射读取），返回可直接写入清单的字典"""
+    size = os.path.getsize(path)
+    height, padded_size, padding = piece_geometry(size)
+    stack = []
+    block_bytes = UNPADDED_CHUNK * BLOCK_CHUNKS
+    with open(path, "rb") as fh:
+        view = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        try:
+            offset = 0
+            while offset + block_bytes <= size:
+                _push(stack, BLOCK_HEIGHT, _subtree_root(fr32_pad(view[offset:offset + block_bytes])))
+                offset += block_bytes
+            tail = view[offset:size]
+            if tail or not stack:
+                tail = bytes(tail) + bytes(-len(tail) % UNPADDED_CHUNK if tail else UNPADDED_CHUNK)
+                padded = fr32_pad(tail)
+                for i in range(0, len(padded), NODE_SIZE):
+                    _push(stack, 0, padded[i:i + NODE_SIZE])
+        finally:
+            if size:
+                view.close()
+    root = _finalize(stack, height)
+    return {
+        "payload_size": size,
+        "piece_size": padded_size,
+        "comm_p": root.hex(),
+        "piece_cid_v1": piece_cid_v1(root),
+        "piece_cid_v2": piece_cid_v2(root, height, padding),
+    }
+
+
+def compute_commp_parallel(paths, max_workers=None, on_result=None):
+    """多进程并行计算多个分块的 CommP；on_result(path, result, error) 在主进程中逐个回调"""
+    paths = [str(p) for p in paths]
+    results = {}
+    if not paths:
+        return results
+    max_workers = max(1, min(len(paths), max_workers or os.cpu_count() or 1))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(compute_commp, p): p for p in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result, error = future.result(), None
+            except Exception as exc:
+                result, error = None, exc
+            results[path] = result
+            if on_result:
+                on_result(path, result, error)
+    return results
@@ -0,0 +1,245 @@
+# src/utils/filecoin_manifest.py
+
+import json
+import os
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime
+
+
+class UploadManifest:
+    """Filecoin 上传清单：记录工作目录中每个分块的大小、哈希、上传状态与返回的 Piece/DataSet 信息"""
+
+    FILE_NAME = "filecoin_manifest.json"
+    VERSION = 1
+
+    STATUS_PENDING = "pending"
+    STATUS_UPLOADED = "uploaded"
+    STATUS_FAILED = "failed"
+
+    # filecoin-pin 成功输出中需要记录的字段
+    OUTPUT_FIELDS = {
+        "Piece CID:": "piece_cid",
+        "Piece ID:": "piece_id",
+        "Data Set ID:": "data_set_id",
+        "Provider ID:": "provider_id",
+        "Root CID:": "root_cid",
+        "Direct Download URL:": "download_url",
+    }
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self.data = {"version": self.VERSION, "parts": {}}
+
+    @classmethod
+    def load(cls, directory):
+        """读取目录下的清单，不存在或损坏时返回空清单"""
+        manifest = cls(Path(directory) / cls.FILE_NAME)
+        try:
+            if manifest.path.exists():
+                with open(manifest.path, "r", encoding="utf-8") as fh:
+                    data = json.load(fh)
+                if isinstance(data, dict) and isinstance(data.get("parts"), dict):
+                    manifest.data = data
+        except Exception:
+            pass
+        return manifest
+
+    @classmethod
+    def exists_in(cls, directory):
+        return (Path(directory) / cls.FILE_NAME).exists()
+
+    def save(self):
+        """先写临时文件再替换，避免中途崩溃导致清单损坏"""
+        with self._lock:
+            self.data["updated"] = datetime.now().isoformat(timespec="seconds")
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(self.data, fh, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self.data.get(key, default)
+
+    def set_meta(self, **values):
+        with self._lock:
+            self.data.update(values)
+            self.data.setdefault("created", datetime.now().isoformat(timespec="seconds"))
+        self.save()
+
+    @staticmethod
+    def file_hash(path, block_size=4 * 1024 * 1024):
+        sha = hashlib.sha256()
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(block_size), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    @staticmethod
+    def source_signature(path):
+        """源文件/目录的签名：文件为大小与修改时间，目录为所有文件相对路径、大小、修改时间的摘要"""
+        path = Path(path)
+        stat = path.stat()
+        if not path.is_dir():
+            return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+        sha = hashlib.sha256()
+        total = count = 0
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                item = Path(root) / name
+                try:
+                    st = item.stat()
+                except OSError:
+                    continue
+                rel = item.relative_to(path).as_posix()
+                sha.update(f"{rel}\0{st.st_size}\0{int(st.st_mtime)}\n".encode("utf-8", errors="surrogateescape"))
+                total += st.st_size
+                count += 1
+        return {"size": total, "files": count, "tree": sha.hexdigest()}
+
+    def register_parts(self, parts):
+        """登记分块；大小或修改时间变化的分块重新计算哈希并重置为待上传"""
+        with self._lock:
+            entries = self.data.setdefault("parts", {})
+            for part in parts:
+                part = Path(part)
+                stat = part.stat()
+                entry = entries.get(part.name)
+                if entry and entry.get("size") == stat.st_size and entry.get("mtime") == int(stat.st_mtime):
+                    continue
+                sha = self.file_hash(part)
+                if entry and entry.get("size") == stat.st_size and entry.get("sha256") == sha:
+                    entry["mtime"] = int(stat.st_mtime)
+                    continue
+                entries[part.name] = {
+                    "size": stat.st_size,
+                    "mtime": int(stat.st_mtime),
+                    "sha256": sha,
+                    "status": self.STATUS_PENDING,
+                    "attempts": 0,
+                }
+        self.save()
+
+    def part_entry(self, part):
+        with self._lock:
+            return dict(self.data.get("parts", {}).get(Path(part).name) or {})
+
+    def is_uploaded(self, part):
+        part = Path(part)
+        entry = self.part_entry(part)
+        if entry.get("status") != self.STATUS_UPLOADED:
+            return False
+        try:
+            return part.stat().st_size == entry.get("size")
+        except OSError:
+            # 已确认上传的分块即使本地已删除也无需重传
+            return True
+
+    def pending_parts(self, parts):
+        return [p for p in parts if not self.is_uploaded(p)]
+
+    def update_part(self, part, **values):
+        with self._lock:
+            entry = self.data.setdefault("parts", {}).setdefault(Path(part).name, {})
+            entry.update(values)
+        self.save()
+
+    def mark_attempt(self, part):
+        with self._lock:
+            entry = self.data.setdefault("parts", {}).setdefault(Path(part).name, {})
+            entry["attempts"] = int(entry.get("attempts", 0)) + 1
+        self.save()
+
+    def mark_result(self, part, success, output_lines=None):
+        values = {"status": self.STATUS_UPLOADED if success else self.STATUS_FAILED}
+        if success:
+            values["uploaded_at"] = datetime.now().isoformat(timespec="seconds")
+            values.update(self.parse_upload_output(output_lines or []))
+        with self._lock:
+            if not success and self.part_entry(part).get("status") == self.STATUS_UPLOADED:
+                # 推测性重传的落后副本失败时，不覆盖已确认的结果
+                return
+            self.update_part(part, **values)
+
+    @classmethod
+    def parse_upload_output(cls, lines):
+        """从 filecoin-pin 输出中提取 Piece CID / Data Set ID 等字段"""
+        info = {}
+        for line in lines:
+            stripped = line.strip()
+            for prefix, key in cls.OUTPUT_FIELDS.items():
+                if stripped.startswith(prefix):
+                    value = stripped[len(prefix):].strip()
+                    if value:
+                        info[key] = value
+        return info
+
+    def counts(self):
+        with self._lock:
+            result = {self.STATUS_PENDING: 0, self.STATUS_UPLOADED: 0, self.STATUS_FAILED: 0}
+            for entry in self.data.get("parts", {}).values():
+                status = entry.get("status", self.STATUS_PENDING)
+                result[status] = result.get(status, 0) + 1
+            return result
+
+    def is_complete(self):
+        counts = self.counts()
+        return bool(self.data.get("parts")) and counts[self.STATUS_UPLOADED] == sum(counts.values())
+
+
+class PieceIndex:
+    """跨任务保存已上传分块的 Piece CID，工作目录清理后仍可识别重复分块
+
+    条目按作用域（网络 + 钱包）区分：calibration 上传过的分块在 mainnet 上仍需上传；
+    旧版本未带作用域的条目不会命中。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self.pieces = {}
+        try:
+            if self.path.exists():
+                with open(self.path, "r", encoding="utf-8") as fh:
+                    data = json.load(fh)
+                if isinstance(data, dict):
+                    self.pieces = data
+        except Exception:
+            self.pieces = {}
+
+    @staticmethod
+    def scope_of(network, wallet_key):
+        """网络 + 钱包私钥摘要（不保存私钥本身）"""
+        digest = hashlib.sha256((wallet_key or "").encode("utf-8")).hexdigest()[:16]
+        return f"{network or 'mainnet'}:{digest}"
+
+    @staticmethod
+    def _key(scope, piece_cid):
+        return f"{scope}|{piece_cid}"
+
+    def lookup(self, scope, *piece_cids):
+        if not scope:
+            return None
+        with self._lock:
+            for piece_cid in piece_cids:
+                key = self._key(scope, piece_cid)
+                if piece_cid and key in self.pieces:
+                    return dict(self.pieces[key])
+        return None
+
+    def add(self, scope, piece_cids, info):
+        piece_cids = [c for c in piece_cids if c]
+        if not scope or not piece_cids:
+            return
+        with self._lock:
+            for piece_cid in piece_cids:
+                self.pieces[self._key(scope, piece_cid)] = dict(info, scope=scope)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(self.pieces, fh, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
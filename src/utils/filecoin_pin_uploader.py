@@ -13,14 +13,25 @@ import time
 import hashlib
 import re
 import math
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import heapq
+import json
+from glob import escape as glob_escape
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from utils.config_utils import load_config_file, save_config_file
+from utils.filecoin_manifest import UploadManifest, PieceIndex
+from utils.filecoin_commp import compute_commp_parallel
+from utils.filecoin_admission import DiskSpaceAdmission
 
 
 class FilecoinPinUploader:
     """基于 filecoin-pin.exe 的分块上传器"""
 
+    LOG_BUFFER_LINES = 5000   # 每个线程保留的日志行数
+    LOG_VIEW_LINES = 2000     # 日志框最多显示的行数
+    LOG_FLUSH_MS = 100        # 日志合并刷新间隔
+
     def __init__(self, master, app):
         self.master = master
         self.app = app
@@ -39,6 +50,7 @@ class FilecoinPinUploader:
         self.threshold_var = tk.IntVar(value=200)       # MB
         self.thread_count_var = tk.IntVar(value=8)
         self.auto_cleanup_var = tk.BooleanVar(value=True)
+        self.local_commp_var = tk.BooleanVar(value=True)
         self.key_button_text = tk.StringVar(value="写入config文件")
         self.cid_var = tk.StringVar()
         self.status_var = tk.StringVar(value="准备就绪")
@@ -47,7 +59,12 @@ class FilecoinPinUploader:
         self.network_var = tk.StringVar(value="mainnet")
         # 占位符控制开关（当前已取消占位符，但保持标志避免调用错误）
         self.placeholder_active = False
-        self.log_entries = []
+        # 按线程分别保存的环形日志缓冲：thread_id -> deque[(序号, 文本)]
+        self.log_buffers = {}
+        self.log_pending = deque(maxlen=self.LOG_VIEW_LINES)
+        self.log_seq = 0
+        self._log_flush_scheduled = False
+        self._log_needs_full_render = False
         self.log_filter_var = tk.StringVar(value="全部")
         self.cid_lines = []
 
@@ -57,6 +74,9 @@ class FilecoinPinUploader:
         self.use_source_dir = tk.BooleanVar(value=False)
         self.work_root = Path(self.app.app_path) / "output" / "filecoin-pin"
         self.work_root_var = tk.StringVar(value=str(self.work_root))
+        # 已上传分块的 Piece CID 索引不随工作目录清理而删除
+        self.piece_index = PieceIndex(Path(self.app.app_path) / "output" / "filecoin_piece_index.json")
+        self.admission = DiskSpaceAdmission()
 
         self._build_ui()
         self._load_key_from_config()
@@ -197,6 +217,12 @@ class FilecoinPinUploader:
             text="上传后自动清理 CAR、分块文件并运行 repo gc",
             variable=self.auto_cleanup_var
         ).pack(anchor="w", padx=5, pady=(0, 5))
+        ttk.Checkbutton(
+            car_frame,
+            text="上传前本地计算 Piece CID（跳过已上传过的分块）",
+            variable=self.local_commp_var,
+            command=self._save_workdir_settings
+        ).pack(anchor="w", padx=5, pady=(0, 5))
 
         workdir_row = ttk.Frame(car_frame)
         workdir_row.pack(fill="x", padx=5, pady=(0, 5))
@@ -311,6 +337,8 @@ class FilecoinPinUploader:
                         self.work_root_var.set(data["filecoin_work_root"])
                     if "filecoin_use_source_dir" in data:
                         self.use_source_dir.set(bool(data["filecoin_use_source_dir"]))
+                    if "filecoin_local_commp" in data:
+                        self.local_commp_var.set(bool(data["filecoin_local_commp"]))
                     if data.get("filecoin_network") in ("mainnet", "calibration"):
                         self.network_var.set(data["filecoin_network"])
         except Exception:
@@ -337,6 +365,7 @@ class FilecoinPinUploader:
         data = load_config_file(str(self.config_path)) if self.config_path.exists() else {}
         data["filecoin_work_root"] = self.work_root_var.get()
         data["filecoin_use_source_dir"] = self.use_source_dir.get()
+        data["filecoin_local_commp"] = self.local_commp_var.get()
         data["filecoin_network"] = self.network_var.get()
         save_config_file(str(self.config_path), data, self.app.logger)
         self.work_root = Path(self.work_root_var.get())
@@ -512,9 +541,19 @@ class FilecoinPinUploader:
         self._append_log("已请求停止")
 
     def _run_upload_existing_parts(self, files, private_key):
-        total = len(files)
+        files = sorted(p for p in files if not p.name.startswith(UploadManifest.FILE_NAME))
         try:
-            success = self._upload_parts_concurrent(sorted(files), private_key)
+            if not files:
+                self._append_log("目录中没有可上传的分块（只有清单文件）")
+                self._set_status("没有可上传的分块")
+                return
+            # 读取（或新建）目录下的上传清单，已确认上传的分块直接跳过
+            manifest = UploadManifest.load(files[0].parent)
+            if manifest:
+                self._set_status("校验分块清单...")
+                manifest.register_parts(files)
+                self._compute_piece_commitments(manifest, files, private_key)
+            success = self._upload_parts_concurrent(files, private_key, manifest=manifest)
             if not success:
                 raise RuntimeError("部分文件上传失败")
             self._set_status("上传完成")
@@ -582,21 +621,41 @@ class FilecoinPinUploader:
         cid = None
         if not source_path.exists():
             raise FileNotFoundError(f"路径不存在: {source_path}")
-        work_dir, base_root = self._prepare_work_dir(source_path)
+        resume = self._find_resumable_upload(source_path) if do_upload else None
+        if resume:
+            work_dir, base_root, manifest = resume
+        else:
+            work_dir, base_root = self._prepare_work_dir(source_path)
+            manifest = UploadManifest.load(work_dir)
         upload_success = False
 
         try:
-            cid = self._ipfs_add(source_path)
-            self._set_status("导出 CAR 中...")
-            car_path = self._export_car(cid, work_dir, source_path)
-            car_path, car_parts = self._maybe_split(car_path, chunk_size, threshold)
+            if resume:
+                cid, car_path, car_parts = self._resume_from_manifest(manifest, work_dir)
+            else:
+                cid = self._ipfs_add(source_path)
+                self._admit_work_dir(cid, work_dir, source_path, threshold)
+                self._set_status("导出 CAR 中...")
+                car_path = self._export_car(cid, work_dir, source_path)
+                car_path, car_parts = self._maybe_split(car_path, chunk_size, threshold)
+                self._set_status("记录分块清单...")
+                manifest.set_meta(
+                    source=str(source_path),
+                    source_signature=UploadManifest.source_signature(source_path),
+                    root_cid=cid,
+                    car_name=car_path.name,
+                    parts_dir=os.path.relpath(car_parts[0].parent, work_dir) if car_parts else ".",
+                )
+                manifest.register_parts(car_parts)
+            if do_upload:
+                self._compute_piece_commitments(manifest, car_parts, private_key)
             created_files.append(car_path)
             # 仅记录实际需要上传的分块（不重复计入原始 CAR）
             created_files.extend([p for p in car_parts if p not in created_files])
 
             if do_upload:
                 self._set_status(f"开始上传到 Filecoin... (并行最多{max(1, min(16, self.thread_count_var.get()))}个)")
-                success = self._upload_parts_concurrent(car_parts, private_key)
+                success = self._upload_parts_concurrent(car_parts, private_key, manifest=manifest, delete_uploaded=do_cleanup)
                 if not success:
                     raise RuntimeError("部分分块上传失败")
                 # 确保 filecoin-pin 进程完全结束后再清理
@@ -618,11 +677,185 @@ class FilecoinPinUploader:
                     self._append_log(f"清理阶段出现问题: {exc}")
             elif do_cleanup and not upload_success:
                 self._append_log("上传未完成，跳过清理以保留调试数据", log_to_file=False)
+            # 清理完成（或保留数据）后释放空间预留，唤醒排队中的任务
+            self.admission.release(str(work_dir))
             if manage_ui:
                 self._update_progress(0)
                 self.app._call_ui(lambda: self._set_controls_active(True))
         return upload_success
 
+    def _estimate_car_size(self, cid, source_path):
+        """通过 dag stat / files stat 预估导出的 CAR 大小，失败时退回源文件大小"""
+        base = [self.app.kubo.kubo_path, "--repo-dir", self.app.repo_path]
+        args = self.app._get_subprocess_args()
+        size, blocks = None, 0
+        try:
+            result = subprocess.run(
+                base + ["dag", "stat", "--progress=false", "--enc=json", cid],
+                capture_output=True, text=True, encoding="utf-8", errors="ignore", timeout=120, **args
+            )
+            if result.returncode == 0 and result.stdout.strip():
+                data = json.loads(result.stdout.strip().splitlines()[-1])
+                size = data.get("TotalSize", data.get("Size"))
+                blocks = data.get("UniqueBlocks", data.get("NumBlocks", 0)) or 0
+        except Exception:
+            size = None
+        if not size:
+            try:
+                result = subprocess.run(
+                    base + ["files", "stat", "--format=<cumulsize>", f"/ipfs/{cid}"],
+                    capture_output=True, text=True, encoding="utf-8", errors="ignore", timeout=120, **args
+                )
+                if result.returncode == 0:
+                    size = int(result.stdout.strip())
+            except Exception:
+                size = None
+        if not size:
+            size = source_path.stat().st_size if source_path.is_file() else DiskSpaceAdmission.dir_usage(source_path)
+        # CAR 中每个块额外携带长度前缀与 CID
+        return int(size) + int(blocks) * 48 + 1024
+
+    def _will_split(self, size, threshold):
+        """与 _maybe_split 的判断保持一致"""
+        size_mb = size / (1024 * 1024)
+        if size > threshold * 1024 * 1024:
+            return True
+        threads = max(1, min(16, self.thread_count_var.get()))
+        return max(10, math.ceil(size_mb / threads)) < size_mb
+
+    def _admit_work_dir(self, cid, work_dir, source_path, threshold):
+        """导出前按预估峰值占用（分块时原 CAR 与分块同时存在）预留工作目录空间
+
+        只有其他任务仍持有预留时才排队等待；没有任务能释放空间时直接报空间不足。
+        """
+        estimate = self._estimate_car_size(cid, source_path)
+        need = estimate * 2 if self._will_split(estimate, threshold) else estimate
+        key = str(work_dir)
+        if self.admission.try_admit(key, work_dir, need):
+            return
+        self._release_finished_work_dirs(exclude=work_dir)
+        if self.admission.try_admit(key, work_dir, need):
+            return
+
+        def insufficient():
+            available = self.admission.available(work_dir, exclude=key) - self.admission.margin_bytes
+            return RuntimeError(
+                f"工作目录磁盘空间不足：预计需要 {self._format_size(need)}，"
+                f"可用 {self._format_size(max(0, available))}，请清理磁盘或更换工作目录"
+            )
+
+        if not self.admission.others_in_flight(key):
+            raise insufficient()
+        self._append_log(f"工作目录磁盘空间不足，预计需要 {self._format_size(need)}，等待其他任务释放空间...")
+
+        def on_wait(available):
+            self._set_status(f"等待磁盘空间：需要 {self._format_size(need)}，可用 {self._format_size(max(0, available))}")
+
+        admitted = self.admission.admit(
+            key, work_dir, need,
+            should_stop=lambda: self.stop_flag or not self.admission.others_in_flight(key),
+            on_wait=on_wait,
+        )
+        if admitted:
+            self._append_log("磁盘空间已满足，继续导出 CAR")
+        elif self.stop_flag:
+            raise RuntimeError("已停止：等待磁盘空间时被取消")
+        else:
+            raise insufficient()
+
+    def _release_finished_work_dirs(self, exclude=None):
+        """自动清理开启时，删除清单已全部上传完成的遗留工作目录以释放空间（含原文件目录下的临时目录）"""
+        if not self.auto_cleanup_var.get():
+            return
+        source_roots = [Path(r) for r in self._source_work_roots()]
+        for root in [Path(self.work_root_var.get())] + source_roots:
+            if not root.is_dir():
+                continue
+            for work_dir in root.iterdir():
+                if work_dir == exclude or not work_dir.is_dir() or not UploadManifest.exists_in(work_dir):
+                    continue
+                if UploadManifest.load(work_dir).is_complete() and self._force_remove_path(work_dir):
+                    self._append_log(f"已删除上传完成的遗留工作目录: {work_dir}", log_to_file=False)
+        # 原文件目录下已清空的临时根目录一并删除，并停止跟踪
+        remaining = []
+        for root in source_roots:
+            try:
+                if root.is_dir() and not any(root.iterdir()):
+                    self._force_remove_path(root)
+            except OSError:
+                pass
+            if root.exists():
+                remaining.append(str(root))
+        if len(remaining) != len(source_roots):
+            self._set_source_work_roots(remaining)
+        self.admission.notify()
+
+    def _source_work_roots(self):
+        """使用原文件目录时创建的临时根目录（filecoin-pin_temp_*），保存在配置中以便跨会话回收"""
+        try:
+            data = load_config_file(str(self.config_path)) if self.config_path.exists() else {}
+            roots = data.get("filecoin_source_work_roots") if isinstance(data, dict) else None
+            return [r for r in roots if isinstance(r, str)] if isinstance(roots, list) else []
+        except Exception:
+            return []
+
+    def _set_source_work_roots(self, roots):
+        data = load_config_file(str(self.config_path)) if self.config_path.exists() else {}
+        data["filecoin_source_work_roots"] = list(dict.fromkeys(roots))
+        save_config_file(str(self.config_path), data, self.app.logger)
+
+    def _work_dir_candidates(self, source_path):
+        """列出可能保存该源文件未完成任务的工作目录"""
+        safe_name = self._sanitize_name(source_path.stem if source_path.is_file() else source_path.name or "export")
+        roots = [Path(self.work_root_var.get())]
+        if self.use_source_dir.get():
+            roots = sorted(source_path.parent.glob("filecoin-pin_temp_*"), reverse=True)
+        candidates = []
+        for root in roots:
+            if root.is_dir():
+                candidates.extend(sorted(root.glob(f"{glob_escape(safe_name)}-*"), reverse=True))
+        return [c for c in candidates if c.is_dir() and UploadManifest.exists_in(c)]
+
+    def _find_resumable_upload(self, source_path):
+        """查找同一源文件的未完成清单，且源文件自导出后未改动、待上传分块均仍在本地"""
+        try:
+            signature = None
+            for work_dir in self._work_dir_candidates(source_path):
+                manifest = UploadManifest.load(work_dir)
+                if manifest.get("source") != str(source_path) or not manifest.get("root_cid"):
+                    continue
+                if manifest.is_complete():
+                    continue
+                if signature is None:
+                    signature = UploadManifest.source_signature(source_path)
+                if manifest.get("source_signature") != signature:
+                    self._append_log(f"源文件已改动（或清单缺少源文件签名），不续传旧的 CAR: {work_dir}")
+                    continue
+                parts_dir = work_dir / manifest.get("parts_dir", ".")
+                parts = [parts_dir / name for name in sorted(manifest.get("parts", {}))]
+                if not parts or not all(p.exists() for p in manifest.pending_parts(parts)):
+                    continue
+                base_root = work_dir.parent
+                return work_dir, base_root, manifest
+        except Exception as exc:
+            self._append_log(f"读取上传清单失败，重新开始: {exc}", log_to_file=False)
+        return None
+
+    def _resume_from_manifest(self, manifest, work_dir):
+        cid = manifest.get("root_cid")
+        parts_dir = work_dir / manifest.get("parts_dir", ".")
+        car_path = parts_dir / manifest.get("car_name", "000.car")
+        car_parts = [parts_dir / name for name in sorted(manifest.get("parts", {}))]
+        counts = manifest.counts()
+        self.app._call_ui(lambda: self.cid_var.set(cid))
+        self._add_cid_entry(cid)
+        self._append_log(f"检测到未完成的上传清单: {work_dir}")
+        self._append_log(
+            f"跳过导入/导出/分块，已确认 {counts[UploadManifest.STATUS_UPLOADED]}/{len(car_parts)} 个分块，仅上传剩余部分"
+        )
+        self._update_progress(45)
+        return cid, car_path, car_parts
+
     def cleanup_all_temp(self):
         """手动清理 filecoin-pin 工作目录下的所有临时文件/空目录"""
         try:
@@ -781,7 +1014,7 @@ class FilecoinPinUploader:
             self._append_log(f"移动 CAR 到短路径失败: {exc}")
             return car_path
 
-    def _upload_car(self, car_path, private_key, idx, total, slot=None):
+    def _upload_car(self, car_path, private_key, idx, total, slot=None, cancel_event=None):
         label = f"[{idx}/{total}] 上传 {car_path.name}"
         self._set_status(label)
         self._log_part(idx, label, slot)
@@ -806,6 +1039,8 @@ class FilecoinPinUploader:
             **args
         )
         self.current_process = proc
+        if cancel_event is not None:
+            threading.Thread(target=self._watch_cancel, args=(proc, cancel_event), daemon=True).start()
         success = False
         output_lines = []
         try:
@@ -814,6 +1049,10 @@ class FilecoinPinUploader:
                     proc.terminate()
                     self._log_part(idx, "上传被手动停止", slot)
                     break
+                if cancel_event is not None and cancel_event.is_set():
+                    proc.terminate()
+                    self._log_part(idx, "其他槽位已完成该分块，终止本次上传", slot)
+                    break
                 text = line.rstrip()
                 output_lines.append(text)
                 self._log_part(idx, text, slot)
@@ -839,12 +1078,34 @@ class FilecoinPinUploader:
             self._log_part(idx, f"{car_path.name} 上传失败，返回码 {rc}", slot)
         return success, output_lines
 
-    def _upload_with_retry(self, car_path, private_key, idx, total, max_retries=5, show_status=True, slot=None):
-        """带重试的上传逻辑"""
+    def _watch_cancel(self, proc, cancel_event):
+        """进程无输出时也能及时响应取消/停止"""
+        while proc.poll() is None:
+            if cancel_event.wait(0.5) or self.stop_flag:
+                try:
+                    if proc.poll() is None:
+                        proc.terminate()
+                except Exception:
+                    pass
+                return
+
+    def _upload_with_retry(self, car_path, private_key, idx, total, max_retries=5, show_status=True, slot=None,
+                           manifest=None, cancel_event=None):
+        """带重试的上传逻辑，结果写入上传清单；cancel_event 置位时放弃（其他槽位已成功）"""
         for attempt in range(1, max_retries + 1):
+            if cancel_event is not None and cancel_event.is_set():
+                return False
             if show_status:
                 self._set_status(f"[{idx}/{total}] 上传 {car_path.name} - 尝试 {attempt}/{max_retries}")
-            success, _ = self._upload_car(car_path, private_key, idx, total, slot)
+            if manifest:
+                manifest.mark_attempt(car_path)
+            success, output_lines = self._upload_car(car_path, private_key, idx, total, slot, cancel_event)
+            if not success and cancel_event is not None and cancel_event.is_set():
+                return False
+            if manifest:
+                manifest.mark_result(car_path, success, output_lines)
+                if success:
+                    self._record_uploaded_piece(manifest, car_path, private_key, idx, slot)
             if success:
                 return True
             if self.stop_flag:
@@ -854,76 +1115,253 @@ class FilecoinPinUploader:
                 time.sleep(1.5)
         return False
 
-    def _upload_parts_concurrent(self, car_parts, private_key):
-        """并行上传分块（最多16线程，取决于设置），提供聚合进度"""
+    def _piece_scope(self, private_key):
+        """已上传索引的作用域：同一网络、同一钱包上传过的分块才可跳过"""
+        return PieceIndex.scope_of(self.network_var.get(), private_key)
+
+    def _compute_piece_commitments(self, manifest, parts, private_key):
+        """多进程计算尚无本地 Piece CID 的分块，命中已上传索引（同网络同钱包）的分块在清单中标记为已上传"""
+        if not self.local_commp_var.get():
+            return
+        scope = self._piece_scope(private_key)
+        todo = [p for p in parts if not manifest.is_uploaded(p) and not manifest.part_entry(p).get("local_piece_cid")]
+        if not todo:
+            return
+        workers = max(1, min(len(todo), os.cpu_count() or 1))
+        self._set_status(f"本地计算 Piece CID ({len(todo)} 个分块，{workers} 进程)...")
+        by_path = {str(p): p for p in todo}
+        done = {"count": 0}
+
+        def on_result(path, result, error):
+            part = by_path[path]
+            done["count"] += 1
+            self._set_status(f"本地计算 Piece CID {done['count']}/{len(todo)}")
+            if error or not result:
+                self._append_log(f"{part.name} Piece CID 计算失败: {error}", log_to_file=False)
+                return
+            manifest.update_part(
+                part,
+                local_piece_cid=result["piece_cid_v2"],
+                local_piece_cid_v1=result["piece_cid_v1"],
+                comm_p=result["comm_p"],
+                piece_size=result["piece_size"],
+            )
+            known = self.piece_index.lookup(scope, result["piece_cid_v2"], result["piece_cid_v1"])
+            if known:
+                values = {k: v for k, v in known.items() if k in ("piece_cid", "piece_id", "data_set_id", "provider_id")}
+                manifest.update_part(part, status=UploadManifest.STATUS_UPLOADED, skipped_by="piece_index", **values)
+                self._append_log(f"{part.name} 的 Piece CID 已于 {known.get('uploaded_at', '此前')} 在当前网络与钱包下上传过，跳过")
+
+        started = time.time()
+        try:
+            compute_commp_parallel(todo, max_workers=workers, on_result=on_result)
+        except Exception as exc:
+            # 进程池不可用时不影响上传流程
+            self._append_log(f"本地 Piece CID 计算不可用，已跳过: {exc}", log_to_file=False)
+            return
+        self._append_log(f"本地 Piece CID 计算完成，用时 {time.time() - started:.1f}s", log_to_file=False)
+
+    def _record_uploaded_piece(self, manifest, car_path, private_key, idx, slot=None):
+        """比对服务端返回与本地计算的 Piece CID，并写入已上传索引"""
+        entry = manifest.part_entry(car_path)
+        reported = entry.get("piece_cid")
+        local_ids = [entry.get("local_piece_cid"), entry.get("local_piece_cid_v1")]
+        if reported and any(local_ids) and reported not in local_ids:
+            self._log_part(idx, f"[警告] {car_path.name} 返回的 Piece CID 与本地计算不一致: {reported}", slot)
+            local_ids = []
+        info = {k: entry.get(k) for k in ("piece_cid", "piece_id", "data_set_id", "provider_id", "uploaded_at", "sha256", "size")}
+        info["root_cid"] = manifest.get("root_cid")
+        try:
+            self.piece_index.add(self._piece_scope(private_key), [reported] + local_ids, info)
+        except Exception as exc:
+            self._log_part(idx, f"写入 Piece CID 索引失败: {exc}", slot)
+
+    def _upload_parts_concurrent(self, car_parts, private_key, manifest=None, delete_uploaded=False):
+        """并行上传分块（最多16线程，取决于设置），提供聚合进度；清单中已确认的分块跳过
+
+        调度策略：大块优先分配；队列清空后，空闲槽位会对明显落后的分块发起推测性重传，
+        先成功者生效；按槽位统计吞吐，连续失败的槽位暂停接单，吞吐下降时收缩有效线程数。
+        delete_uploaded 为 True 时，已确认上传的分块立即删除以尽早释放磁盘空间。
+        """
+        if manifest:
+            skipped = [p for p in car_parts if manifest.is_uploaded(p)]
+            if skipped:
+                self._append_log(f"清单显示 {len(skipped)} 个分块已上传，跳过: {', '.join(p.name for p in skipped)}")
+                car_parts = [p for p in car_parts if p not in skipped]
+            if not car_parts:
+                self._update_progress(90)
+                return True
         total = len(car_parts)
-        success_all = True
+        if not total:
+            return True
         max_workers = min(max(1, self.thread_count_var.get()), 16, total)
 
+        sizes = {}
+        for part in car_parts:
+            try:
+                sizes[part] = part.stat().st_size
+            except OSError:
+                sizes[part] = 0
+        index_of = {part: i for i, part in enumerate(car_parts, 1)}
+        pending = deque(sorted(car_parts, key=lambda p: sizes[p], reverse=True))
+
         status = {"done": 0, "fail": 0, "inflight": 0}
         slots = ["空闲"] * max_workers
-        part_labels = {part: part.name for part in car_parts}
+        # 每个槽位：吞吐 EMA（字节/秒）、连续失败次数、暂停截止时间
+        slot_stats = [{"rate": None, "fails": 0, "parked_until": 0.0} for _ in range(max_workers)]
+        sched = {"limit": max_workers, "peak_rate": 0.0}
+        finished = {}    # part -> 是否成功
+        running = {}     # part -> [future, ...]
+        future_info = {}  # future -> (part, slot_idx, start_time, cancel_event)
+        delete_after = set()  # 已上传但仍有落败副本在运行的分块，副本结束后再删除
+
+        def delete_part(part):
+            delete_after.discard(part)
+            if not (delete_uploaded and manifest):
+                return
+            try:
+                part.unlink(missing_ok=True)
+                self.admission.notify()
+            except Exception:
+                pass
 
         def update_status():
+            status["inflight"] = sum(1 for futures in running.values() if futures)
             head = f"完成{status['done']}/{total} 失败{status['fail']} 上传中{status['inflight']}"
+            if sched["limit"] < max_workers:
+                head += f" 有效线程{sched['limit']}/{max_workers}"
             slots_str = " | ".join([f"{i+1}:{s}" for i, s in enumerate(slots)])
             self._set_thread_status(f"{head} | {slots_str}")
 
-        parts_iter = iter(list(enumerate(car_parts, 1)))  # (idx, part)
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_slot = {}
-
-            def submit_one(slot_idx):
-                try:
-                    idx, part = next(parts_iter)
-                except StopIteration:
-                    return False
-                status["inflight"] += 1
-                slots[slot_idx] = f"{part_labels[part]} 上传中"
-                update_status()
-                future = executor.submit(self._upload_with_retry, part, private_key, idx, total, 5, False, slot_idx + 1)
-                future_to_slot[future] = (slot_idx, part, idx)
-                return True
 
-            # 先填满线程
-            for slot_idx in range(max_workers):
-                if not submit_one(slot_idx):
-                    break
-
-            completed = 0
+            def dispatch(part, slot_idx, speculative=False):
+                cancel_event = threading.Event()
+                future = executor.submit(
+                    self._upload_with_retry, part, private_key, index_of[part], total, 5, False,
+                    slot_idx + 1, manifest, cancel_event
+                )
+                future_info[future] = (part, slot_idx, time.time(), cancel_event)
+                running.setdefault(part, []).append(future)
+                slots[slot_idx] = f"{part.name} {'推测重传' if speculative else '上传中'}"
+                if speculative:
+                    self._log_part(index_of[part], f"{part.name} 进度落后，槽位 {slot_idx + 1} 同时重传，先完成者生效", slot_idx + 1)
+
+            def idle_slots():
+                busy = {info[1] for info in future_info.values()}
+                now = time.time()
+                free = [i for i in range(max_workers) if i not in busy and slot_stats[i]["parked_until"] <= now]
+                if not free and not busy and pending:
+                    # 所有槽位均被暂停且无任务在跑时，解除暂停避免停滞
+                    for stats in slot_stats:
+                        stats["parked_until"] = 0.0
+                    free = list(range(max_workers))
+                return free
+
+            def pick_straggler():
+                rates = sorted(s["rate"] for s in slot_stats if s["rate"])
+                if not rates:
+                    return None
+                ref_rate = rates[len(rates) // 2]
+                now = time.time()
+                best, best_over = None, 0.0
+                for part, slot_idx, start, _ in future_info.values():
+                    if part in finished or len(running.get(part, [])) > 1:
+                        continue
+                    expected = sizes[part] / ref_rate
+                    over = (now - start) - expected
+                    if now - start > expected * 1.5 + 30 and over > best_over:
+                        best, best_over = part, over
+                return best
+
+            def fill():
+                active = len(future_info)
+                for slot_idx in idle_slots():
+                    if active >= sched["limit"]:
+                        break
+                    if pending:
+                        dispatch(pending.popleft(), slot_idx)
+                    else:
+                        straggler = pick_straggler()
+                        if straggler is None:
+                            break
+                        dispatch(straggler, slot_idx, speculative=True)
+                    active += 1
+
+            def adapt_limit():
+                rates = sorted(s["rate"] for s in slot_stats if s["rate"])
+                if not rates:
+                    return
+                per_slot = rates[len(rates) // 2]
+                sched["peak_rate"] = max(sched["peak_rate"], per_slot)
+                if per_slot < sched["peak_rate"] * 0.5 and sched["limit"] > 1:
+                    sched["limit"] -= 1
+                    # 峰值逐步衰减，避免网络整体变慢后持续收缩到单线程
+                    sched["peak_rate"] *= 0.75
+                    self._append_log(f"单线程吞吐下降，有效上传线程数调整为 {sched['limit']}", log_to_file=False)
+                elif per_slot > sched["peak_rate"] * 0.8 and sched["limit"] < max_workers:
+                    sched["limit"] += 1
+
+            fill()
             update_status()
-            while future_to_slot and not self.stop_flag:
-                for future in as_completed(list(future_to_slot.keys()), timeout=None):
-                    slot_idx, part, idx = future_to_slot.pop(future)
+            while future_info and not self.stop_flag:
+                done, _ = wait(list(future_info.keys()), timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    part, slot_idx, start, cancel_event = future_info.pop(future)
+                    running[part].remove(future)
+                    stats = slot_stats[slot_idx]
                     try:
                         ok = future.result()
-                        if ok:
-                            status["done"] += 1
-                            slots[slot_idx] = f"{part_labels[part]} 完成"
-                        else:
-                            status["fail"] += 1
-                            slots[slot_idx] = f"{part_labels[part]} 失败"
-                            success_all = False
                     except Exception as exc:
+                        ok = False
+                        self._log_part(index_of[part], f"{part.name} 上传异常: {exc}", slot_idx + 1)
+                    if part in finished:
+                        # 其他副本已先完成；最后一个落败副本结束后执行先完成者推迟的删除
+                        slots[slot_idx] = "空闲"
+                        if part in delete_after and not running[part]:
+                            delete_part(part)
+                        continue
+                    if ok:
+                        finished[part] = True
+                        for other in running[part]:
+                            future_info[other][3].set()
+                        rate = sizes[part] / max(time.time() - start, 0.001)
+                        stats["rate"] = rate if stats["rate"] is None else stats["rate"] * 0.7 + rate * 0.3
+                        stats["fails"] = 0
+                        status["done"] += 1
+                        slots[slot_idx] = f"{part.name} 完成"
+                        adapt_limit()
+                        if running[part]:
+                            # 落败副本已收到取消信号，可能仍占用文件
+                            delete_after.add(part)
+                        else:
+                            delete_part(part)
+                    else:
+                        stats["fails"] += 1
+                        if stats["fails"] >= 2:
+                            stats["parked_until"] = time.time() + 60
+                            self._append_log(f"槽位 {slot_idx + 1} 连续失败，暂停分配 60 秒", log_to_file=False)
+                        if running[part]:
+                            slots[slot_idx] = f"{part.name} 失败(副本仍在上传)"
+                            continue
+                        finished[part] = False
                         status["fail"] += 1
-                        slots[slot_idx] = f"{part_labels[part]} 异常"
-                        success_all = False
-                        self._log_part(idx, f"{part.name} 上传异常: {exc}", slot_idx + 1)
-                    status["inflight"] = max(0, status["inflight"] - 1)
-                    completed += 1
-                    self._update_progress(50 + int(40 * completed / total))
-                    # 同一槽位尝试提交下一个任务
-                    submit_one(slot_idx)
-                    update_status()
-                    if self.stop_flag:
-                        break
-                if self.stop_flag:
-                    break
-            if completed == total:
+                        slots[slot_idx] = f"{part.name} 失败"
+                    self._update_progress(50 + int(40 * len(finished) / total))
+                if not self.stop_flag:
+                    fill()
+                update_status()
+            if self.stop_flag:
+                for _, _, _, cancel_event in future_info.values():
+                    cancel_event.set()
+            if len(finished) == total:
                 slots = ["空闲"] * max_workers
                 update_status()
 
-        return success_all
+        # 线程池退出时所有副本均已结束
+        for part in list(delete_after):
+            delete_part(part)
+        return len(finished) == total and all(finished.values())
 
     def _cleanup(self, cid, created_files, work_dir, base_root, remove_workdir=True):
         if self.stop_flag or (not cid and not created_files):
@@ -1178,18 +1616,60 @@ class FilecoinPinUploader:
         return thread_id == tid
 
     def _refresh_log_display(self):
-        def refresh():
+        """切换线程过滤时只渲染可见窗口内的最近日志"""
+        self.app._call_ui(self._render_log_window)
+
+    def _visible_log_lines(self):
+        target = self.log_filter_var.get()
+        with self.log_lock:
+            if target == "全部" or not target:
+                merged = heapq.merge(*[list(buf) for buf in self.log_buffers.values()])
+                window = deque(merged, maxlen=self.LOG_VIEW_LINES)
+            else:
+                window = []
+                for tid, buf in self.log_buffers.items():
+                    if self._log_visible(tid):
+                        window = list(buf)[-self.LOG_VIEW_LINES:]
+                        break
+        return [text for _, text in window]
+
+    def _render_log_window(self):
+        if not getattr(self, "log_text", None) or not self.log_text.winfo_exists():
+            return
+        lines = self._visible_log_lines()
+        self.log_text.config(state=tk.NORMAL)
+        self.log_text.delete("1.0", tk.END)
+        if lines:
+            self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+        self.log_text.see(tk.END)
+        self.log_text.config(state=tk.DISABLED)
+
+    def _flush_log(self):
+        """按固定帧率合并写入日志框，并裁剪超出显示上限的旧行"""
+        with self.log_lock:
+            self._log_flush_scheduled = False
+            pending = list(self.log_pending)
+            self.log_pending.clear()
+            full_render = self._log_needs_full_render
+            self._log_needs_full_render = False
+        try:
             if not getattr(self, "log_text", None) or not self.log_text.winfo_exists():
                 return
-            with self.log_lock:
-                self.log_text.config(state=tk.NORMAL)
-                self.log_text.delete("1.0", tk.END)
-                for tid, text in self.log_entries:
-                    if self._log_visible(tid):
-                        self.log_text.insert(tk.END, text + "\n")
-                self.log_text.see(tk.END)
-                self.log_text.config(state=tk.DISABLED)
-        self.app._call_ui(refresh)
+            if full_render:
+                self._render_log_window()
+                return
+            lines = [text for tid, text in pending if self._log_visible(tid)]
+            if not lines:
+                return
+            self.log_text.config(state=tk.NORMAL)
+            self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+            line_count = int(self.log_text.index("end-1c").split(".")[0])
+            if line_count > self.LOG_VIEW_LINES:
+                self.log_text.delete("1.0", f"{line_count - self.LOG_VIEW_LINES + 1}.0")
+            self.log_text.see(tk.END)
+            self.log_text.config(state=tk.DISABLED)
+        except Exception:
+            pass
 
     def _update_log_filter_options(self):
         options = ["全部"] + [str(i) for i in range(1, max(1, self.thread_count_var.get()) + 1)]
@@ -1206,6 +1686,7 @@ class FilecoinPinUploader:
 
         if self.use_source_dir.get():
             base_root = source_path.parent / f"filecoin-pin_temp_{ts}"
+            self._set_source_work_roots(self._source_work_roots() + [str(base_root)])
         else:
             base_root = Path(self.work_root_var.get())
         base_root.mkdir(parents=True, exist_ok=True)
@@ -1295,20 +1776,20 @@ class FilecoinPinUploader:
             pass
 
     def _append_log(self, text, log_to_file=True, thread_id=None):
-        def write():
-            try:
-                if not getattr(self, "log_text", None) or not self.log_text.winfo_exists():
-                    return
-                with self.log_lock:
-                    self.log_entries.append((thread_id, text))
-                    if self._log_visible(thread_id):
-                        self.log_text.config(state=tk.NORMAL)
-                        self.log_text.insert(tk.END, text + "\n")
-                        self.log_text.see(tk.END)
-                        self.log_text.config(state=tk.DISABLED)
-            except Exception:
-                pass
-        self.app._call_ui(write)
+        with self.log_lock:
+            self.log_seq += 1
+            buf = self.log_buffers.get(thread_id)
+            if buf is None:
+                buf = self.log_buffers[thread_id] = deque(maxlen=self.LOG_BUFFER_LINES)
+            buf.append((self.log_seq, text))
+            if len(self.log_pending) == self.log_pending.maxlen:
+                # 积压超过一屏时直接整窗重绘
+                self._log_needs_full_render = True
+            self.log_pending.append((thread_id, text))
+            schedule = not self._log_flush_scheduled
+            self._log_flush_scheduled = True
+        if schedule:
+            self.app._call_ui(lambda: self.master.after(self.LOG_FLUSH_MS, self._flush_log))
         if log_to_file:
             try:
                 self.logger.info(text)
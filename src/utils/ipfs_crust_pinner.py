@@ -2,19 +2,23 @@
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from tkinterdnd2 import DND_FILES, TkinterDnD
 import subprocess
 import threading
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 import base64
+import hashlib
 import json
 import time
 import webbrowser
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from utils import EmbeddedKubo
+from utils.crust_psa_client import PinningServiceClient, PSAError
+from utils.crust_pin_queue import PinTask, PinTaskError, PinWorkQueue
+from utils.crust_pin_ledger import PinLedger, PinStatusPoller
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
@@ -55,8 +59,9 @@ class Constants:
     
     # Crust API
     CRUST_API_BASE = 'https://pin.crustcode.com'
-    CRUST_API_PSA = f'{CRUST_API_BASE}/psa'
-    CRUST_API_PINS = f'{CRUST_API_BASE}/psa/pins'
+    # 可通过环境变量 CRUST_PSA_URL 指向本地模拟服务（见 benchmarks/psa_mock_server.py）
+    CRUST_API_PSA = os.environ.get('CRUST_PSA_URL', f'{CRUST_API_BASE}/psa').rstrip('/')
+    CRUST_API_PINS = f'{CRUST_API_PSA}/pins'
     
     # 超时和重试
     DEFAULT_TIMEOUT = 300
@@ -64,7 +69,18 @@ class Constants:
     RETRY_DELAY = 5
     
     # 并发控制
-    MAX_CONCURRENT_OPERATIONS = 2
+    MAX_CONCURRENT_OPERATIONS = 8
+    MAX_CONCURRENT_CLI_OPERATIONS = 1  # ipfs pin remote add 共享同一仓库锁，只能串行执行
+    PIN_TASK_ATTEMPTS = 3
+    
+    # PSA 查询
+    PSA_STATUS_ALL = ('queued', 'pinning', 'pinned', 'failed')
+    STATUS_BATCH_SIZE = 10  # PSA 规范中单次 cid 过滤最多 10 个
+    PINS_PAGE_LIMIT = 1000  # PSA 单页上限
+    PINS_FULL_RESYNC_INTERVAL = 24 * 3600  # 快照超过该时间做一次全量同步，剔除服务端已删除的固定
+    PSA_STATUS_PENDING = ('queued', 'pinning')
+    LEDGER_MIN_POLL_INTERVAL = 30
+    LEDGER_MAX_POLL_INTERVAL = 1800
 
 
 # ==================== 工具类 ====================
@@ -212,7 +228,10 @@ class ConfigManager:
     
     def save_config(self, new_config):
         """保存配置"""
-        return save_config_file(self.config_file_path, new_config, self.logger)
+        success, message = save_config_file(self.config_file_path, new_config, self.logger)
+        if success:
+            self.config.update(new_config)
+        return success, message
     
     def get(self, key, default=None):
         """获取配置项"""
@@ -512,6 +531,7 @@ class CIDCalculator:
     
     def _create_input_section(self):
         """创建输入区域"""
+        from tkinterdnd2 import DND_FILES
         input_frame = ttk.LabelFrame(self.master, text="INPUT 输入", 
                                      style='BigTitle.TLabelframe')
         input_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
@@ -990,7 +1010,6 @@ class CrustPinning:
         self.app = integrated_app
         self.logger = integrated_app.logger
         self.ipfs_path = integrated_app.cid_calculator.ipfs_path
-        self.repo_dir = integrated_app.cid_calculator.repo_dir
         self.use_direct_api = True  # 使用直接的 HTTP API 方式进行固定，绕过 ipfs pin remote
         
         # 配置管理
@@ -999,9 +1018,13 @@ class CrustPinning:
         # 状态管理
         self.pin_info = None
         self.pinning_queue = []
+        self.pin_work_queue = None
+        self._psa_clients = {}
+        self._service_cache = None
+        self._cli_inflight = 0
+        self._cli_lock = threading.Lock()
         self.is_pinning = False
-        self.active_operations = 0
-        self.completion_message_printed = False
+        self._closed = False
         self.buttons_to_disable = []
         
         # 并发控制
@@ -1015,6 +1038,14 @@ class CrustPinning:
         
         # 创建UI
         self.create_widgets()
+        
+        # 本地固定账本与状态轮询
+        self._ledger_configs = {}
+        self.ledger = None
+        self.poller = None
+        self._init_pin_ledger()
+        # 窗口关闭时停止轮询并关闭账本，避免重复打开窗口后轮询线程叠加
+        self.master.bind('<Destroy>', self._on_destroy, add='+')
     
     @staticmethod
     def _format_command(command):
@@ -1023,6 +1054,11 @@ class CrustPinning:
             return ' '.join(str(part) for part in command)
         return str(command)
     
+    @property
+    def repo_dir(self):
+        """当前实际使用的仓库路径（主程序会在创建后覆盖 cid_calculator.repo_dir）"""
+        return self.app.cid_calculator.repo_dir
+    
     @property
     def progress(self):
         """延迟获取progress控件"""
@@ -1098,6 +1134,7 @@ class CrustPinning:
     
     def _create_pinning_section(self):
         """创建固定区域"""
+        from tkinterdnd2 import DND_FILES
         frame = self._create_labeled_frame("Crust Pinning 固定", 1)
         frame.grid_columnconfigure(1, weight=1)
         frame.grid_rowconfigure(1, weight=1)
@@ -1133,6 +1170,8 @@ class CrustPinning:
             ("在 IPFS Scan 中查看 CID", 25, self._open_ipfs_scan),
             ("查看账户固定信息", 15, self.check_pin_status),
             ("导出固定信息", 10, self._export_pin_info),
+            ("本地账本", 10, self.show_ledger_pins),
+            ("取消", 6, self.cancel_pinning),
         ]
         
         for idx, (text, width, command) in enumerate(buttons):
@@ -1148,6 +1187,9 @@ class CrustPinning:
             elif text == "导出固定信息":
                 self.export_button = btn
                 btn.config(state=tk.DISABLED)
+            elif text == "取消":
+                self.cancel_button = btn
+                btn.config(state=tk.DISABLED)
     
     def _create_log_section(self):
         """创建日志区域"""
@@ -1207,7 +1249,13 @@ class CrustPinning:
             'use_public_account': use_public
         }
         
-        if self.config_manager.save_config(config):
+        previous = self.config_manager.get_crust_config()
+        success, _ = self.config_manager.save_config(config)
+        if success:
+            if (previous.get('crust_username') != username
+                    or previous.get('crust_b64auth_encoded_data') != b64auth):
+                # 凭据变化后，已缓存的远程服务注册不再可信
+                self._invalidate_service_cache(previous.get('crust_username'), username)
             self.status_label.config(text="Crust configuration saved successfully.")
         else:
             self._log_message("Failed to save Crust configuration.")
@@ -1234,28 +1282,24 @@ class CrustPinning:
         # 补齐文件名
         filenames = self._align_filenames(filenames, cids)
         
-        # 准备固定
-        service_name = self._get_service_name(config)
-        if not self.use_direct_api:
-            self._prepare_pinning_service(service_name, config)
-        
         # 加入队列
+        service_name = self._get_service_name(config)
+        self.pinning_queue = []
         for cid, filename in zip(cids, filenames):
             if CIDValidator.is_valid_cid(cid):
                 self._queue_pin_operation(cid, filename, service_name, config)
             else:
                 self._log_message(f"无效的 CID: {cid}")
         
-        self._log_message("批量固定操作已加入队列。")
-        self._start_pinning()
+        self._log_message(f"批量固定操作已加入队列，共 {len(self.pinning_queue)} 项。")
+        # 非直连模式需先准备远程服务（在后台线程中执行）
+        prepare = None if self.use_direct_api else (lambda: self._prepare_pinning_service(service_name, config))
+        self._start_pinning(prepare)
     
     def _get_active_config(self):
         """获取当前活动配置"""
         if self.use_public_account.get():
-            return {
-                'crust_username': Constants.CRUST_PUBLIC_USERNAME,
-                'crust_b64auth_encoded_data': Constants.CRUST_PUBLIC_AUTH
-            }
+            return self._public_config()
         
         config = self.config_manager.get_crust_config()
         if not self._validate_config(config):
@@ -1296,19 +1340,97 @@ class CrustPinning:
         return (Constants.CRUST_PUBLIC_USERNAME if self.use_public_account.get() 
                 else config['crust_username'])
     
+    def _service_cache_path(self):
+        base_dir = os.path.dirname(os.path.abspath(self.config_manager.config_file_path))
+        return os.path.join(base_dir, 'crust_cache', 'remote_services.json')
+    
+    def _load_service_cache(self):
+        """读取远程服务注册缓存：{仓库路径|服务名: 凭据摘要}"""
+        if self._service_cache is None:
+            try:
+                with open(self._service_cache_path(), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._service_cache = data if isinstance(data, dict) else {}
+            except (OSError, ValueError):
+                self._service_cache = {}
+        return self._service_cache
+    
+    def _save_service_cache(self):
+        path = self._service_cache_path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._service_cache or {}, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.warning(f"Failed to save remote service cache: {e}")
+    
+    def _ipfs_command(self, *args):
+        """Kubo 命令显式指定仓库，服务注册与缓存键对应同一个仓库"""
+        repo_args = ['--repo-dir', self.repo_dir] if self.repo_dir else []
+        return [self.ipfs_path, *repo_args, *args]
+    
+    def _service_cache_key(self, service_name):
+        return f"{os.path.abspath(self.repo_dir or '')}|{service_name}"
+    
+    @staticmethod
+    def _credential_digest(config):
+        data = f"{Constants.CRUST_API_PSA}|{config['crust_b64auth_encoded_data']}"
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+    
+    def _invalidate_service_cache(self, *service_names):
+        """凭据变更后把缓存条目标记为过期（保留条目，下次准备服务时强制重新注册）"""
+        cache = self._load_service_cache()
+        changed = False
+        for name in service_names:
+            key = self._service_cache_key(name) if name else None
+            if key and key in cache:
+                cache[key] = 'stale'
+                changed = True
+        if changed:
+            self._save_service_cache()
+    
     def _prepare_pinning_service(self, service_name, config):
-        """准备固定服务"""
-        cmd_check = [self.ipfs_path, 'pin', 'remote', 'service', 'ls']
+        """准备固定服务；缓存命中时不启动任何 Kubo 进程"""
+        cache = self._load_service_cache()
+        key = self._service_cache_key(service_name)
+        digest = self._credential_digest(config)
+        if cache.get(key) == digest:
+            return
+        
+        cmd_check = self._ipfs_command('pin', 'remote', 'service', 'ls')
         existing = self._check_existing_services(cmd_check)
         
+        if service_name in existing:
+            # 无法确认 Kubo 中已注册服务使用的凭据（缓存过期/不一致/丢失），移除后按当前凭据重新注册
+            self._log_message("远程服务凭据未确认，重新注册...")
+            try:
+                self._run_cli_command(
+                    self._ipfs_command('pin', 'remote', 'service', 'rm', service_name),
+                    "移除旧的远程服务..."
+                )
+            except PinTaskError as e:
+                self._log_message(f"移除远程服务失败: {e}")
+            existing.discard(service_name)
+        
         if service_name not in existing:
-            cmd_add = [
-                self.ipfs_path, 'pin', 'remote', 'service', 'add',
+            cmd_add = self._ipfs_command(
+                'pin', 'remote', 'service', 'add',
                 service_name, Constants.CRUST_API_PSA,
                 config['crust_b64auth_encoded_data']
-            ]
+            )
             self._log_message("添加远程服务...")
-            self._run_command(cmd_add, "添加服务中...")
+            self._run_cli_command(cmd_add, "添加服务中...")
+        
+        cache[key] = digest
+        self._save_service_cache()
+    
+    @staticmethod
+    def _is_service_missing(error):
+        message = str(error).lower()
+        return 'service' in message and ('not known' in message or 'not found' in message
+                                         or 'no such' in message)
     
     def _check_existing_services(self, command):
         """检查已存在的服务"""
@@ -1340,99 +1462,155 @@ class CrustPinning:
         escaped_filename = encoded_filename.replace('"', '\\"')
         quoted_filename = f'"{escaped_filename}"'
         
-        cmd = [
-            self.ipfs_path, 'pin', 'remote', 'add',
+        cmd = self._ipfs_command(
+            'pin', 'remote', 'add',
             f'--service={service_name}',
             f'--name={quoted_filename}',
             '--background',
             cid
-        ]
-        self.pinning_queue.append((cmd, f"固定 CID {cid} 为 {filename}"))
+        )
+        def run(task):
+            try:
+                output = self._run_cli_command(cmd, task.message)
+            except PinTaskError as e:
+                if not self._is_service_missing(e):
+                    raise
+                # 服务注册在应用外被移除（仓库重建、手动 service rm）：使缓存失效后重新注册一次
+                self._log_message("远程服务不存在，重新注册后重试...")
+                self._invalidate_service_cache(service_name)
+                self._prepare_pinning_service(service_name, config)
+                output = self._run_cli_command(cmd, task.message)
+            # CLI 方式拿不到 requestid，先以占位记录入账，轮询时补全
+            self._ledger_record(config, cid, '', filename, 'queued')
+            return output
+        
+        self.pinning_queue.append(PinTask(
+            cid, filename, f"固定 CID {cid} 为 {filename}", run,
+            max_attempts=Constants.PIN_TASK_ATTEMPTS
+        ))
     
     def _queue_pin_operation_http(self, cid, filename, config):
         """通过直接 HTTP API 加入固定队列"""
-        payload = {"cid": cid}
-        if filename:
-            payload["name"] = filename
-        
-        cmd = [
-            "curl", "--silent", "--show-error", "--fail", "--location",
-            "-X", "POST", Constants.CRUST_API_PINS,
-            "--header", f"Authorization: Bearer {config['crust_b64auth_encoded_data']}",
-            "--header", "Content-Type: application/json",
-            "--data", json.dumps(payload)
-        ]
-        self.pinning_queue.append((cmd, f"固定 CID {cid} 为 {filename} (HTTP API)"))
+        self.pinning_queue.append(PinTask(
+            cid, filename, f"固定 CID {cid} 为 {filename} (HTTP API)",
+            lambda task: self._pin_via_http(task, config),
+            max_attempts=Constants.PIN_TASK_ATTEMPTS
+        ))
+    
+    def _get_psa_client(self, config):
+        """按鉴权信息复用 PSA 客户端（共享 keep-alive 连接池）"""
+        token = config['crust_b64auth_encoded_data']
+        with self.operations_lock:
+            client = self._psa_clients.get(token)
+            if client is None:
+                client = PinningServiceClient(
+                    Constants.CRUST_API_PSA,
+                    token,
+                    pool_size=Constants.MAX_CONCURRENT_OPERATIONS,
+                    timeout=30
+                )
+                self._psa_clients[token] = client
+            return client
     
-    def _start_pinning(self):
+    def _pin_via_http(self, task, config):
+        """HTTP 固定任务执行体，并发数受 semaphore 限制"""
+        with self.semaphore:
+            try:
+                data = self._get_psa_client(config).add_pin(task.cid, task.filename)
+            except PSAError as e:
+                # 客户端内部已对 429/5xx 退避重试，其余 4xx 重试无意义
+                retryable = e.status_code is None or e.status_code >= 500 or e.status_code == 429
+                raise PinTaskError(str(e), retryable=retryable)
+        self._ledger_record(config, task.cid, data.get('requestid', ''), task.filename,
+                            data.get('status', 'queued'), data.get('created', ''))
+        return data.get('status', '')
+    
+    def _start_pinning(self, before_start=None):
         """开始固定处理"""
         self._disable_buttons()
         self.is_pinning = True
-        self.completion_message_printed = False
-        self._process_pinning_queue()
-    
-    def _process_pinning_queue(self):
-        """处理固定队列"""
-        if self.pinning_queue:
-            cmd, message = self.pinning_queue.pop(0)
-            self._run_command(cmd, message)
-        else:
-            if self.active_operations == 0 and not self.completion_message_printed:
-                self.is_pinning = False
-                self._enable_buttons()
-                self.progress.stop()
-                self._log_message("====所有操作已完成====")
-                self.completion_message_printed = True
-    
-    def _run_command(self, command, message):
-        """执行命令"""
-        self._log_message(message)
-        self._log_message(f"执行命令: {self._format_command(command)}")
         self.progress.start(10)
-        self.active_operations += 1
+        tasks, self.pinning_queue = self.pinning_queue, []
+        workers = (Constants.MAX_CONCURRENT_OPERATIONS if self.use_direct_api
+                   else Constants.MAX_CONCURRENT_CLI_OPERATIONS)
+        self.pin_work_queue = PinWorkQueue(
+            workers,
+            on_progress=self._on_pin_progress,
+            on_log=self._log_message,
+            retry_delay=Constants.RETRY_DELAY
+        )
+        self.cancel_button.config(state=tk.NORMAL)
         threading.Thread(
-            target=self._run_command_with_retry,
-            args=(command, message),
+            target=self._run_pin_queue,
+            args=(self.pin_work_queue, tasks, before_start),
             daemon=True
         ).start()
     
-    def _run_command_with_retry(self, command, message):
-        """重试执行命令"""
-        for attempt in range(Constants.MAX_RETRIES):
-            try:
-                if isinstance(command, (list, tuple)):
-                    result = SubprocessHelper.run_command(
-                        command,
-                        timeout=30
-                    )
-                else:
-                    result = SubprocessHelper.run_command(
-                        command,
-                        timeout=30,
-                        shell=True
-                    )
-                
-                if result.returncode == 0:
-                    self._log_message(f"成功: {message}")
-                    if result.stdout:
-                        output = result.stdout.strip()
-                        if len(output) > 500:
-                            output = output[:500] + "..."
-                        self._log_message(f"输出: {output}")
-                    break
-                elif "lock" in result.stderr.lower():
-                    self._log_message(f"IPFS锁定，尝试释放... (尝试 {attempt + 1})")
-                    self._release_ipfs_lock()
-                else:
-                    self._log_message(f"错误: {result.stderr}")
-            except subprocess.TimeoutExpired:
-                self._log_message(f"超时，重试中... (尝试 {attempt + 1})")
-                time.sleep(Constants.RETRY_DELAY)
-            except Exception as e:
-                self._log_message(f"异常: {str(e)}")
-        
-        self.active_operations -= 1
-        self.master.after(0, self._process_pinning_queue)
+    def _run_pin_queue(self, work_queue, tasks, before_start):
+        """后台执行固定队列"""
+        started = time.time()
+        try:
+            if before_start:
+                before_start()
+            counts = work_queue.run(tasks)
+            self._log_message(
+                f"固定完成：成功 {counts['done']}，失败 {counts['failed']}，"
+                f"取消 {counts['cancelled']}，用时 {time.time() - started:.1f}s"
+            )
+        except Exception as e:
+            self._log_message(f"固定队列异常: {e}")
+        self.master.after(0, self._on_pinning_finished)
+    
+    def _on_pin_progress(self, counts):
+        """队列进度回调（工作线程中调用）"""
+        text = (f"固定进度：完成 {counts['done']} / 失败 {counts['failed']} / "
+                f"进行中 {counts['inflight']} / 共 {counts['total']}")
+        if counts['cancelled']:
+            text += f"（已取消 {counts['cancelled']}）"
+        self.master.after(0, lambda: self.status_label.config(text=text))
+    
+    def _on_pinning_finished(self):
+        self.is_pinning = False
+        self.pin_work_queue = None
+        self.cancel_button.config(state=tk.DISABLED)
+        self._enable_buttons()
+        self.progress.stop()
+        self._log_message("====所有操作已完成====")
+    
+    def cancel_pinning(self):
+        """取消尚未完成的固定任务"""
+        if self.pin_work_queue:
+            self.pin_work_queue.cancel()
+            self._log_message("已请求取消，正在等待进行中的任务结束...")
+    
+    def _run_cli_command(self, command, message):
+        """执行 Kubo 命令（带锁释放重试），失败时抛出 PinTaskError"""
+        self._log_message(message)
+        self._log_message(f"执行命令: {self._format_command(command)}")
+        with self._cli_lock:
+            self._cli_inflight += 1
+        try:
+            result = SubprocessHelper.run_command(command, timeout=30)
+        except subprocess.TimeoutExpired:
+            raise PinTaskError("命令超时")
+        finally:
+            with self._cli_lock:
+                self._cli_inflight -= 1
+        if result.returncode == 0:
+            output = (result.stdout or "").strip()
+            if len(output) > 500:
+                output = output[:500] + "..."
+            return output
+        if "lock" in (result.stderr or "").lower():
+            with self._cli_lock:
+                idle = self._cli_inflight == 0
+            # 仍有其他 Kubo 命令在运行时，锁可能正被其持有，不能删除
+            if idle:
+                self._log_message("IPFS锁定，尝试释放...")
+                self._release_ipfs_lock()
+            else:
+                self._log_message("IPFS锁定，其他命令仍在执行，稍后重试")
+        raise PinTaskError((result.stderr or "").strip() or f"返回码 {result.returncode}")
     
     def check_cid_status(self):
         """检查CID状态"""
@@ -1459,53 +1637,75 @@ class CrustPinning:
         ).start()
     
     def _check_cids_status(self, cids, config):
-        """检查多个CID状态"""
+        """批量检查多个CID状态：按批并发查询，结果到达即写入日志"""
         self.pin_info = []
         self._log_message("CID\t\t\t\t\t\t状态\t\t名称")
         self._log_message("-" * 80)
         
-        for cid in set(cids):
+        unique = []
+        for cid in dict.fromkeys(cids):
             if CIDValidator.is_valid_cid(cid):
-                self._check_single_cid_status(cid, config)
+                unique.append(cid)
+            else:
+                self._log_message(f"无效的 CID: {cid}")
+        batches = [unique[i:i + Constants.STATUS_BATCH_SIZE]
+                   for i in range(0, len(unique), Constants.STATUS_BATCH_SIZE)]
+        client = self._get_psa_client(config)
+        
+        with ThreadPoolExecutor(max_workers=Constants.MAX_CONCURRENT_OPERATIONS) as executor:
+            futures = {executor.submit(self._check_cid_batch_status, client, batch): batch
+                       for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    found = future.result()
+                except PSAError as e:
+                    for cid in batch:
+                        self._log_message(f"{cid}\t查询失败\t{e}")
+                    continue
+                for cid in batch:
+                    info = found.get(cid)
+                    if info is None:
+                        self._log_message(f"{cid}\t未找到\t")
+                        continue
+                    self._log_message(f"{cid}\t{info['status']}\t{info['name']}")
+                    self.pin_info.append(info)
+                    self._ledger_record(config, cid, info['requestid'], info['name'],
+                                        info['status'], info['created'])
         
         self._log_message("-" * 80)
-        self._log_message(f"总计检查了 {len(self.pin_info)} 个 CID。\n")
+        self._log_message(f"总计检查了 {len(unique)} 个 CID，找到 {len(self.pin_info)} 条固定信息。\n")
         
         self.is_pinning = False
-        self._enable_buttons()
+        self.master.after(0, self._enable_buttons)
         
         if self.pin_info:
             self.master.after(0, self._enable_export_button)
     
-    def _check_single_cid_status(self, cid, config):
-        """检查单个CID状态"""
-        url = f"{Constants.CRUST_API_PINS}?cid={cid}"
-        cmd = [
-            "curl", "--location", "--request", "GET", url,
-            "--header", f"Authorization: Bearer {config['crust_b64auth_encoded_data']}"
-        ]
-        
-        for attempt in range(Constants.MAX_RETRIES):
-            try:
-                process = SubprocessHelper.popen_command(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE
-                )
-                stdout, _ = process.communicate(timeout=10)
-                
-                data = json.loads(stdout.decode('utf-8'))
-                if 'results' in data and data['results']:
-                    info = data['results'][0]
-                    status = info['status']
-                    name = info['pin']['name']
-                    
-                    self._log_message(f"{cid}\t{status}\t{name}")
-                    self.pin_info.append({'cid': cid, 'status': status, 'name': name})
-                    break
-            except (subprocess.TimeoutExpired, json.JSONDecodeError) as e:
-                self._log_message(f"检查 {cid} 失败，重试中...")
-                time.sleep(1)
+    def _check_cid_batch_status(self, client, batch):
+        """一次请求查询多个 CID，同一 CID 存在多条记录时取最新创建的一条"""
+        with self.semaphore:
+            data = client.list_pins(
+                cids=batch,
+                status=Constants.PSA_STATUS_ALL,
+                limit=max(len(batch) * 10, 100)
+            )
+        found = {}
+        for item in data.get('results', []):
+            pin = item.get('pin', {})
+            cid = pin.get('cid')
+            if not cid:
+                continue
+            current = found.get(cid)
+            if current is None or item.get('created', '') > current['created']:
+                found[cid] = {
+                    'requestid': item.get('requestid', ''),
+                    'cid': cid,
+                    'status': item.get('status', ''),
+                    'name': pin.get('name') or '',
+                    'created': item.get('created', ''),
+                }
+        return found
     
     def check_pin_status(self):
         """检查账户固定状态"""
@@ -1533,72 +1733,185 @@ class CrustPinning:
         ).start()
     
     def _fetch_account_pins(self, config):
-        """获取账户固定信息"""
-        url = f"{Constants.CRUST_API_PINS}?limit=1000"
-        cmd = [
-            "curl", "--location", "--request", "GET", url,
-            "--header", f"Authorization: Bearer {config['crust_b64auth_encoded_data']}"
-        ]
-        
-        for attempt in range(Constants.MAX_RETRIES):
-            try:
-                process = SubprocessHelper.popen_command(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE
-                )
-                stdout, _ = process.communicate(timeout=30)
-                
-                data = json.loads(stdout.decode('utf-8'))
-                self._display_pin_info(data)
-                break
-            except (subprocess.TimeoutExpired, json.JSONDecodeError) as e:
-                self._log_message(f"请求失败，重试中... (尝试 {attempt + 1})")
-                time.sleep(Constants.RETRY_DELAY)
-        
-        self.is_pinning = False
-        self._enable_buttons()
-    
-    def _display_pin_info(self, data):
-        """显示固定信息"""
-        if 'results' not in data or not data['results']:
-            self._log_message("未找到任何固定信息。")
-            return
+        """分页获取账户固定信息：按 before 游标向前翻页，结果逐页显示；
+        存在本地快照时只拉取比快照中最新 created 更新的固定，并重新查询快照中未完成的固定；
+        快照过旧时全量同步，服务端已删除的固定随之从快照中移除"""
+        snapshot = self._load_pin_snapshot(config)
+        full_sync = time.time() - snapshot.get('full_sync_at', 0) > Constants.PINS_FULL_RESYNC_INTERVAL
+        # 游标边界前后各重叠一秒，同一时间戳的固定不会被漏掉，重复的按 requestid 去重
+        latest_known = None if full_sync else self._shift_timestamp(snapshot.get('latest_created'), -1)
+        if full_sync:
+            self._log_message("全量同步账户固定信息...")
+        elif latest_known:
+            self._log_message(f"已加载本地快照 {len(snapshot['pins'])} 条，仅拉取 {latest_known} 之后的新固定...")
         
         self.pin_info = []
+        seen = set()
         self._log_message("CID\t\t\t\t\t\t状态\t\t名称")
         self._log_message("-" * 80)
         
-        for item in data['results']:
-            cid = item['pin']['cid']
-            status = item['status']
-            name = item['pin']['name']
-            
-            self._log_message(f"{cid}\t{status}\t{name}")
-            self.pin_info.append({'cid': cid, 'status': status, 'name': name})
+        client = self._get_psa_client(config)
+        cursor = None
+        fetched = 0
+        complete = False
+        try:
+            while True:
+                data = client.list_pins(
+                    status=Constants.PSA_STATUS_ALL,
+                    limit=Constants.PINS_PAGE_LIMIT,
+                    before=cursor,
+                    after=latest_known
+                )
+                results = data.get('results', [])
+                page = []
+                new_ids = 0
+                for item in results:
+                    info = self._pin_item_to_info(item)
+                    if info['requestid'] in seen:
+                        continue
+                    seen.add(info['requestid'])
+                    new_ids += 1
+                    snapshot['pins'][info['requestid']] = info
+                    page.append(info)
+                fetched += len(page)
+                self._display_pin_info(page)
+                for info in page:
+                    self._ledger_record(config, info['cid'], info['requestid'], info['name'],
+                                        info['status'], info['created'])
+                created = [item.get('created') for item in results if item.get('created')]
+                if len(results) < Constants.PINS_PAGE_LIMIT or not created:
+                    complete = True
+                    break
+                # 本页全是重复项时退回严格的 before，保证翻页向前推进
+                cursor = self._shift_timestamp(min(created), 1) if new_ids else min(created)
+                self._log_message(f"... 已获取 {fetched}/{data.get('count', '?')} 条，继续翻页")
+        except PSAError as e:
+            self._log_message(f"请求失败: {e}")
+        
+        if complete and full_sync:
+            snapshot['pins'] = {rid: info for rid, info in snapshot['pins'].items() if rid in seen}
+            snapshot['full_sync_at'] = time.time()
+        elif complete:
+            self._refresh_pending_pins(client, config, snapshot, seen)
+        
+        # 快照中的历史固定（新拉取的已在上面显示）
+        cached = [info for rid, info in snapshot['pins'].items() if rid not in seen]
+        cached.sort(key=lambda info: info.get('created', ''), reverse=True)
+        if cached:
+            self._display_pin_info(cached)
         
         self._log_message("-" * 80)
-        self._log_message(f"总计 {len(self.pin_info)} 条固定信息。")
+        self._log_message(f"总计 {len(self.pin_info)} 条固定信息（新获取 {fetched} 条）。")
+        if not self.pin_info:
+            self._log_message("未找到任何固定信息。")
+        
+        # 仅在完整拉取后推进快照游标，避免中途失败导致遗漏
+        if complete:
+            self._save_pin_snapshot(config, snapshot)
         
+        self.is_pinning = False
+        self.master.after(0, self._enable_buttons)
+    
+    def _refresh_pending_pins(self, client, config, snapshot, seen):
+        """重新查询快照中仍为 queued/pinning 的固定，服务端已不存在的从快照移除"""
+        pending = [rid for rid, info in snapshot['pins'].items()
+                   if rid not in seen and info.get('status') in Constants.PSA_STATUS_PENDING]
+        if not pending:
+            return
+        self._log_message(f"刷新 {len(pending)} 条未完成固定的状态...")
+        
+        def query(rid):
+            with self.semaphore:
+                return client.get_pin(rid)
+        
+        with ThreadPoolExecutor(max_workers=Constants.MAX_CONCURRENT_OPERATIONS) as executor:
+            futures = {executor.submit(query, rid): rid for rid in pending}
+            for future in as_completed(futures):
+                rid = futures[future]
+                try:
+                    info = self._pin_item_to_info(future.result())
+                except PSAError as e:
+                    if e.status_code == 404:
+                        snapshot['pins'].pop(rid, None)
+                    else:
+                        self._log_message(f"刷新 {rid} 失败: {e}")
+                    continue
+                snapshot['pins'][rid] = info
+                self._ledger_record(config, info['cid'], info['requestid'], info['name'],
+                                    info['status'], info['created'])
+    
+    @staticmethod
+    def _shift_timestamp(value, seconds):
+        """把 PSA 的 ISO 时间戳平移若干秒，无法解析时原样返回"""
+        if not value:
+            return value
+        try:
+            shifted = datetime.fromisoformat(value.replace('Z', '+00:00')) + timedelta(seconds=seconds)
+        except ValueError:
+            return value
+        text = shifted.isoformat()
+        return text.replace('+00:00', 'Z') if value.endswith('Z') else text
+    
+    @staticmethod
+    def _pin_item_to_info(item):
+        pin = item.get('pin', {})
+        return {
+            'requestid': item.get('requestid') or pin.get('cid'),
+            'cid': pin.get('cid', ''),
+            'status': item.get('status', ''),
+            'name': pin.get('name') or '',
+            'created': item.get('created', ''),
+        }
+    
+    @staticmethod
+    def _account_key(config):
+        return config.get('crust_user_address') or config.get('crust_username', '')
+    
+    def _pin_snapshot_path(self, config):
+        account = self._account_key(config)
+        digest = hashlib.sha1(account.encode('utf-8')).hexdigest()[:12]
+        base_dir = os.path.dirname(os.path.abspath(self.config_manager.config_file_path))
+        return os.path.join(base_dir, 'crust_cache', f'pins_{digest}.json')
+    
+    def _load_pin_snapshot(self, config):
+        path = self._pin_snapshot_path(config)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data.get('pins'), dict):
+                return data
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {'latest_created': None, 'pins': {}}
+    
+    def _save_pin_snapshot(self, config, snapshot):
+        path = self._pin_snapshot_path(config)
+        created = [info.get('created', '') for info in snapshot['pins'].values() if info.get('created')]
+        snapshot['latest_created'] = max(created) if created else None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self._log_message(f"保存固定信息快照失败: {e}")
+    
+    def _display_pin_info(self, items):
+        """追加显示一页固定信息，首页到达后即可导出"""
+        if not items:
+            return
+        for info in items:
+            self._log_message(f"{info['cid']}\t{info['status']}\t{info['name']}")
+            self.pin_info.append(info)
         self.master.after(0, self._enable_export_button)
     
     def _export_pin_info(self):
-        """导出固定信息"""
+        """导出固定信息（逐条写出，获取过程中也可导出已到达的部分）"""
         if not self.pin_info:
             self._log_message("没有可用的固定信息。")
             return
         
-        formatted_data = [
-            {
-                "Hash": item['cid'],
-                "Name": item['name'],
-                "Size": "0",
-                "UpEndpoint": "",
-                "PinEndpoint": Constants.CRUST_API_BASE
-            }
-            for item in self.pin_info
-        ]
-        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         file_path = filedialog.asksaveasfilename(
             defaultextension=".json",
@@ -1608,12 +1921,125 @@ class CrustPinning:
         
         if file_path:
             try:
+                items = list(self.pin_info)
                 with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(formatted_data, f, ensure_ascii=False, indent=4)
-                self._log_message(f"已导出到 {file_path}")
+                    f.write("[\n")
+                    for idx, item in enumerate(items):
+                        record = {
+                            "Hash": item['cid'],
+                            "Name": item['name'],
+                            "Size": "0",
+                            "UpEndpoint": "",
+                            "PinEndpoint": Constants.CRUST_API_BASE
+                        }
+                        text = json.dumps(record, ensure_ascii=False, indent=4)
+                        f.write("    " + text.replace("\n", "\n    "))
+                        f.write(",\n" if idx < len(items) - 1 else "\n")
+                    f.write("]")
+                self._log_message(f"已导出 {len(items)} 条到 {file_path}")
             except Exception as e:
                 self._log_message(f"导出错误: {str(e)}")
     
+    def _init_pin_ledger(self):
+        """打开本地账本并启动后台状态轮询"""
+        base_dir = os.path.dirname(os.path.abspath(self.config_manager.config_file_path))
+        try:
+            os.makedirs(os.path.join(base_dir, 'crust_cache'), exist_ok=True)
+            self.ledger = PinLedger(os.path.join(base_dir, 'crust_cache', 'pin_ledger.sqlite3'))
+        except Exception as e:
+            self.logger.error(f"Failed to open pin ledger: {e}")
+            return
+        # 重启后继续轮询已保存账户的未完成固定
+        if self.use_public_account.get():
+            self._register_ledger_account(self._public_config())
+        else:
+            saved = self.config_manager.get_crust_config()
+            if saved.get('crust_b64auth_encoded_data'):
+                self._register_ledger_account(saved)
+        self.poller = PinStatusPoller(
+            self.ledger,
+            self._client_for_account,
+            on_transition=self._on_pin_transition,
+            min_interval=Constants.LEDGER_MIN_POLL_INTERVAL,
+            max_interval=Constants.LEDGER_MAX_POLL_INTERVAL,
+            batch_size=Constants.STATUS_BATCH_SIZE
+        )
+        self.poller.start()
+    
+    def _on_destroy(self, event):
+        if event.widget is self.master:
+            self.shutdown()
+    
+    def shutdown(self):
+        """停止状态轮询并关闭账本；在后台等待轮询线程退出，不阻塞 UI"""
+        if self._closed:
+            return
+        self._closed = True
+        poller, ledger = self.poller, self.ledger
+        self.poller = None
+        self.ledger = None
+        
+        def close():
+            if poller:
+                poller.stop(timeout=60)
+            if ledger:
+                try:
+                    ledger.close()
+                except Exception as e:
+                    self.logger.error(f"Failed to close pin ledger: {e}")
+        
+        threading.Thread(target=close, daemon=True).start()
+    
+    @staticmethod
+    def _public_config():
+        return {
+            'crust_username': Constants.CRUST_PUBLIC_USERNAME,
+            'crust_b64auth_encoded_data': Constants.CRUST_PUBLIC_AUTH
+        }
+    
+    def _register_ledger_account(self, config):
+        with self.operations_lock:
+            self._ledger_configs[self._account_key(config)] = config
+    
+    def _client_for_account(self, account):
+        config = self._ledger_configs.get(account)
+        return self._get_psa_client(config) if config else None
+    
+    def _ledger_record(self, config, cid, requestid, name, status, created=''):
+        """写入本地账本；非终态记录交给轮询器跟踪"""
+        ledger = self.ledger
+        if not ledger:
+            return
+        self._register_ledger_account(config)
+        try:
+            ledger.record(self._account_key(config), cid, requestid, name, status, created,
+                               next_check=time.time() + Constants.LEDGER_MIN_POLL_INTERVAL)
+        except Exception as e:
+            self.logger.error(f"Pin ledger write failed: {e}")
+            return
+        if self.poller:
+            self.poller.wake()
+    
+    def _on_pin_transition(self, account, cid, old_status, new_status):
+        self._log_message(f"[状态更新] {cid}: {old_status} → {new_status}")
+    
+    def show_ledger_pins(self):
+        """从本地账本离线显示当前账户的固定记录（不访问 API），可直接导出"""
+        if not self.ledger:
+            self._log_message("本地账本不可用。")
+            return
+        config = self._public_config() if self.use_public_account.get() else self.config_manager.get_crust_config()
+        account = self._account_key(config)
+        rows = self.ledger.query(account=account)
+        counts = self.ledger.counts(account)
+        self.pin_info = []
+        self._log_message("CID\t\t\t\t\t\t状态\t\t名称（本地账本）")
+        self._log_message("-" * 80)
+        self._display_pin_info(rows)
+        self._log_message("-" * 80)
+        summary = "，".join(f"{status} {count}" for status, count in sorted(counts.items()))
+        self._log_message(f"本地账本共 {len(rows)} 条" + (f"：{summary}" if summary else "。"))
+    
     def _open_ipfs_scan(self):
         """在IPFS Scan中打开"""
         cids = self._get_cids()
@@ -1668,7 +2094,13 @@ class CrustPinning:
     
     def _log_message(self, message):
         """记录日志"""
-        self.master.after(0, self._log_message_gui, message)
+        if self._closed:
+            return
+        try:
+            self.master.after(0, self._log_message_gui, message)
+        except (tk.TclError, RuntimeError):
+            # 窗口已销毁
+            pass
     
     def _log_message_gui(self, message):
         """GUI日志记录"""
@@ -3,22 +3,34 @@
 
 import subprocess
 import os
+import json
+import hashlib
 import sys
 import re
-import tarfile
 import requests
 from requests.exceptions import RequestException
-import zipfile
 import platform
+import socket
 import time
 import urllib.parse
 import psutil
 import shutil  # ★ 新增：用于删除临时目录等操作
 
+from utils.kubo_downloader import KuboDownloader, KuboDownloadError
+
+# 发行包地址，可通过环境变量指向镜像或本地测试服务
+KUBO_DIST_BASE = os.environ.get('KUBO_DIST_URL', 'https://dist.ipfs.tech').rstrip('/')
+
 
 class EmbeddedKubo:
     """IPFS Kubo 嵌入式管理器"""
     
+    API_PORT_RANGE = range(5001, 5101)
+    DAEMON_READY_TIMEOUT = 60    # seconds, 等待 /api/v0/id 响应的上限
+    DAEMON_MAX_SPAWNS = 3        # 守护进程启动即退出时最多换几个端口重试
+    DOWNLOAD_SEGMENTS = 1        # >1 时按 Range 分段并行下载发行包
+    LATEST_VERSION_TTL = 12 * 3600  # seconds, 远程最新版本查询结果的缓存时间
+    
     def __init__(self, app_path, logger=None, repo_path=None, auto_update=False):
         self.logger = logger
         self.app_path = app_path
@@ -39,6 +51,10 @@ class EmbeddedKubo:
         # 清理历史遗留的 kubo\kubo 目录（如果有的话）
         self._cleanup_legacy_nested_kubo()
         
+        # 版本检查结果缓存：二进制未变化时不再启动 ipfs 子进程
+        self.version_cache_path = os.path.join(self.kubo_dir, 'version_cache.json')
+        self.version_cache = self._load_version_cache()
+        
         # 初始化 Kubo
         self.kubo_version = self._get_latest_kubo_version()
         self.kubo_path = self._setup_kubo()
@@ -46,79 +62,183 @@ class EmbeddedKubo:
 
     # ==================== 版本管理 ====================
     
+    def _load_version_cache(self):
+        try:
+            with open(self.version_cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save_version_cache(self):
+        try:
+            os.makedirs(self.kubo_dir, exist_ok=True)
+            tmp = f"{self.version_cache_path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.version_cache, f, indent=2)
+            os.replace(tmp, self.version_cache_path)
+        except OSError as e:
+            self._log_warning(f"Failed to save version cache: {e}")
+
+    @staticmethod
+    def _binary_fingerprint(kubo_path):
+        """二进制指纹：大小 + mtime + 首尾各 1 MiB 的 SHA-256（避免每次启动完整哈希上百 MB 的文件）"""
+        try:
+            stat = os.stat(kubo_path)
+            hasher = hashlib.sha256()
+            with open(kubo_path, 'rb') as f:
+                hasher.update(f.read(1 << 20))
+                if stat.st_size > 2 << 20:
+                    f.seek(-(1 << 20), os.SEEK_END)
+                    hasher.update(f.read())
+            return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': hasher.hexdigest()}
+        except OSError:
+            return None
+
+    def _cached_binary_info(self, kubo_path):
+        """与当前二进制指纹一致的缓存条目（不一致时返回新条目并丢弃旧结果）"""
+        fingerprint = self._binary_fingerprint(kubo_path)
+        entry = self.version_cache.get('binary') or {}
+        if fingerprint is None:
+            return {}
+        if entry.get('path') == kubo_path and entry.get('fingerprint') == fingerprint:
+            return entry
+        entry = {'path': kubo_path, 'fingerprint': fingerprint}
+        self.version_cache['binary'] = entry
+        return entry
+
     def _get_latest_kubo_version(self):
-        """获取最新的 Kubo 版本"""
+        """获取最新的 Kubo 版本（结果缓存 LATEST_VERSION_TTL 秒）"""
+        cached = self.version_cache.get('latest') or {}
+        if cached.get('version') and time.time() - cached.get('fetched_at', 0) < self.LATEST_VERSION_TTL:
+            self._log_info(f"Latest Kubo version (cached): {cached['version']}")
+            return cached['version']
         try:
-            response = requests.get("https://dist.ipfs.tech/kubo/versions", timeout=10)
+            response = requests.get(f"{KUBO_DIST_BASE}/kubo/versions", timeout=10)
+            response.raise_for_status()
             versions = response.text.strip().split('\n')
             latest = versions[-1]
             self._log_info(f"Latest Kubo version: {latest}")
+            self.version_cache['latest'] = {'version': latest, 'fetched_at': time.time()}
+            self._save_version_cache()
             return latest
         except Exception as e:
             self._log_error(f"Error fetching latest Kubo version: {e}")
+            if cached.get('version'):
+                return cached['version']  # 过期的缓存也比固定回退版本更接近实际
             return "v0.18.1"  # fallback
 
     def _get_current_kubo_version(self, kubo_path):
-        """获取当前安装的 Kubo 版本"""
+        """获取当前安装的 Kubo 版本（二进制未变化时直接使用缓存）"""
+        entry = self._cached_binary_info(kubo_path)
+        if entry.get('version'):
+            self._log_info(f"Current Kubo version (cached): {entry['version']}")
+            return entry['version']
         try:
             result = subprocess.run(
                 [kubo_path, "version"],
                 capture_output=True,
                 text=True,
-                timeout=5
+                timeout=5,
+                **self._get_subprocess_args()
             )
             match = re.search(r"ipfs version (.+)", result.stdout)
             if match:
                 version = f"v{match.group(1)}"
                 self._log_info(f"Current Kubo version: {version}")
+                if entry:
+                    entry['version'] = version
+                    self._save_version_cache()
                 return version
         except Exception as e:
             self._log_error(f"Error getting current Kubo version: {e}")
         return None
 
+    def _get_kubo_repo_format(self):
+        """当前 Kubo 支持的仓库格式版本（ipfs version --repo），按二进制指纹缓存"""
+        entry = self._cached_binary_info(self.kubo_path)
+        if entry.get('repo_format'):
+            return entry['repo_format']
+        result = subprocess.run(
+            [self.kubo_path, "version", "--repo"],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=10,
+            **self._get_subprocess_args()
+        )
+        match = re.search(r'(?:fs-repo@)?(\d+)', result.stdout)
+        if not match:
+            self._log_warning(f"Unable to parse Kubo version: {result.stdout}")
+            return None
+        repo_format = int(match.group(1))
+        if entry:
+            entry['repo_format'] = repo_format
+            self._save_version_cache()
+        return repo_format
+
+    def _read_repo_version(self):
+        """直接读取仓库的 version 文件（内容即 fs-repo 版本号），返回 (版本, mtime_ns)"""
+        version_file = os.path.join(self.repo_path, 'version')
+        try:
+            with open(version_file, 'r') as f:
+                return int(f.read().strip()), os.stat(version_file).st_mtime_ns
+        except (OSError, ValueError):
+            return None, None
+
     def check_and_migrate_repo(self):
-        """检查并迁移仓库版本"""
+        """检查并迁移仓库版本（仓库 version 文件和二进制都未变化时跳过）"""
         try:
-            # 获取仓库版本
-            result = subprocess.run(
-                [self.kubo_path, "repo", "version"],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=10
-            )
-            repo_match = re.search(r'fs-repo@(\d+)', result.stdout)
-            if not repo_match:
-                self._log_warning(f"Unable to parse repository version: {result.stdout}")
-                return
+            repo_version, version_mtime = self._read_repo_version()
+            if repo_version is None:
+                # 没有 version 文件时退回到子进程查询
+                result = subprocess.run(
+                    [self.kubo_path, "repo", "version"],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    timeout=10,
+                    **self._get_subprocess_args()
+                )
+                repo_match = re.search(r'fs-repo@(\d+)', result.stdout)
+                if not repo_match:
+                    self._log_warning(f"Unable to parse repository version: {result.stdout}")
+                    return
+                repo_version = int(repo_match.group(1))
             
-            repo_version = int(repo_match.group(1))
+            binary = self._cached_binary_info(self.kubo_path)
+            checks = self.version_cache.setdefault('repo_checks', {})
+            key = os.path.abspath(self.repo_path)
+            last = checks.get(key) or {}
+            if (version_mtime is not None and last.get('repo_version') == repo_version
+                    and last.get('version_mtime_ns') == version_mtime
+                    and last.get('binary') == binary.get('fingerprint')):
+                self._log_info(f"Repository version {repo_version} unchanged since last check")
+                return
             
             # 获取 Kubo 版本
-            kubo_result = subprocess.run(
-                [self.kubo_path, "version", "--repo"],
-                capture_output=True,
-                text=True,
-                check=True,
-                timeout=10
-            )
-            kubo_match = re.search(r'fs-repo@(\d+)', kubo_result.stdout)
-            if not kubo_match:
-                self._log_warning(f"Unable to parse Kubo version: {kubo_result.stdout}")
+            kubo_version = self._get_kubo_repo_format()
+            if kubo_version is None:
                 return
             
-            kubo_version = int(kubo_match.group(1))
-            
             self._log_info(f"Repository version: {repo_version}, Kubo version: {kubo_version}")
             
             # 版本比较和迁移
             if repo_version > kubo_version:
                 self._log_info(f"Migrating repository from v{repo_version} to v{kubo_version}")
                 subprocess.run([self.kubo_path, "repo", "migrate"], check=True, timeout=300)
+                repo_version, version_mtime = self._read_repo_version()
             elif repo_version < kubo_version:
                 self._log_warning(f"Repository version ({repo_version}) is lower than Kubo version ({kubo_version})")
             else:
                 self._log_info("Repository and Kubo versions match")
+            
+            if version_mtime is not None:
+                checks[key] = {'repo_version': repo_version, 'version_mtime_ns': version_mtime,
+                               'binary': binary.get('fingerprint')}
+                self._save_version_cache()
                 
         except subprocess.TimeoutExpired:
             self._log_error("Repository version check timed out")
@@ -156,6 +276,12 @@ class EmbeddedKubo:
         if not os.path.exists(kubo_path):
             raise RuntimeError("Kubo binary not found after installation")
         
+        # 刚安装的版本已知，写入缓存，下次启动无需再执行 ipfs version
+        entry = self._cached_binary_info(kubo_path)
+        if entry:
+            entry['version'] = self.kubo_version
+            self._save_version_cache()
+        
         return kubo_path
 
     def _get_binary_info(self):
@@ -166,91 +292,52 @@ class EmbeddedKubo:
         if system == 'windows':
             return {
                 'name': 'ipfs.exe',
-                'url': f'https://dist.ipfs.tech/kubo/{self.kubo_version}/kubo_{self.kubo_version}_windows-{machine}.zip',
+                'url': f'{KUBO_DIST_BASE}/kubo/{self.kubo_version}/kubo_{self.kubo_version}_windows-{machine}.zip',
                 'archive_type': 'zip'
             }
         elif system == 'darwin':
             return {
                 'name': 'ipfs',
-                'url': f'https://dist.ipfs.tech/kubo/{self.kubo_version}/kubo_{self.kubo_version}_darwin-{machine}.tar.gz',
+                'url': f'{KUBO_DIST_BASE}/kubo/{self.kubo_version}/kubo_{self.kubo_version}_darwin-{machine}.tar.gz',
                 'archive_type': 'tar.gz'
             }
         elif system == 'linux':
             return {
                 'name': 'ipfs',
-                'url': f'https://dist.ipfs.tech/kubo/{self.kubo_version}/kubo_{self.kubo_version}_linux-{machine}.tar.gz',
+                'url': f'{KUBO_DIST_BASE}/kubo/{self.kubo_version}/kubo_{self.kubo_version}_linux-{machine}.tar.gz',
                 'archive_type': 'tar.gz'
             }
         else:
             raise RuntimeError(f"Unsupported platform: {system}")
 
     def _download_and_install_kubo(self, binary_info):
-        """下载并安装 Kubo（解压到临时目录，避免 kubo\\kubo 嵌套）"""
+        """流式下载并安装 Kubo：断点续传 + SHA-512 校验，直接写到 kubo_dir 顶层"""
         os.makedirs(self.kubo_dir, exist_ok=True)
 
-        # 临时解压目录，避免出现 kubo\kubo 这种嵌套
+        # 清理旧版本遗留的临时解压目录
         tmp_dir = os.path.join(self.kubo_dir, "_tmp")
         if os.path.exists(tmp_dir):
             shutil.rmtree(tmp_dir, ignore_errors=True)
-        os.makedirs(tmp_dir, exist_ok=True)
         
-        # 下载
+        url = binary_info['url']
+        downloader = KuboDownloader(segments=self.DOWNLOAD_SEGMENTS, logger=self.logger)
+        expected = downloader.fetch_sha512(url)
+        if expected:
+            self._log_info(f"Expected SHA-512: {expected}")
+        else:
+            self._log_warning(f"No published SHA-512 for {url}, skipping integrity check")
+        
         self._log_info(f"Downloading Kubo {self.kubo_version}...")
         try:
-            response = requests.get(binary_info['url'], timeout=300)
-            response.raise_for_status()
-        except RequestException as e:
+            # 未完成的 .part 保留在 kubo_dir，下次启动继续
+            downloader.install_binary(
+                url, binary_info['archive_type'], binary_info['name'],
+                os.path.join(self.kubo_dir, binary_info['name']),
+                expected_sha512=expected, work_dir=self.kubo_dir,
+            )
+        except (KuboDownloadError, OSError) as e:
             raise RuntimeError(f"Failed to download Kubo: {e}")
-        
-        # 保存压缩包到临时目录
-        archive_ext = 'zip' if binary_info['archive_type'] == 'zip' else 'tar.gz'
-        archive_path = os.path.join(tmp_dir, f'kubo.{archive_ext}')
-        
-        with open(archive_path, 'wb') as f:
-            f.write(response.content)
-        
-        # 解压到临时目录
-        try:
-            if binary_info['archive_type'] == 'zip':
-                with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                    zip_ref.extractall(tmp_dir)
-            else:
-                with tarfile.open(archive_path, 'r:gz') as tar_ref:
-                    tar_ref.extractall(tmp_dir)
-        except Exception as e:
-            raise RuntimeError(f"Failed to extract Kubo: {e}")
-        finally:
-            if os.path.exists(archive_path):
-                os.remove(archive_path)
-        
-        # 从临时目录中找到二进制文件并移动到 kubo_dir 顶层
-        self._move_binary_to_target(binary_info['name'], search_root=tmp_dir)
-
-        # 清理临时目录
-        shutil.rmtree(tmp_dir, ignore_errors=True)
-
-    def _move_binary_to_target(self, binary_name, search_root=None):
-        """将二进制文件移动到目标位置
-        
-        search_root: 指定搜索根目录，默认从 self.kubo_dir 开始搜索
-        """
-        if search_root is None:
-            search_root = self.kubo_dir
-        
-        target_path = os.path.join(self.kubo_dir, binary_name)
-        
-        for root, _, files in os.walk(search_root):
-            if binary_name in files:
-                src = os.path.join(root, binary_name)
-                if src != target_path:
-                    # 如果目标位置已有旧文件，先删掉
-                    if os.path.exists(target_path):
-                        try:
-                            os.remove(target_path)
-                        except OSError as e:
-                            self._log_error(f"Failed to remove old binary at target: {e}")
-                    os.rename(src, target_path)
-                break
+        self._log_info(f"Kubo {self.kubo_version} installed")
 
     # ==================== 仓库管理 ====================
     
@@ -365,8 +452,9 @@ class EmbeddedKubo:
         self._log_info("Starting IPFS daemon...")
         self.initialize_ipfs()
         
-        # 尝试不同端口
-        for port in range(5001, 5101):
+        # 尝试不同端口（进程内 bind 探测，不再逐个端口调用 netstat/lsof）
+        spawns = 0
+        for port in self.API_PORT_RANGE:
             if self._is_port_in_use(port):
                 self._log_info(f"Port {port} in use, trying next")
                 continue
@@ -374,22 +462,54 @@ class EmbeddedKubo:
             self._log_info(f"Attempting to start daemon on port {port}")
             self.process = self._run_daemon(port)
             
-            if self.process:
-                self._log_info(f"Daemon started with PID: {self.process.pid}")
-                time.sleep(2)  # 等待 API 文件生成
-                
-                self.api_url = self.get_api_address()
-                if self.api_url:
-                    self._log_info(f"Daemon ready, API: {self.api_url}")
-                    return
-                else:
-                    self._log_error("Failed to get API address")
-                    self.stop_daemon()
-            else:
+            if not self.process:
                 self._log_error(f"Failed to start on port {port}")
+                continue
+            
+            self._log_info(f"Daemon started with PID: {self.process.pid}")
+            spawns += 1
+            ready = self._wait_for_api(self.process, "127.0.0.1", port)
+            if ready:
+                self.api_url = f"http://127.0.0.1:{port}"
+                self._log_info(f"Daemon ready, API: {self.api_url}")
+                return
+            if ready is None:
+                # 进程仍在运行但超时未响应（如大仓库加载较慢），保留进程
+                self.api_url = f"http://127.0.0.1:{port}"
+                self._log_warning(f"Daemon not responding after {self.DAEMON_READY_TIMEOUT}s, API: {self.api_url}")
+                return
+            
+            # 进程已退出（如端口被抢占），换端口重试
+            self._log_error(f"Daemon exited with code {self.process.returncode} on port {port}")
+            self.process = None
+            if spawns >= self.DAEMON_MAX_SPAWNS:
+                break
         
         self._log_error("Failed to start daemon on any port")
 
+    def _wait_for_api(self, process, host, port):
+        """
+        轮询 /api/v0/id 直到守护进程响应，间隔从 50ms 指数退避到 500ms
+        返回 True 表示就绪，False 表示进程已退出，None 表示超时
+        """
+        url = f"http://{host}:{port}/api/v0/id"
+        deadline = time.monotonic() + self.DAEMON_READY_TIMEOUT
+        delay = 0.05
+        while True:
+            if process.poll() is not None:
+                return False
+            if self._can_connect(host, port):
+                try:
+                    response = requests.post(url, timeout=2, proxies={'http': None, 'https': None})
+                    if response.status_code == 200:
+                        return True
+                except RequestException:
+                    pass
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
     def _run_daemon(self, port=5001):
         """运行守护进程"""
         env = os.environ.copy()
@@ -502,7 +622,7 @@ class EmbeddedKubo:
             return False
         
         # 检查端口
-        if not self._is_port_in_use(port):
+        if not self._can_connect(host, port):
             self._log_info(f"Port {port} not in use, IPFS not running")
             return False
         
@@ -543,31 +663,30 @@ class EmbeddedKubo:
 
     # ==================== 工具方法 ====================
     
-    def _is_port_in_use(self, port):
-        """检查端口是否被占用"""
-        if os.name == 'nt':  # Windows
-            try:
-                result = subprocess.run(
-                    ['netstat', '-an'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                pattern = r'TCP\s+(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}):' + str(port) + r'\s+(\S+)\s+(LISTENING|ESTABLISHED)'
-                return bool(re.search(pattern, result.stdout))
-            except Exception:
-                return False
-        else:  # Unix-like
-            try:
-                result = subprocess.run(
-                    ['lsof', '-i', f':{port}'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                return bool(result.stdout.strip())
-            except Exception:
-                return False
+    def _is_port_in_use(self, port, host='127.0.0.1'):
+        """检查端口是否被占用：能连上或无法绑定均视为占用"""
+        if self._can_connect(host, port):
+            return True
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            if hasattr(socket, 'SO_EXCLUSIVEADDRUSE'):
+                # Windows 下默认允许与通配地址上的监听重叠绑定，需独占探测
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+            sock.bind((host, port))
+            return False
+        except OSError:
+            return True
+        finally:
+            sock.close()
+
+    @staticmethod
+    def _can_connect(host, port, timeout=0.5):
+        """TCP 连接探测，本机未监听的端口会立即被拒绝"""
+        try:
+            with socket.create_connection((host, port), timeout=timeout):
+                return True
+        except OSError:
+            return False
 
     def _get_subprocess_args(self):
         """获取 subprocess 参数"""
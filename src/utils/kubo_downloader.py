@@ -0,0 +1,373 @@
+# src\utils\kubo_downloader.py
+
+import hashlib
+import io
+import os
+import shutil
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.exceptions import RequestException
+from urllib3.exceptions import HTTPError as Urllib3Error
+
+# 直接读取原始字节流（不做 Content-Encoding 解码）时，中断会抛出 urllib3 异常
+NETWORK_ERRORS = (RequestException, Urllib3Error, OSError)
+
+
+class KuboDownloadError(RuntimeError):
+    """下载、校验或解压失败"""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class _ResumableStream(io.RawIOBase):
+    """
+    把一次 HTTP 下载包装成只读流：连接中断时用 Range 从断点续传，对读取方透明；
+    读出的每个字节同时计入 SHA-512，可边下载边解压边校验
+    """
+
+    def __init__(self, downloader, url, offset=0, hasher=None):
+        self.downloader = downloader
+        self.url = url
+        self.offset = offset
+        self.hasher = hasher
+        self.total = None
+        self._iter = None
+        self._response = None
+        self._buffer = b''
+        self._failures = 0
+
+    def readable(self):
+        return True
+
+    def _open(self):
+        """发起（续传）请求，返回需要先交给读取方的剩余字节"""
+        self.close_response()
+        self._response = self.downloader._get(self.url, self.offset)
+        status = self._response.status_code
+        if status == 416:
+            # 断点已在文件末尾
+            self.total = self.offset
+            self._iter = iter(())
+            return b''
+        if status == 200:
+            length = self._response.headers.get('Content-Length')
+            self.total = int(length) if length else None
+            skip = self.offset
+        else:  # 206
+            content_range = self._response.headers.get('Content-Range', '')
+            if content_range.rpartition('/')[2].isdigit():
+                self.total = int(content_range.rpartition('/')[2])
+            skip = 0
+        self._iter = self._response.raw.stream(self.downloader.chunk_size, decode_content=False)
+        # 服务端不支持 Range 时从头返回，丢弃已读部分
+        leftover = b''
+        while skip > 0:
+            chunk = next(self._iter, b'')
+            if not chunk:
+                raise KuboDownloadError("Download truncated while skipping to resume offset")
+            leftover = chunk[skip:]
+            skip -= len(chunk)
+        return leftover
+
+    def _next_chunk(self):
+        while True:
+            try:
+                if self._iter is None:
+                    leftover = self._open()
+                    if leftover:
+                        return leftover
+                chunk = next(self._iter, b'')
+                if not chunk and self.total is not None and self.offset < self.total:
+                    raise KuboDownloadError(f"Connection closed at {self.offset}/{self.total} bytes")
+                return chunk
+            except NETWORK_ERRORS + (KuboDownloadError,) as e:
+                if not getattr(e, 'retryable', True):
+                    raise
+                self._failures += 1
+                if self._failures > self.downloader.max_retries:
+                    raise KuboDownloadError(f"Download failed after {self._failures} attempts: {e}")
+                self.downloader._log(f"Download interrupted at {self.offset} bytes, resuming: {e}")
+                self._iter = None
+                time.sleep(min(2 ** self._failures, 30) * 0.5)
+
+    def readinto(self, b):
+        if not self._buffer:
+            self._buffer = self._next_chunk()
+            if not self._buffer:
+                return 0
+        n = min(len(b), len(self._buffer))
+        data, self._buffer = self._buffer[:n], self._buffer[n:]
+        b[:n] = data
+        self.offset += n
+        if self.hasher is not None:
+            self.hasher.update(data)
+        if self.downloader.on_progress:
+            self.downloader.on_progress(self.offset, self.total)
+        return n
+
+    def close_response(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+    def close(self):
+        self.close_response()
+        super().close()
+
+
+class KuboDownloader:
+    """Kubo 发行包下载器
+
+    - 分块流式下载，不把整个压缩包放进内存；中断后按 HTTP Range 续传
+    - 与 dist.ipfs.tech 发布的 <archive>.sha512 对比，边下载边计算哈希
+    - tar.gz 直接从下载流中解出二进制；zip 需要读取文件尾部目录，先落盘为 .part（同样可续传）
+    - segments > 1 且服务端支持 Range 时，按分段并行下载到 .part 后再校验
+    """
+
+    def __init__(self, chunk_size=256 * 1024, segments=1, max_retries=5, timeout=(10, 60),
+                 logger=None, on_progress=None, session=None):
+        self.chunk_size = chunk_size
+        self.segments = max(1, segments)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.logger = logger
+        self.on_progress = on_progress
+        self.session = session or requests.Session()
+
+    def _log(self, message):
+        if self.logger:
+            self.logger.info(f"Kubo: {message}")
+
+    def _get(self, url, offset=0, end=None):
+        headers = {}
+        if offset or end is not None:
+            headers['Range'] = f"bytes={offset}-{'' if end is None else end}"
+        response = self.session.get(url, stream=True, timeout=self.timeout, headers=headers)
+        if response.status_code not in (200, 206, 416):
+            response.close()
+            # 4xx（如版本不存在）重试无意义
+            raise KuboDownloadError(f"HTTP {response.status_code} for {url}",
+                                    retryable=response.status_code >= 500 or response.status_code == 429)
+        return response
+
+    # ==================== 校验值 ====================
+
+    def fetch_sha512(self, url):
+        """读取 <url>.sha512（格式: "<hex>  <文件名>"），不存在时返回 None"""
+        try:
+            response = self.session.get(f"{url}.sha512", timeout=self.timeout)
+            if response.status_code != 200:
+                return None
+            digest = response.text.split()[0].strip().lower()
+            return digest if len(digest) == 128 else None
+        except (RequestException, IndexError):
+            return None
+
+    @staticmethod
+    def _check(digest, expected):
+        if expected and digest != expected.lower():
+            raise KuboDownloadError(f"SHA-512 mismatch: expected {expected}, got {digest}")
+
+    # ==================== 下载到文件 ====================
+
+    def _probe(self, url):
+        """返回 (总长度, 是否支持 Range)"""
+        try:
+            response = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+            length = response.headers.get('Content-Length')
+            ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+            return (int(length) if length else None), ranges
+        except (RequestException, ValueError):
+            return None, False
+
+    def download(self, url, dest_path, expected_sha512=None):
+        """下载到 dest_path，已有 <dest_path>.part 时续传；返回 SHA-512"""
+        part_path = f"{dest_path}.part"
+        total, ranges = self._probe(url) if self.segments > 1 else (None, False)
+        try:
+            if self.segments > 1 and total and ranges:
+                digest = self._download_segments(url, part_path, total)
+            else:
+                digest = self._download_single(url, part_path)
+        except KuboDownloadError:
+            # 单流下载保留已下载的部分供下次续传（分段下载失败时已自行删除），空文件直接删除
+            if os.path.exists(part_path) and not os.path.getsize(part_path):
+                os.remove(part_path)
+            raise
+        try:
+            self._check(digest, expected_sha512)
+        except KuboDownloadError:
+            os.remove(part_path)
+            raise
+        os.replace(part_path, dest_path)
+        return digest
+
+    def _download_single(self, url, part_path):
+        hasher = hashlib.sha512()
+        offset = 0
+        if os.path.exists(part_path):
+            # 已下载部分先计入哈希，再从断点继续
+            with open(part_path, 'rb') as f:
+                for block in iter(lambda: f.read(self.chunk_size), b''):
+                    hasher.update(block)
+                    offset += len(block)
+            if offset:
+                self._log(f"Resuming download at {offset} bytes")
+        stream = _ResumableStream(self, url, offset, hasher)
+        try:
+            with open(part_path, 'ab') as f:
+                shutil.copyfileobj(stream, f, self.chunk_size)
+        finally:
+            stream.close()
+        return hasher.hexdigest()
+
+    def _download_segments(self, url, part_path, total):
+        """
+        分段并行写入预分配的 .part；预分配的文件中间有未写入的空洞，无法按长度续传，
+        因此任一分段失败都删除 .part，下次从头下载
+        """
+        with open(part_path, 'wb') as f:
+            f.truncate(total)
+        try:
+            return self._fetch_segments(url, part_path, total)
+        except BaseException:
+            os.remove(part_path)
+            raise
+
+    def _fetch_segments(self, url, part_path, total):
+        size = -(-total // self.segments)
+        # 每段已写入的字节数；进度按各段位置求和，重试的分段不会重复计数
+        written = {}
+        lock = threading.Lock()
+        # 任一分段彻底失败后其余分段尽快停止，整个文件反正要重新下载
+        aborted = threading.Event()
+
+        def fetch(start):
+            try:
+                fetch_segment(start)
+            except BaseException:
+                aborted.set()
+                raise
+
+        def fetch_segment(start):
+            end = min(start + size, total) - 1
+            position, failures = start, 0
+            while position <= end:
+                if aborted.is_set():
+                    return
+                try:
+                    response = self._get(url, position, end)
+                    if response.status_code != 206:  # 包括 416
+                        response.close()
+                        raise KuboDownloadError("Server ignored Range request")
+                    with response, open(part_path, 'r+b') as f:
+                        f.seek(position)
+                        for chunk in response.raw.stream(self.chunk_size, decode_content=False):
+                            chunk = chunk[:end + 1 - position]
+                            f.write(chunk)
+                            position += len(chunk)
+                            with lock:
+                                written[start] = position - start
+                                if self.on_progress:
+                                    self.on_progress(sum(written.values()), total)
+                            if position > end or aborted.is_set():
+                                break
+                    if position <= end and not aborted.is_set():
+                        raise KuboDownloadError(f"Segment closed at {position}/{end + 1}")
+                except NETWORK_ERRORS + (KuboDownloadError,) as e:
+                    if not getattr(e, 'retryable', True):
+                        raise
+                    failures += 1
+                    if failures > self.max_retries:
+                        raise KuboDownloadError(f"Segment {start}-{end} failed: {e}")
+                    time.sleep(min(2 ** failures, 30) * 0.5)
+
+        self._log(f"Downloading {total} bytes in {self.segments} segments")
+        with ThreadPoolExecutor(max_workers=self.segments) as executor:
+            for future in [executor.submit(fetch, start) for start in range(0, total, size)]:
+                future.result()
+
+        hasher = hashlib.sha512()
+        with open(part_path, 'rb') as f:
+            for block in iter(lambda: f.read(self.chunk_size), b''):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    # ==================== 安装 ====================
+
+    def install_binary(self, url, archive_type, binary_name, target_path, expected_sha512=None, work_dir=None):
+        """
+        下载发行包并把其中的 binary_name 安装到 target_path（先写 .new，校验通过后原子替换）
+        返回实际的 SHA-512
+        """
+        work_dir = work_dir or os.path.dirname(target_path)
+        os.makedirs(work_dir, exist_ok=True)
+        tmp_target = f"{target_path}.new"
+        try:
+            if archive_type == 'tar.gz' and self.segments == 1:
+                digest = self._install_from_tar_stream(url, binary_name, tmp_target)
+                self._check(digest, expected_sha512)
+            else:
+                archive_path = os.path.join(work_dir, url.rsplit('/', 1)[-1] or f"kubo.{archive_type}")
+                digest = self.download(url, archive_path, expected_sha512)
+                try:
+                    self._extract_from_file(archive_path, archive_type, binary_name, tmp_target)
+                finally:
+                    os.remove(archive_path)
+            if os.name != 'nt':
+                os.chmod(tmp_target, 0o755)
+            os.replace(tmp_target, target_path)
+            return digest
+        finally:
+            if os.path.exists(tmp_target):
+                os.remove(tmp_target)
+
+    def _install_from_tar_stream(self, url, binary_name, tmp_target):
+        hasher = hashlib.sha512()
+        stream = _ResumableStream(self, url, 0, hasher)
+        found = False
+        try:
+            reader = io.BufferedReader(stream, self.chunk_size)
+            with tarfile.open(fileobj=reader, mode='r|gz') as tar:
+                for member in tar:
+                    if member.isfile() and os.path.basename(member.name) == binary_name and not found:
+                        with tar.extractfile(member) as src, open(tmp_target, 'wb') as dst:
+                            shutil.copyfileobj(src, dst, self.chunk_size)
+                        found = True
+            # 读完剩余字节（gzip 尾部 / tar 填充），哈希覆盖整个文件
+            for _ in iter(lambda: reader.read(self.chunk_size), b''):
+                pass
+        except tarfile.TarError as e:
+            raise KuboDownloadError(f"Failed to extract Kubo: {e}")
+        finally:
+            stream.close()
+        if not found:
+            raise KuboDownloadError(f"{binary_name} not found in archive")
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _extract_from_file(archive_path, archive_type, binary_name, tmp_target):
+        try:
+            if archive_type == 'zip':
+                with zipfile.ZipFile(archive_path) as archive:
+                    name = next((n for n in archive.namelist() if os.path.basename(n) == binary_name), None)
+                    if name is None:
+                        raise KuboDownloadError(f"{binary_name} not found in archive")
+                    with archive.open(name) as src, open(tmp_target, 'wb') as dst:
+                        shutil.copyfileobj(src, dst)
+            else:
+                with tarfile.open(archive_path, 'r:gz') as tar:
+                    member = next((m for m in tar if m.isfile() and os.path.basename(m.name) == binary_name), None)
+                    if member is None:
+                        raise KuboDownloadError(f"{binary_name} not found in archive")
+                    with tar.extractfile(member) as src, open(tmp_target, 'wb') as dst:
+                        shutil.copyfileobj(src, dst)
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            raise KuboDownloadError(f"Failed to extract Kubo: {e}")
@@ -0,0 +1,294 @@
+# src\utils\kubo_profiles.py
+
+import json
+import os
+import re
+import subprocess
+import time
+
+# 调优方案：键为 ipfs config 的点分路径，值为 JSON 值（通过 ipfs config --json 写入）
+# 键名与取值以当前 Kubo 为准，旧版本按 KEY_VERSIONS / VALUE_VERSIONS 换算
+# 不包含任何会改变 CID 的导入参数
+PROFILES = {
+    'seeder': {
+        'title': '做种 (长期在线分享)',
+        'description': '更多连接、加速 DHT 客户端、全量提供，适合常驻分享大量文件的节点',
+        'settings': {
+            'Swarm.ConnMgr.Type': 'basic',
+            'Swarm.ConnMgr.LowWater': 200,
+            'Swarm.ConnMgr.HighWater': 600,
+            'Swarm.ConnMgr.GracePeriod': '1m',
+            'Swarm.ResourceMgr.MaxMemory': '4GB',
+            'Swarm.ResourceMgr.MaxFileDescriptors': 8192,
+            'Routing.AcceleratedDHTClient': True,
+            'Provide.Strategy': 'all',
+            'Datastore.BloomFilterSize': 1048576,
+            'Internal.Bitswap.TaskWorkerCount': 32,
+            'Internal.Bitswap.EngineTaskWorkerCount': 32,
+            'Internal.Bitswap.EngineBlockstoreWorkerCount': 256,
+            'Internal.Bitswap.MaxOutstandingBytesPerPeer': 4194304,
+        },
+    },
+    'light': {
+        'title': '轻量 (低配/笔记本)',
+        'description': '少量连接、仅作 DHT 客户端、只提供根 CID，降低 CPU/内存/带宽占用',
+        'settings': {
+            'Swarm.ConnMgr.Type': 'basic',
+            'Swarm.ConnMgr.LowWater': 20,
+            'Swarm.ConnMgr.HighWater': 60,
+            'Swarm.ConnMgr.GracePeriod': '20s',
+            'Swarm.ResourceMgr.MaxMemory': '512MB',
+            'Routing.Type': 'autoclient',
+            'Routing.AcceleratedDHTClient': False,
+            'Provide.Strategy': 'roots',
+            'Internal.Bitswap.TaskWorkerCount': 4,
+            'Internal.Bitswap.EngineTaskWorkerCount': 4,
+            'Internal.Bitswap.EngineBlockstoreWorkerCount': 32,
+        },
+    },
+    'importer': {
+        'title': '导入 (批量导入/固定)',
+        'description': '减少连接维护开销、布隆过滤器加速 Has 查询、只提供已固定内容',
+        'settings': {
+            'Swarm.ConnMgr.Type': 'basic',
+            'Swarm.ConnMgr.LowWater': 50,
+            'Swarm.ConnMgr.HighWater': 150,
+            'Swarm.ConnMgr.GracePeriod': '30s',
+            'Swarm.ResourceMgr.MaxMemory': '2GB',
+            'Provide.Strategy': 'pinned',
+            'Datastore.BloomFilterSize': 1048576,
+            'Internal.Bitswap.EngineBlockstoreWorkerCount': 128,
+        },
+    },
+}
+
+# 键在各 Kubo 版本中的名称：[(最低版本, 键名)]，从新到旧排列；键名为 None 表示该版本不支持，跳过该项
+KEY_VERSIONS = {
+    'Provide.Strategy': [((0, 38), 'Provide.Strategy'), ((0, 0), 'Reprovider.Strategy')],
+    'Routing.AcceleratedDHTClient': [((0, 21), 'Routing.AcceleratedDHTClient'),
+                                     ((0, 0), 'Experimental.AcceleratedDHTClient')],
+    'Swarm.ResourceMgr.MaxMemory': [((0, 19), 'Swarm.ResourceMgr.MaxMemory'), ((0, 0), None)],
+    'Swarm.ResourceMgr.MaxFileDescriptors': [((0, 19), 'Swarm.ResourceMgr.MaxFileDescriptors'), ((0, 0), None)],
+}
+
+# 旧版本不认识的取值：{(键, 值): [(最低版本, 替代值)]}
+VALUE_VERSIONS = {
+    ('Routing.Type', 'autoclient'): [((0, 21), 'autoclient'), ((0, 0), 'dhtclient')],
+}
+
+_MISSING = object()
+
+
+class KuboProfileError(RuntimeError):
+    """应用或回滚调优方案失败"""
+
+
+class KuboTuner:
+    """Kubo 仓库调优
+
+    当前值直接读取仓库 config 文件；写入统一走 ipfs config --json，保证格式由 Kubo 自己校验。
+    应用前把将被修改的原值保存到仓库目录的 tuning_backup.json，回滚时逐项恢复（原先不存在的键写回 null，即 Kubo 默认值）。
+    方案中的键名和取值按已安装 Kubo 的版本换算，旧版本不支持的项跳过，避免写入守护进程无法识别的配置。
+    切换方案时，旧方案改过而新方案未涉及的键先恢复为原值，避免两个方案的设置混在一起。
+    修改在守护进程重启后生效。
+    """
+
+    BACKUP_NAME = 'tuning_backup.json'
+
+    def __init__(self, kubo_path, repo_path, logger=None, subprocess_args=None, version=None):
+        self.kubo_path = kubo_path
+        self.repo_path = repo_path
+        self.logger = logger
+        self.subprocess_args = subprocess_args or {}
+        self._version = self._parse_version(version) if version else None
+
+    @property
+    def backup_path(self):
+        return os.path.join(self.repo_path, self.BACKUP_NAME)
+
+    def _log(self, message):
+        if self.logger:
+            self.logger.info(f"Kubo tuning: {message}")
+
+    @staticmethod
+    def _parse_version(text):
+        match = re.search(r'(\d+)\.(\d+)', text or '')
+        return (int(match.group(1)), int(match.group(2))) if match else None
+
+    @property
+    def version(self):
+        """已安装 Kubo 的 (主版本, 次版本)"""
+        if self._version is None:
+            try:
+                result = subprocess.run(
+                    [self.kubo_path, 'version', '--number'],
+                    capture_output=True, text=True, timeout=30, **self.subprocess_args
+                )
+            except (OSError, subprocess.SubprocessError) as e:
+                raise KuboProfileError(f"无法获取 Kubo 版本: {e}")
+            self._version = self._parse_version(result.stdout) if result.returncode == 0 else None
+            if self._version is None:
+                raise KuboProfileError(f"无法获取 Kubo 版本: {(result.stderr or result.stdout).strip()}")
+        return self._version
+
+    def _pick(self, choices):
+        for minimum, choice in choices:
+            if self.version >= minimum:
+                return choice
+        return None
+
+    def _resolve_key(self, key):
+        """把任一版本的键名换算为已安装版本的键名，不支持时返回 None"""
+        for choices in KEY_VERSIONS.values():
+            if any(name == key for _, name in choices):
+                return self._pick(choices)
+        return key
+
+    def settings(self, profile):
+        """按已安装版本换算后的方案设置 {键: 值}"""
+        resolved = {}
+        for key, value in PROFILES[profile]['settings'].items():
+            target = self._resolve_key(key)
+            if target is None:
+                self._log(f"Kubo {'.'.join(map(str, self.version))} 不支持 {key}，已跳过")
+                continue
+            choices = VALUE_VERSIONS.get((key, value))
+            resolved[target] = self._pick(choices) if choices else value
+        return resolved
+
+    def _original(self, backup):
+        """备份中的原值，键名换算为已安装版本（升级 Kubo 后旧键名已被迁移）"""
+        original = {}
+        for key, value in (backup['original'] if backup else {}).items():
+            target = self._resolve_key(key)
+            if target is not None:
+                original.setdefault(target, value)
+        return original
+
+    def _read_config(self):
+        try:
+            with open(os.path.join(self.repo_path, 'config'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise KuboProfileError(f"无法读取仓库配置: {e}")
+
+    @staticmethod
+    def _get(config, key):
+        node = config
+        for part in key.split('.'):
+            if not isinstance(node, dict) or part not in node:
+                return _MISSING
+            node = node[part]
+        return node
+
+    def _set(self, key, value):
+        env = os.environ.copy()
+        env['IPFS_PATH'] = self.repo_path
+        result = subprocess.run(
+            [self.kubo_path, 'config', '--json', key, json.dumps(value)],
+            env=env, capture_output=True, text=True, timeout=30, **self.subprocess_args
+        )
+        if result.returncode != 0:
+            raise KuboProfileError(f"ipfs config {key} 失败: {(result.stderr or result.stdout).strip()}")
+
+    def diff(self, profile):
+        """
+        返回 [(键, 当前值, 目标值)]，只包含需要修改的项；当前不存在的键其当前值为 None
+        此前应用过其他方案时，新方案未涉及但被旧方案改过的键恢复为调优前的原值
+        """
+        settings = self.settings(profile)
+        config = self._read_config()
+        changes = []
+        for key, value in settings.items():
+            current = self._get(config, key)
+            if current is _MISSING or current != value:
+                changes.append((key, None if current is _MISSING else current, value))
+        for key, value in self._original(self.load_backup()).items():
+            if key in settings:
+                continue
+            current = self._get(config, key)
+            current = None if current is _MISSING else current
+            if current != value:
+                changes.append((key, current, value))
+        return changes
+
+    def format_diff(self, changes, profile=None):
+        """profile 给出时，不属于该方案的键标注为恢复原值"""
+        if not changes:
+            return "当前配置已与该方案一致，无需修改"
+        settings = self.settings(profile) if profile else None
+        lines = []
+        for key, old, new in changes:
+            note = "  (恢复调优前的值)" if settings is not None and key not in settings else ""
+            lines.append(f"{key}: {json.dumps(old)} -> {json.dumps(new)}{note}")
+        return "\n".join(lines)
+
+    def load_backup(self):
+        try:
+            with open(self.backup_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_backup(self, backup):
+        tmp = f"{self.backup_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(backup, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.backup_path)
+
+    def active_profile(self):
+        backup = self.load_backup()
+        return backup.get('profile') if backup else None
+
+    def apply(self, profile):
+        """应用方案，返回实际修改的项；任一项失败时恢复本次已写入的项"""
+        changes = self.diff(profile)
+        backup = self.load_backup()
+        if not changes:
+            if backup and backup.get('profile') != profile:
+                self._save_backup(dict(backup, profile=profile, applied_at=time.time()))
+            return []
+        config = self._read_config()
+        # 连续应用多个方案时只保留最初的原值，回滚总是回到调优之前的状态
+        original = self._original(backup)
+        for key, _, _ in changes:
+            if key not in original:
+                value = self._get(config, key)
+                original[key] = None if value is _MISSING else value
+        self._save_backup({'profile': profile, 'applied_at': time.time(), 'original': original})
+
+        applied = []
+        try:
+            for key, old, new in changes:
+                self._set(key, new)
+                applied.append((key, old))
+        except KuboProfileError:
+            for key, old in reversed(applied):
+                try:
+                    self._set(key, old)
+                except KuboProfileError as e:
+                    self._log(f"恢复 {key} 失败: {e}")
+            if backup:
+                self._save_backup(backup)
+            else:
+                os.remove(self.backup_path)
+            raise
+        self._log(f"已应用方案 {profile}: {len(changes)} 项")
+        return changes
+
+    def rollback(self):
+        """恢复调优前的原值，返回恢复的项 [(键, 当前值, 原值)]"""
+        backup = self.load_backup()
+        if not backup:
+            raise KuboProfileError("没有可回滚的调优记录")
+        config = self._read_config()
+        restored = []
+        for key, value in self._original(backup).items():
+            current = self._get(config, key)
+            current = None if current is _MISSING else current
+            if current != value:
+                self._set(key, value)
+                restored.append((key, current, value))
+        os.remove(self.backup_path)
+        self._log(f"已回滚方案 {backup.get('profile')}: {len(restored)} 项")
+        return restored